@@ -0,0 +1,107 @@
+"""Benchmark Oasis.get_df default vs fast parse mode
+
+Builds an RTM 5-minute LMP payload shaped like an OASIS response (or reads a
+recorded zip) and times parsing it both ways.
+
+    python -m benchmarks.bench_parse --nodes 20 --days 7
+    python -m benchmarks.bench_parse --zip recorded_prc_intvl_lmp.zip
+"""
+
+import argparse
+import io
+import time
+import tracemalloc
+import zipfile
+from datetime import datetime, timedelta
+
+from pycaiso.oasis import LMP_COLUMNS, LMP_DTYPES, Oasis, RateLimiter, _make_response
+
+
+def synthetic_lmp_zip(nodes: int, days: int, interval_minutes: int = 5) -> bytes:
+    """Zipped LMP csv with a row per node, interval and LMP type"""
+
+    rows = [",".join(LMP_COLUMNS)]
+    start = datetime(2021, 1, 1, 8)
+    intervals = days * 24 * 60 // interval_minutes
+
+    for i in range(intervals):
+        t0 = start + timedelta(minutes=i * interval_minutes)
+        t1 = t0 + timedelta(minutes=interval_minutes)
+        local = t0 - timedelta(hours=8)
+        gmt0 = t0.strftime("%Y-%m-%dT%H:%M:%S-00:00")
+        gmt1 = t1.strftime("%Y-%m-%dT%H:%M:%S-00:00")
+        interval = local.minute // interval_minutes + 1
+
+        for n in range(nodes):
+            node = f"NODE_{n:04d}"
+            for group, lmp_type in enumerate(["LMP", "MCE", "MCC", "MCL"], 1):
+                rows.append(
+                    f"{gmt0},{gmt1},{local:%Y-%m-%d},{local.hour + 1},{interval},"
+                    f"{node},{node},{node},RTM,{lmp_type},LMP_PRC,{node},ALL,1,"
+                    f"{(i * 7 + n * 13 + group) % 9000 / 100:.5f},{group}"
+                )
+
+    with io.BytesIO() as buffer:
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as z:
+            z.writestr("PRC_INTVL_LMP.csv", "\n".join(rows) + "\n")
+
+        return buffer.getvalue()
+
+
+def run(oasis: Oasis, content: bytes, fast: bool, repeat: int) -> None:
+    response = _make_response(
+        content, {"content-disposition": "inline; filename=x.csv.zip;"}
+    )
+    kwargs = dict(
+        parse_dates=[2],
+        sort_values=["OPR_DT", "OPR_HR"],
+        reindex_columns=LMP_COLUMNS,
+        dtype=LMP_DTYPES if fast else None,
+        engine=oasis.parse_engine if fast else "c",
+    )
+
+    timings = []
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        df = oasis.get_df(response, **kwargs)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    oasis.get_df(response, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(timings)
+    label = f"fast ({oasis.parse_engine or 'c'})" if fast else "default (c)"
+
+    print(
+        f"{label:<16} {best * 1000:9.1f} ms  {len(df) / best:12,.0f} rows/s  "
+        f"result {df.memory_usage(deep=True).sum() / 2 ** 20:8.1f} MiB  "
+        f"peak {peak / 2 ** 20:8.1f} MiB"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--zip", help="recorded OASIS LMP zip to parse")
+    parser.add_argument("--nodes", type=int, default=20)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.zip:
+        with open(args.zip, "rb") as f:
+            content = f.read()
+    else:
+        content = synthetic_lmp_zip(args.nodes, args.days)
+
+    oasis = Oasis(fast_parse=True, rate_limiter=RateLimiter(1000, 1))
+
+    print(f"payload {len(content) / 2 ** 20:.1f} MiB zipped")
+    run(oasis, content, fast=False, repeat=args.repeat)
+    run(oasis, content, fast=True, repeat=args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""Benchmark the request to dataframe pipeline end to end
+
+Times Oasis.request, Oasis.get_df, Node.get_lmps, AllNodes.get_lmps,
+Atlas.get_pnodes and SystemDemand.get_demand_forecast against the local
+OASIS stand-in server, on payloads from a single node's day to a month of
+all-node RTM, and reports throughput and peak memory. Results can be saved
+as a baseline and later runs compared against it.
+
+    python -m benchmarks.bench_pipeline --save baseline.json
+    python -m benchmarks.bench_pipeline --compare baseline.json --fast-parse
+    python -m benchmarks.bench_pipeline --nodes 2000 --full
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+import requests
+
+from pycaiso.oasis import (
+    AllNodes,
+    Atlas,
+    Node,
+    RateLimiter,
+    SystemDemand,
+    make_session,
+)
+from pycaiso.testing import OasisServer
+
+DAY: Tuple[datetime, datetime] = (datetime(2021, 1, 1), datetime(2021, 1, 2))
+MONTH: Tuple[datetime, datetime] = (datetime(2021, 1, 1), datetime(2021, 2, 1))
+
+# a benchmark builds its case from client kwargs and returns a callable
+# running it once, returning the rows produced and, for cases that do not
+# download, the bytes processed
+Run = Callable[[], Tuple[int, Optional[int]]]
+Benchmark = Callable[[Dict[str, Any]], Run]
+
+
+def bench_request(kwargs: Dict[str, Any]) -> Run:
+    oasis = AllNodes(**kwargs)
+    params = oasis._snapshot_params(DAY[0], DAY[1], "RTM")
+
+    def run() -> Tuple[int, Optional[int]]:
+        oasis.request(params)
+        return 0, None
+
+    return run
+
+
+def bench_get_df(kwargs: Dict[str, Any]) -> Run:
+    oasis = AllNodes(**kwargs)
+    response = oasis.request(oasis._snapshot_params(DAY[0], DAY[1], "RTM"))
+
+    def run() -> Tuple[int, Optional[int]]:
+        return len(oasis.get_df(response, parse_dates=[2])), len(response.content)
+
+    return run
+
+
+def bench_node_lmps(market: str, period: Tuple[datetime, datetime]) -> Benchmark:
+    def bench(kwargs: Dict[str, Any]) -> Run:
+        node = Node("NODE_00000", **kwargs)
+        return lambda: (len(node.get_lmps(period[0], period[1], market)), None)
+
+    return bench
+
+
+def bench_all_node_lmps(period: Tuple[datetime, datetime]) -> Benchmark:
+    def bench(kwargs: Dict[str, Any]) -> Run:
+        nodes = AllNodes(**kwargs)
+        return lambda: (len(nodes.get_lmps(period[0], period[1], "RTM")), None)
+
+    return bench
+
+
+def bench_pnodes(kwargs: Dict[str, Any]) -> Run:
+    atlas = Atlas(**kwargs)
+    return lambda: (len(atlas.get_pnodes(*DAY)), None)
+
+
+def bench_demand_forecast(kwargs: Dict[str, Any]) -> Run:
+    demand = SystemDemand(**kwargs)
+    return lambda: (len(demand.get_demand_forecast(*MONTH)), None)
+
+
+def benchmarks(full: bool) -> List[Tuple[str, Benchmark]]:
+    cases = [
+        ("request all-node RTM day", bench_request),
+        ("get_df all-node RTM day", bench_get_df),
+        ("get_lmps node DAM day", bench_node_lmps("DAM", DAY)),
+        ("get_lmps node RTM month", bench_node_lmps("RTM", MONTH)),
+        ("get_lmps all-node RTM day", bench_all_node_lmps(DAY)),
+        ("get_pnodes", bench_pnodes),
+        ("get_demand_forecast month", bench_demand_forecast),
+    ]
+
+    if full:
+        cases.append(("get_lmps all-node RTM month", bench_all_node_lmps(MONTH)))
+
+    return cases
+
+
+class ByteCounter:
+    """Counts bytes received by a session"""
+
+    def __init__(self, session: requests.Session) -> None:
+        self.bytes = 0
+        session.hooks["response"].append(self.count)
+
+    def count(self, response: requests.Response, *args: Any, **kwargs: Any) -> None:
+        self.bytes += len(response.content)
+
+
+def measure(
+    bench: Benchmark, kwargs: Dict[str, Any], counter: ByteCounter, repeat: int
+) -> Dict[str, float]:
+    run = bench(kwargs)
+
+    # warm up, so the server has its payloads built
+    run()
+
+    timings = []
+
+    for _ in range(repeat):
+        received = counter.bytes
+        start = time.perf_counter()
+        rows, processed = run()
+        timings.append(time.perf_counter() - start)
+        nbytes = counter.bytes - received if processed is None else processed
+
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(timings)
+
+    return {
+        "seconds": best,
+        "rows": rows,
+        "bytes": nbytes,
+        "rows_per_s": rows / best,
+        "mb_per_s": nbytes / 2 ** 20 / best,
+        "peak_mib": peak / 2 ** 20,
+    }
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    tolerance: float,
+) -> List[str]:
+    """Names of benchmarks slower than baseline by more than tolerance"""
+
+    regressions = []
+
+    print(f"\n{'vs baseline':<30} {'time':>8} {'peak':>8}")
+
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+
+        base = baseline[name]
+        time_ratio = result["seconds"] / base["seconds"]
+        peak_ratio = result["peak_mib"] / base["peak_mib"] if base["peak_mib"] else 1
+        flag = ""
+
+        if time_ratio > 1 + tolerance:
+            regressions.append(name)
+            flag = "  slower"
+
+        print(f"{name:<30} {time_ratio:7.2f}x {peak_ratio:7.2f}x{flag}")
+
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--nodes", type=int, default=500, help="nodes in all-node queries"
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="server latency, seconds"
+    )
+    parser.add_argument("--fast-parse", action="store_true")
+    parser.add_argument(
+        "--full", action="store_true", help="include all-node RTM month"
+    )
+    parser.add_argument("--save", help="write results to this baseline file")
+    parser.add_argument("--compare", help="compare results to this baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    session = make_session()
+    counter = ByteCounter(session)
+    results: Dict[str, Dict[str, float]] = {}
+
+    with OasisServer(nodes=args.nodes, latency=args.latency) as server:
+        kwargs = {
+            "base_url": server.url,
+            "session": session,
+            "rate_limiter": RateLimiter(10_000, 1),
+            "fast_parse": args.fast_parse,
+        }
+
+        print(
+            f"{'benchmark':<30} {'time':>10} {'rows':>10} {'rows/s':>12} "
+            f"{'MB/s':>8} {'peak':>10}"
+        )
+
+        for name, bench in benchmarks(args.full):
+            result = measure(bench, kwargs, counter, args.repeat)
+            results[name] = result
+
+            print(
+                f"{name:<30} {result['seconds'] * 1000:8.1f}ms {result['rows']:>10,} "
+                f"{result['rows_per_s']:>12,.0f} {result['mb_per_s']:8.1f} "
+                f"{result['peak_mib']:8.1f}MiB"
+            )
+
+    if args.save:
+        meta = {
+            "nodes": args.nodes,
+            "fast_parse": args.fast_parse,
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "created": datetime.now().isoformat(timespec="seconds"),
+        }
+
+        with open(args.save, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+        if compare(results, baseline["results"], args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,535 @@
+"""asyncio client for CAISO Oasis API
+
+Async counterparts of the Oasis classes, built on aiohttp. Requests share a
+pooled connector, are bounded by a semaphore and wait on the same rate
+limiters as the sync client; zip and csv parsing run in an executor so the
+event loop is never blocked.
+"""
+
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import Executor
+from datetime import datetime
+from functools import partial
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+)
+
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+from pycaiso.oasis import (
+    DEFAULT_POOL_MAXSIZE,
+    ATLAS_DTYPES,
+    DEMAND_DTYPES,
+    Atlas,
+    NoDataAvailableError,
+    Node,
+    Oasis,
+    QueryEvent,
+    Response,
+    SystemDemand,
+    _iter_chunks,
+    _make_response,
+)
+
+if TYPE_CHECKING:
+    from pycaiso.store import LMPStore
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+DEFAULT_MAX_CONCURRENCY: int = 100
+
+
+class AsyncOasis(Oasis):
+    """Async Oasis client
+
+    Response bodies are always read into memory, so stream is not supported.
+
+    Args:
+        session (aiohttp.ClientSession): session to use; by default one is
+            created on first request and closed by close()
+        max_concurrency (int): maximum requests in flight
+        limit (int): maximum connections in the created session's pool
+        limit_per_host (int): maximum connections per host in the created
+            session's pool
+        executor (concurrent.futures.Executor): executor for parsing; defaults
+            to the event loop's default executor
+        **kwargs: passed to Oasis, e.g. rate_limiter; not stream
+    """
+
+    def __init__(
+        self,
+        session: Optional["aiohttp.ClientSession"] = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        limit: int = DEFAULT_MAX_CONCURRENCY,
+        limit_per_host: int = DEFAULT_POOL_MAXSIZE,
+        executor: Optional[Executor] = None,
+        **kwargs: Any,
+    ) -> None:
+
+        if aiohttp is None:
+            raise ImportError("AsyncOasis requires aiohttp: pip install aiohttp")
+
+        if kwargs.get("stream"):
+            raise ValueError("AsyncOasis does not support stream; use Oasis")
+
+        Oasis.__init__(self, **kwargs)
+
+        self.session: Any = session
+        self._owns_session = session is None
+        self.max_concurrency = max_concurrency
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.executor = executor
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> "AsyncOasis":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Close the session if it was created by this client"""
+
+        if self._owns_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def _get_session(self) -> "aiohttp.ClientSession":
+        if self.session is None:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit, limit_per_host=self.limit_per_host
+            )
+            self.session = aiohttp.ClientSession(connector=connector)
+
+        return self.session
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # created lazily so it binds to the running loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        return self._semaphore
+
+    async def request(self, params: Dict[str, Any]) -> Response:  # type: ignore
+        """Make http request
+
+        Async counterpart of Oasis.request; cache reads and writes run in the
+        executor, transient failures are retried according to the retry
+        policy, and replays are served and recorded and hooks called as in
+        Oasis.request
+
+        Args:
+            params (dict): keyword params to construct request
+
+        Returns:
+            response: requests response object holding the downloaded body
+        """
+
+        if not self.hooks:
+            return await self._request_async(params, None)
+
+        event = QueryEvent(params, self.base_url)
+
+        try:
+            resp = await self._request_async(params, event)
+        except Exception as e:
+            event.error = e
+            self._emit(event, "request")
+            raise
+
+        resp.event = event  # type: ignore
+        self._emit(event, "request")
+
+        return resp
+
+    async def _request_async(
+        self, params: Dict[str, Any], event: Optional[QueryEvent]
+    ) -> Response:
+        if self.replay is not None:
+            loaded = await self._run(self.replay.load, self.base_url, params)
+
+            if loaded is not None:
+                resp, delay = loaded
+
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+                if event is not None:
+                    event.source, event.status_code = "replay", resp.status_code
+                    event.bytes = len(resp.content)
+
+                return self._check_response(resp)
+
+        if self.cache is not None:
+            cached = await self._run(self.cache.get, self.base_url, params)
+
+            if event is not None:
+                event.cache = "miss" if cached is None else "hit"
+
+            if cached is not None:
+                if event is not None:
+                    event.source, event.bytes = "cache", len(cached.content)
+
+                return cached
+
+        attempt = 1
+
+        while True:
+            if event is not None:
+                event.attempts = attempt
+
+            try:
+                resp = await self._get_async(params, event)
+                break
+            except Exception as e:
+                retryable = self.retry.retryable(e) or isinstance(
+                    e, (aiohttp.ClientConnectionError, asyncio.TimeoutError)
+                )
+
+                if attempt >= self.retry.max_attempts or not retryable:
+                    raise
+
+                delay = self.retry.delay(attempt, e)
+                await asyncio.sleep(delay)
+                attempt += 1
+
+                if event is not None:
+                    event.add("backoff", delay)
+
+        if self.cache is not None:
+            await self._run(self.cache.put, self.base_url, params, resp)
+
+        return resp
+
+    async def _get_async(
+        self, params: Dict[str, Any], event: Optional[QueryEvent] = None
+    ) -> Response:
+        """Make a single attempt at the request"""
+
+        session = self._get_session()
+
+        if isinstance(self.timeout, tuple):
+            timeout = aiohttp.ClientTimeout(
+                sock_connect=self.timeout[0], sock_read=self.timeout[1]
+            )
+        else:
+            timeout = aiohttp.ClientTimeout(total=self.timeout)
+
+        async with self._get_semaphore():
+            wait = self.rate_limiter.reserve()
+
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            query = {key: str(value) for key, value in params.items()}
+            started = time.perf_counter()
+
+            async with session.get(self.base_url, params=query, timeout=timeout) as r:
+                received = time.perf_counter()
+                content = await r.read()
+                resp = _make_response(content, dict(r.headers), r.status, str(r.url))
+
+            if event is not None:
+                event.source = "network"
+                event.throttled += resp.status_code == 429
+                event.status_code = resp.status_code
+                event.bytes = len(content)
+                event.add("wait", wait)
+                event.add("server", received - started)
+                event.add("download", time.perf_counter() - received)
+
+        # empty results are recorded too, so they replay as empty results
+        if self.replay is not None and resp.ok:
+            await self._run(self._record, params, resp, started)
+
+        return self._check_response(resp)
+
+    async def _run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Run blocking func, e.g. parsing, in the executor"""
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args))
+
+    async def get_df_async(self, response: Response, **kwargs: Any) -> pd.DataFrame:
+        """Convert response to dataframe without blocking the event loop
+
+        Args:
+            response: requests response object
+            **kwargs: passed to get_df
+
+        Returns:
+            df (pandas.DataFrame): pandas dataframe
+        """
+
+        return await self._run(partial(self.get_df, response, **kwargs))
+
+    async def fetch(self, params: Dict[str, Any], **kwargs: Any) -> pd.DataFrame:  # type: ignore
+        """Fetch dataframe
+
+        Async counterpart of Oasis.fetch
+
+        Args:
+            params (dict): keyword params to construct request
+            **kwargs: passed to get_df
+
+        Returns:
+            df (pandas.DataFrame): pandas dataframe
+        """
+
+        return await self.get_df_async(await self.request(params), **kwargs)
+
+    async def fetch_many(  # type: ignore
+        self, params_list: Iterable[Dict[str, Any]], **kwargs: Any
+    ) -> List[Tuple[Dict[str, Any], pd.DataFrame]]:
+        """Fetch many dataframes
+
+        Async counterpart of Oasis.fetch_many; requests run concurrently,
+        bounded by max_concurrency, and results are in order of params_list
+
+        Args:
+            params_list (iterable): keyword params for each request
+            **kwargs: passed to get_df
+
+        Returns:
+            results (list): (params, df) for each set of params
+        """
+
+        async def job(params: Dict[str, Any]) -> Tuple[Dict[str, Any], pd.DataFrame]:
+            return params, await self.fetch(params, **kwargs)
+
+        return await asyncio.gather(*(job(params) for params in params_list))
+
+
+class AsyncNode(AsyncOasis, Node):
+    """CAISO PNode, async
+
+    The local LMP store is sync only, so store is not supported; use Node
+    with a store instead.
+    """
+
+    def __init__(
+        self, node: str, store: Optional["LMPStore"] = None, **kwargs: Any
+    ) -> None:
+
+        if store is not None:
+            raise ValueError("AsyncNode does not support a store; use Node")
+
+        self.node = node
+        self.store = None
+        AsyncOasis.__init__(self, **kwargs)
+
+    def __repr__(self):
+        return f"AsyncNode(node='{self.node}')"
+
+    async def get_lmps(  # type: ignore
+        self,
+        start: datetime,
+        end: Optional[datetime] = None,
+        market: str = "DAM",
+        output: str = "long",
+        tz: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """Get LMPs
+
+        Async counterpart of Node.get_lmps; windows are fetched concurrently
+
+        Args:
+            start (datetime.datetime): start date, inclusive
+            end (datetime.datetime): end date, exclusive
+            market (str): market for prices; must be "DAM", "RTM", or "RTPD"
+            output (str): "long" for a row per component, "wide" for a row
+                per interval with a column per component
+            tz (str): parse interval times to timestamps in tz, e.g. "UTC" or
+                "America/Los_Angeles", and index by interval start
+
+        Returns:
+            (pandas.DataFrame): Pandas dataframe containing the LMPs for given period, market
+        """
+
+        if output not in ("long", "wide"):
+            raise ValueError("output must be 'long' or 'wide'")
+
+        windows = self._lmp_windows(start, end, market)
+        params_list = self._lmp_params_windows(windows, market)
+        parse = {"wide": output == "wide", "tz": tz}
+
+        if len(params_list) == 1:
+            return await self._get_lmps_params(params_list[0], **parse)
+
+        frames: List[Optional[pd.DataFrame]] = await asyncio.gather(
+            *(self._get_lmps_or_none(params, **parse) for params in params_list)
+        )
+
+        return self._concat_lmps(frames)
+
+    async def iter_lmps(  # type: ignore
+        self,
+        start: datetime,
+        end: Optional[datetime] = None,
+        market: str = "DAM",
+        chunksize: Optional[int] = None,
+    ) -> AsyncIterator[pd.DataFrame]:
+        """Iterate LMPs
+
+        Async counterpart of Node.iter_lmps: an async generator yielding LMPs
+        window by window in time order, with up to the fetch engine's
+        max_workers windows fetched ahead
+
+        Args:
+            start (datetime.datetime): start date, inclusive
+            end (datetime.datetime): end date, exclusive
+            market (str): market for prices; must be "DAM", "RTM", or "RTPD"
+            chunksize (int): maximum rows per frame; by default one frame per window
+
+        Returns:
+            (async iterator): sorted LMP frames in time order
+        """
+
+        windows = self._lmp_windows(start, end, market)
+        params_list = iter(self._lmp_params_windows(windows, market))
+        pending: Deque["asyncio.Future[Optional[pd.DataFrame]]"] = deque()
+
+        def submit() -> None:
+            params = next(params_list, None)
+
+            if params is not None:
+                pending.append(asyncio.ensure_future(self._get_lmps_or_none(params)))
+
+        for _ in range(self.engine.max_workers):
+            submit()
+
+        try:
+            while pending:
+                df = await pending.popleft()
+                submit()
+
+                if df is not None:
+                    for chunk in _iter_chunks(df, chunksize):
+                        yield chunk
+        finally:
+            for future in pending:
+                future.cancel()
+
+    async def _get_lmps_params(  # type: ignore
+        self, params: Dict[str, Any], **parse: Any
+    ) -> pd.DataFrame:
+
+        resp = await self.request(params)
+
+        return await self._run(partial(self._parse_lmps, resp, **parse))
+
+    async def _get_lmps_or_none(  # type: ignore
+        self, params: Dict[str, Any], **parse: Any
+    ) -> Optional[pd.DataFrame]:
+
+        try:
+            return await self._get_lmps_params(params, **parse)
+        except NoDataAvailableError:
+            return None
+
+    async def get_month_lmps(self, year: int, month: int) -> pd.DataFrame:  # type: ignore
+        """Get LMPs for entire month
+
+        Async counterpart of Node.get_month_lmps
+
+        Args:
+            year(int): year of LMPs desired
+            month(int): month of LMPs desired
+
+        Returns:
+            (pandas.DataFrame): Pandas dataframe containing the LMPs for given month
+        """
+
+        start: datetime = datetime(year, month, 1)
+        end: datetime = start + relativedelta(months=1)
+
+        return await self.get_lmps(start, end)
+
+
+class AsyncAtlas(AsyncOasis, Atlas):
+    """Atlas data, async"""
+
+    def __init__(self, **kwargs: Any) -> None:
+        AsyncOasis.__init__(self, **kwargs)
+
+    async def get_pnodes(self, start: datetime, end: datetime) -> pd.DataFrame:  # type: ignore
+        """Get pricing nodes
+
+        Async counterpart of Atlas.get_pnodes
+
+        Args:
+            start (datetime.datetime): start date
+            end (datetime.datetime): end date
+
+        Returns:
+            (pandas.DataFrame): List of pricing nodes
+        """
+
+        self._validate_date_range(start, end)
+
+        return await self.fetch(
+            self._pnodes_params(start, end), dtype=self._dtypes(ATLAS_DTYPES)
+        )
+
+
+class AsyncSystemDemand(AsyncOasis, SystemDemand):
+    """System Demand, async"""
+
+    def __init__(self, **kwargs: Any) -> None:
+        AsyncOasis.__init__(self, **kwargs)
+
+    async def get_peak_demand_forecast(  # type: ignore
+        self, start: datetime, end: datetime
+    ) -> pd.DataFrame:
+        """Get peak demand forecast
+
+        Async counterpart of SystemDemand.get_peak_demand_forecast
+
+        Args:
+            start (datetime.datetime): start date
+            end (datetime.datetime): end date
+
+        Returns:
+            (pandas.DataFrame): peak demand forecast
+        """
+
+        return await self.fetch(
+            self._forecast_params("SLD_FCST_PEAK", start, end),
+            dtype=self._dtypes(DEMAND_DTYPES),
+        )
+
+    async def get_demand_forecast(  # type: ignore
+        self, start: datetime, end: datetime
+    ) -> pd.DataFrame:
+        """Get demand forecast
+
+        Async counterpart of SystemDemand.get_demand_forecast
+
+        Args:
+            start (datetime.datetime): start date
+            end (datetime.datetime): end date
+
+        Returns:
+            (pandas.DataFrame): demand forecast
+        """
+
+        return await self.fetch(
+            self._forecast_params("SLD_FCST", start, end),
+            dtype=self._dtypes(DEMAND_DTYPES),
+        )
@@ -0,0 +1,590 @@
+"""Resumable backfills
+
+Plans long pulls of LMPs, pricing nodes and demand forecasts as windows in a
+SQLite manifest and works through them, checkpointing every window as it
+completes. A rerun resumes where the last one stopped, and several worker
+processes can run against one manifest, each claiming windows atomically and
+sharing the OASIS request rate through the manifest.
+"""
+
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+)
+
+import pandas as pd
+
+from pycaiso.cache import write_atomic
+from pycaiso.oasis import (
+    ATLAS_DTYPES,
+    DEFAULT_RATE_INTERVAL,
+    DEFAULT_RATE_LIMIT,
+    DEMAND_DTYPES,
+    MAX_WINDOW_DAYS,
+    Atlas,
+    Node,
+    NoDataAvailableError,
+    Oasis,
+    RateLimiter,
+    Response,
+    SystemDemand,
+    _body_size,
+)
+
+DEFAULT_MAX_ATTEMPTS: int = 3
+
+# running windows not updated for this long are assumed to belong to a dead worker
+DEFAULT_LEASE: float = 3600.0
+
+SCHEMA: str = """
+CREATE TABLE IF NOT EXISTS windows (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    market TEXT NOT NULL,
+    window_start TEXT NOT NULL,
+    window_end TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    rows INTEGER,
+    bytes INTEGER,
+    error TEXT,
+    worker TEXT,
+    updated REAL,
+    UNIQUE (kind, key, market, window_start, window_end)
+)
+"""
+
+# token bucket of the ManifestRateLimiter of a manifest
+RATE_SCHEMA: str = """
+CREATE TABLE IF NOT EXISTS rate (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL
+)
+"""
+
+
+class Window(NamedTuple):
+    """Window of a backfill
+
+    Attributes:
+        id (int): manifest row id
+        kind (str): "lmps", "pnodes" or "demand"
+        key (str): node for LMPs, query name for demand forecasts
+        market (str): market for LMPs
+        start (datetime.datetime): start date, inclusive
+        end (datetime.datetime): end date, exclusive
+        attempts (int): attempts so far, including the current one
+    """
+
+    id: int
+    kind: str
+    key: str
+    market: str
+    start: datetime
+    end: datetime
+    attempts: int
+
+
+def default_worker() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _is_dead_worker(worker: str) -> bool:
+    """Whether worker is a default-named worker of this host that has exited"""
+
+    host, _, pid = worker.rpartition(":")
+
+    # os.kill(pid, 0) is not a liveness check on Windows; rely on the lease there
+    if host != socket.gethostname() or not pid.isdigit() or os.name == "nt":
+        return False
+
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        return False
+
+    return False
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    db = sqlite3.connect(path, timeout=60, isolation_level=None)
+    db.execute("PRAGMA journal_mode=WAL")
+
+    return db
+
+
+@contextmanager
+def _immediate(db: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    """Write transaction, holding the database's write lock from the start"""
+
+    db.execute("BEGIN IMMEDIATE")
+
+    try:
+        yield db
+    except BaseException:
+        db.execute("ROLLBACK")
+        raise
+
+    db.execute("COMMIT")
+
+
+class ManifestRateLimiter(RateLimiter):
+    """Token bucket rate limiter shared through a manifest
+
+    Keeps the bucket in a row of the manifest, updated in write transactions
+    on the wall clock, so independently started worker processes on one
+    manifest together stay within the rate. Backfill uses one unless given
+    a rate_limiter.
+
+    Args:
+        path (str): manifest file
+        requests (int): requests per interval, across all workers
+        interval (float): seconds
+        burst (int): largest burst; defaults to requests
+    """
+
+    def __init__(
+        self,
+        path: str,
+        requests: int = DEFAULT_RATE_LIMIT,
+        interval: float = DEFAULT_RATE_INTERVAL,
+        burst: Optional[int] = None,
+    ) -> None:
+        super().__init__(requests, interval, burst)
+        self.path = path
+        self._local = threading.local()
+
+    def __repr__(self):
+        return (
+            f"ManifestRateLimiter(path='{self.path}', requests={self.requests}, "
+            f"interval={self.interval})"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite connections are per thread and must not cross a fork
+        if getattr(self._local, "pid", None) != os.getpid():
+            self._local.db = _connect(self.path)
+            self._local.db.execute(RATE_SCHEMA)
+            self._local.pid = os.getpid()
+
+        return self._local.db
+
+    def _update(self, take: Callable[[float], float]) -> float:
+        """Replace the bucket's tokens by take(tokens), returning the new tokens"""
+
+        with _immediate(self._connect()) as db:
+            now = time.time()
+            row = db.execute("SELECT tokens, updated FROM rate WHERE id = 0").fetchone()
+            tokens = self.capacity
+
+            if row is not None:
+                elapsed = max(0.0, now - row[1])
+                tokens = min(self.capacity, row[0] + elapsed * self.rate)
+
+            tokens = take(tokens)
+            db.execute(
+                "INSERT OR REPLACE INTO rate (id, tokens, updated) VALUES (0, ?, ?)",
+                (tokens, now),
+            )
+
+        return tokens
+
+    def reserve(self) -> float:
+        tokens = self._update(lambda tokens: tokens - 1)
+
+        return max(0.0, -tokens / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        self._update(lambda tokens: min(tokens, 0.0) - seconds * self.rate)
+
+
+class Backfill:
+    """Resumable backfill
+
+    Windows move from pending to running to done, or to failed with the
+    error recorded. Failed windows are retried, after the pending ones,
+    until they have been attempted max_attempts times. Each fetched window is
+    handed to sink; by default it is written to a Parquet file under
+    output_dir.
+
+    Unless given a rate_limiter, the clients of every Backfill on the same
+    manifest share a ManifestRateLimiter, so worker processes together keep
+    to OASIS' rate limit. A given rate_limiter applies to this process only.
+
+    Args:
+        path (str): manifest file, created if missing
+        output_dir (str): directory for the default sink; defaults to the
+            manifest's directory
+        sink (callable): called with (window, df) for every window with data
+        max_attempts (int): attempts per window
+        lease (float): seconds after which another worker may take over a
+            running window
+        **kwargs: passed to Node, Atlas and SystemDemand, e.g. session, retry
+            or rate_limiter
+    """
+
+    def __init__(
+        self,
+        path: str,
+        output_dir: Optional[str] = None,
+        sink: Optional[Callable[[Window, pd.DataFrame], None]] = None,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        lease: float = DEFAULT_LEASE,
+        **kwargs: Any,
+    ) -> None:
+        self.path = path
+        self.output_dir = output_dir or os.path.dirname(os.path.abspath(path))
+        self.sink = sink or self.write
+        self.max_attempts = max_attempts
+        self.lease = lease
+        self.kwargs = kwargs
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._pid = os.getpid()
+
+        with self._transaction() as db:
+            db.execute(SCHEMA)
+
+        if kwargs.get("rate_limiter") is None:
+            self.kwargs["rate_limiter"] = ManifestRateLimiter(path)
+
+    def __repr__(self):
+        return f"Backfill(path='{self.path}')"
+
+    def _connect(self) -> sqlite3.Connection:
+        # connections must not cross a fork
+        if self._db is None or self._pid != os.getpid():
+            self._db = _connect(self.path)
+            self._pid = os.getpid()
+
+        return self._db
+
+    def _transaction(self) -> ContextManager[sqlite3.Connection]:
+        return _immediate(self._connect())
+
+    def _add(
+        self,
+        kind: str,
+        key: str,
+        market: str,
+        start: datetime,
+        end: datetime,
+        window_days: int,
+    ) -> int:
+        Oasis._validate_date_range(start, end)
+
+        rows = [
+            (kind, key, market, s.isoformat(), e.isoformat())
+            for s, e in Oasis._split_date_range(start, end, window_days)
+        ]
+
+        with self._transaction() as db:
+            before = db.total_changes
+            db.executemany(
+                "INSERT OR IGNORE INTO windows "
+                "(kind, key, market, window_start, window_end) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+
+            return db.total_changes - before
+
+    def add_lmps(
+        self,
+        nodes: Iterable[str],
+        start: datetime,
+        end: datetime,
+        market: str = "DAM",
+        window_days: int = MAX_WINDOW_DAYS,
+    ) -> int:
+        """Plan LMPs
+
+        Args:
+            nodes (iterable): pricing nodes
+            start (datetime.datetime): start date, inclusive
+            end (datetime.datetime): end date, exclusive
+            market (str): market for prices; must be "DAM", "RTM", or "RTPD"
+            window_days (int): days per window
+
+        Returns:
+            added (int): number of windows added; windows already planned
+                are kept as they are
+        """
+
+        return sum(
+            self._add("lmps", node, market, start, end, window_days) for node in nodes
+        )
+
+    def add_pnodes(
+        self, start: datetime, end: datetime, window_days: int = MAX_WINDOW_DAYS
+    ) -> int:
+        """Plan pricing nodes
+
+        Args:
+            start (datetime.datetime): start date, inclusive
+            end (datetime.datetime): end date, exclusive
+            window_days (int): days per window
+
+        Returns:
+            added (int): number of windows added
+        """
+
+        return self._add("pnodes", "", "", start, end, window_days)
+
+    def add_demand_forecast(
+        self,
+        start: datetime,
+        end: datetime,
+        peak: bool = False,
+        window_days: int = MAX_WINDOW_DAYS,
+    ) -> int:
+        """Plan demand forecasts
+
+        Args:
+            start (datetime.datetime): start date, inclusive
+            end (datetime.datetime): end date, exclusive
+            peak (bool): plan peak demand forecasts instead
+            window_days (int): days per window
+
+        Returns:
+            added (int): number of windows added
+        """
+
+        queryname = "SLD_FCST_PEAK" if peak else "SLD_FCST"
+
+        return self._add("demand", queryname, "", start, end, window_days)
+
+    def claim(self, worker: Optional[str] = None) -> Optional[Window]:
+        """Claim next window
+
+        Takes the first pending window, or running window whose lease expired,
+        that belongs to worker, e.g. after the worker was restarted, or whose
+        default-named worker on this host has exited, and then the first
+        failed window with attempts left
+
+        Args:
+            worker (str): worker name; defaults to host and process id
+
+        Returns:
+            window (Window): claimed window, or None if there is none left
+        """
+
+        worker = worker or default_worker()
+        now = time.time()
+
+        with self._transaction() as db:
+            owners = db.execute(
+                "SELECT DISTINCT worker FROM windows WHERE status = 'running'"
+            ).fetchall()
+            dead = [owner for (owner,) in owners if _is_dead_worker(owner)]
+            held = ", ".join("?" * len(dead + [worker]))
+
+            row = db.execute(
+                "SELECT id, kind, key, market, window_start, window_end, attempts "
+                "FROM windows WHERE status = 'pending' "
+                "OR (status = 'failed' AND attempts < ?) "
+                f"OR (status = 'running' AND (worker IN ({held}) OR updated < ?)) "
+                "ORDER BY status = 'failed', id LIMIT 1",
+                (self.max_attempts, *dead, worker, now - self.lease),
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            db.execute(
+                "UPDATE windows SET status = 'running', attempts = attempts + 1, "
+                "worker = ?, updated = ? WHERE id = ?",
+                (worker, now, row[0]),
+            )
+
+        return Window(
+            row[0],
+            row[1],
+            row[2],
+            row[3],
+            datetime.fromisoformat(row[4]),
+            datetime.fromisoformat(row[5]),
+            row[6] + 1,
+        )
+
+    def _finish(
+        self,
+        window: Window,
+        status: str,
+        rows: Optional[int] = None,
+        nbytes: Optional[int] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE windows SET status = ?, rows = ?, bytes = ?, error = ?, "
+                "updated = ? WHERE id = ?",
+                (status, rows, nbytes, error, time.time(), window.id),
+            )
+
+    def fetch(self, window: Window) -> Optional[Response]:
+        """Request window
+
+        Args:
+            window (Window): window to request
+
+        Returns:
+            response: requests response object, or None if OASIS has no data
+        """
+
+        client = self._client(window)
+
+        if window.kind == "lmps":
+            params = client._lmp_params(window.start, window.end, window.market)
+        elif window.kind == "pnodes":
+            params = client._pnodes_params(window.start, window.end)
+        else:
+            params = client._forecast_params(window.key, window.start, window.end)
+
+        try:
+            return client.request(params)
+        except NoDataAvailableError:
+            return None
+
+    def parse(self, window: Window, resp: Response) -> pd.DataFrame:
+        """Parse response of window into a dataframe"""
+
+        client = self._client(window)
+
+        if window.kind == "lmps":
+            return client._parse_lmps(resp)
+
+        dtypes = ATLAS_DTYPES if window.kind == "pnodes" else DEMAND_DTYPES
+
+        return client.get_df(resp, dtype=client._dtypes(dtypes))
+
+    def _client(self, window: Window) -> Any:
+        if window.kind == "lmps":
+            return Node(window.key, **self.kwargs)
+
+        if window.kind == "pnodes":
+            return Atlas(**self.kwargs)
+
+        return SystemDemand(**self.kwargs)
+
+    def run(
+        self, worker: Optional[str] = None, limit: Optional[int] = None
+    ) -> Dict[str, int]:
+        """Run backfill
+
+        Claims and fetches windows one at a time until none are left, or
+        limit windows were processed. Run one per process to work in parallel;
+        windows of a crashed worker on this host are resumed right away, those
+        of other hosts once their lease expires.
+
+        Args:
+            worker (str): worker name; defaults to host and process id
+            limit (int): maximum windows to process
+
+        Returns:
+            counts (dict): windows done and failed by this run, and windows
+                still running in other workers when it stopped
+        """
+
+        worker = worker or default_worker()
+        counts = {"done": 0, "failed": 0}
+
+        while limit is None or sum(counts.values()) < limit:
+            window = self.claim(worker)
+
+            if window is None:
+                break
+
+            try:
+                resp = self.fetch(window)
+                nbytes = 0 if resp is None else _body_size(resp)
+                df = None if resp is None else self.parse(window, resp)
+
+                if df is not None:
+                    self.sink(window, df)
+
+            except Exception as e:
+                self._finish(window, "failed", error=f"{type(e).__name__}: {e}")
+                counts["failed"] += 1
+                continue
+
+            self._finish(window, "done", 0 if df is None else len(df), nbytes)
+            counts["done"] += 1
+
+        counts["running"] = self.status().get("running", 0)
+
+        return counts
+
+    def window_path(self, window: Window) -> str:
+        """Path of the default sink's file for window"""
+
+        parts = [self.output_dir, window.kind]
+
+        if window.market:
+            parts.append(f"market={window.market}")
+
+        if window.key:
+            parts.append(f"key={window.key}")
+
+        name = f"{window.start:%Y%m%dT%H%M}-{window.end:%Y%m%dT%H%M}.parquet"
+
+        return os.path.join(*parts, name)
+
+    def write(self, window: Window, df: pd.DataFrame) -> None:
+        """Default sink, writing window atomically to a Parquet file"""
+
+        path = self.window_path(window)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        write_atomic(path, df.to_parquet(index=False))
+
+    def status(self) -> Dict[str, int]:
+        """Count windows by status"""
+
+        rows = self._connect().execute(
+            "SELECT status, COUNT(*) FROM windows GROUP BY status"
+        )
+
+        return dict(rows.fetchall())
+
+    def totals(self) -> Dict[str, int]:
+        """Sum rows and bytes of done windows"""
+
+        rows, nbytes = (
+            self._connect()
+            .execute(
+                "SELECT COALESCE(SUM(rows), 0), COALESCE(SUM(bytes), 0) "
+                "FROM windows WHERE status = 'done'"
+            )
+            .fetchone()
+        )
+
+        return {"rows": rows, "bytes": nbytes}
+
+    def failures(self) -> List[Dict[str, Any]]:
+        """List failed windows with their last error"""
+
+        cursor = self._connect().execute(
+            "SELECT kind, key, market, window_start, window_end, attempts, error "
+            "FROM windows WHERE status = 'failed' ORDER BY id"
+        )
+        columns = [c[0] for c in cursor.description]
+
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
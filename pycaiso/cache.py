@@ -0,0 +1,304 @@
+"""On-disk cache of OASIS responses
+
+Stores raw zip bodies keyed by the canonicalized query params, so repeated
+pulls of settled historical data never touch the network.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+from pycaiso.oasis import FileResponse, Response, _make_response
+
+# prices can still be corrected by recalculation settlement statements; data
+# older than this is treated as settled
+SETTLEMENT_WINDOW: timedelta = timedelta(days=90)
+
+# (minimum data age, time to live); None never expires
+DEFAULT_TTL_RULES: List[Tuple[timedelta, Optional[timedelta]]] = [
+    (timedelta(0), timedelta(hours=1)),
+    (timedelta(days=7), timedelta(days=1)),
+    (SETTLEMENT_WINDOW, None),
+]
+
+DEFAULT_MAX_BYTES: int = 2 * 1024 ** 3
+
+
+def canonical_params(params: Dict[str, Any], base_url: str = "") -> str:
+    """Canonicalize query params
+
+    Params differing only in key case, key order or value type (1 vs "1")
+    canonicalize to the same string
+
+    Args:
+        params (dict): keyword params of request
+        base_url (str): url the params are sent to
+
+    Returns:
+        canonical (str): canonical JSON string
+    """
+
+    items = {str(key).lower(): str(value) for key, value in params.items()}
+    return json.dumps({"url": base_url, "params": items}, sort_keys=True)
+
+
+def params_key(params: Dict[str, Any], base_url: str = "") -> str:
+    """Hash canonical query params into a cache key"""
+
+    return hashlib.sha256(canonical_params(params, base_url).encode()).hexdigest()
+
+
+def write_atomic(path: str, data: Any) -> None:
+    """Write bytes or the contents of a file to path atomically"""
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if isinstance(data, bytes):
+                f.write(data)
+            else:
+                shutil.copyfileobj(data, f)
+
+        os.replace(tmp_path, path)
+
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _entry_paths(directory: str, key: str) -> Tuple[str, str]:
+    """Paths of the zip body and JSON metadata of an entry"""
+
+    base = os.path.join(directory, key)
+    return base + ".zip", base + ".json"
+
+
+def _open_entry(directory: str, key: str) -> Tuple[Dict[str, Any], BinaryIO]:
+    """Read the metadata and open the body of an entry
+
+    Raises:
+        OSError: if the entry does not exist
+        ValueError: if its metadata is corrupt
+    """
+
+    body_path, meta_path = _entry_paths(directory, key)
+
+    with open(meta_path) as f:
+        meta = json.load(f)
+
+    return meta, open(body_path, "rb")
+
+
+def _write_entry(
+    directory: str, key: str, response: Response, meta: Dict[str, Any]
+) -> None:
+    """Write the body and metadata of an entry atomically"""
+
+    body_path, meta_path = _entry_paths(directory, key)
+
+    # body first: an entry only becomes visible once its metadata exists
+    if isinstance(response, FileResponse):
+        response.file.seek(0)
+        write_atomic(body_path, response.file)
+    else:
+        write_atomic(body_path, response.content)
+
+    write_atomic(meta_path, json.dumps(meta).encode())
+
+
+def default_cache_dir() -> str:
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join("~", ".cache")
+    return os.path.join(os.path.expanduser(base), "pycaiso")
+
+
+class ResponseCache:
+    """On-disk response cache
+
+    Entries are written atomically, so several threads or processes can share
+    one directory. Entries expire according to ttl_rules based on the age of
+    the data they hold, and the least recently used entries are evicted once
+    the cache exceeds max_bytes.
+
+    Args:
+        path (str): cache directory; defaults to ~/.cache/pycaiso
+        max_bytes (int): maximum total size of cached bodies
+        ttl_rules (list): (minimum data age, time to live) pairs; the rule
+            with the largest minimum age not above the data's age applies, and
+            a time to live of None never expires
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        ttl_rules: Optional[List[Tuple[timedelta, Optional[timedelta]]]] = None,
+    ) -> None:
+        self.path = path or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.ttl_rules = sorted(ttl_rules or DEFAULT_TTL_RULES, key=lambda r: r[0])
+
+        os.makedirs(self.path, exist_ok=True)
+
+    def __repr__(self):
+        return f"ResponseCache(path='{self.path}')"
+
+    def ttl(self, params: Dict[str, Any]) -> Optional[timedelta]:
+        """Get time to live
+
+        Looks up the TTL rule for the age of the data requested, measured from
+        the end of the requested period
+
+        Args:
+            params (dict): keyword params of request
+
+        Returns:
+            ttl (datetime.timedelta): time to live, or None to never expire
+        """
+
+        age = timedelta(0)
+        end = params.get("enddatetime")
+
+        if end is not None:
+            try:
+                now = datetime.now(timezone.utc).replace(tzinfo=None)
+                age = now - datetime.strptime(str(end), "%Y%m%dT%H:%M-0000")
+            except ValueError:
+                pass
+
+        ttl: Optional[timedelta] = self.ttl_rules[0][1]
+
+        for min_age, rule_ttl in self.ttl_rules:
+            if age >= min_age:
+                ttl = rule_ttl
+
+        return ttl
+
+    def get(
+        self, base_url: str, params: Dict[str, Any], stream: bool = False
+    ) -> Optional[Response]:
+        """Get cached response
+
+        Args:
+            base_url (str): url the params are sent to
+            params (dict): keyword params of request
+            stream (bool): return a FileResponse reading the cached file
+                instead of loading the body into memory
+
+        Returns:
+            response: cached response, or None on a miss or expired entry
+        """
+
+        try:
+            # open file handles stay readable if the entry is evicted meanwhile
+            meta, f = _open_entry(self.path, params_key(params, base_url))
+        except (OSError, ValueError):
+            return None
+
+        try:
+            expired = meta["expires"] is not None and meta["expires"] < time.time()
+
+            # access time drives LRU eviction
+            if not expired:
+                os.utime(f.name)
+
+        except (OSError, KeyError):
+            expired = True
+
+        if expired:
+            f.close()
+            return None
+
+        if stream:
+            return FileResponse(f, meta["headers"], url=meta.get("url"))
+
+        with f:
+            content = f.read()
+
+        return _make_response(content, meta["headers"], url=meta.get("url"))
+
+    def put(self, base_url: str, params: Dict[str, Any], response: Response) -> None:
+        """Cache response
+
+        Args:
+            base_url (str): url the params are sent to
+            params (dict): keyword params of request
+            response: response to cache
+        """
+
+        ttl = self.ttl(params)
+        meta = {
+            "params": json.loads(canonical_params(params, base_url)),
+            "headers": {"content-disposition": response.headers["content-disposition"]},
+            "url": response.url,
+            "stored": time.time(),
+            "expires": None if ttl is None else time.time() + ttl.total_seconds(),
+        }
+
+        _write_entry(self.path, params_key(params, base_url), response, meta)
+
+        self.evict()
+
+    def evict(self) -> int:
+        """Evict least recently used entries
+
+        Removes entries, oldest access first, until the cache fits max_bytes
+
+        Returns:
+            removed (int): number of entries removed
+        """
+
+        entries = []
+        total = 0
+
+        with os.scandir(self.path) as it:
+            for entry in it:
+                if not entry.name.endswith(".zip"):
+                    continue
+
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+
+                entries.append((stat.st_mtime, stat.st_size, entry.name[:-4]))
+                total += stat.st_size
+
+        removed = 0
+
+        for _, size, key in sorted(entries):
+            if total <= self.max_bytes:
+                break
+
+            body_path, meta_path = _entry_paths(self.path, key)
+
+            # other processes may be evicting the same entry
+            for path in (meta_path, body_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+            total -= size
+            removed += 1
+
+        return removed
+
+    def clear(self) -> None:
+        """Remove every entry"""
+
+        with os.scandir(self.path) as it:
+            for entry in it:
+                if entry.name.endswith((".zip", ".json")):
+                    try:
+                        os.remove(entry.path)
+                    except FileNotFoundError:
+                        pass
@@ -0,0 +1,409 @@
+"""Metrics and tracing of OASIS queries
+
+Hooks aggregating the QueryEvents of clients into Prometheus counters and
+histograms per OASIS query name, exposed as Prometheus text by a dump or a
+local endpoint, and turning them into OpenTelemetry spans around request
+and get_df. Both are opt-in hooks, so a client without them builds no events
+and pays nothing:
+
+    metrics = Metrics()
+    node = Node.SP15(hooks=[metrics, Spans()])
+    server = metrics.serve(port=9464)
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pycaiso.oasis import QueryEvent
+
+try:
+    from opentelemetry import trace
+except ImportError:  # pragma: no cover
+    trace = None
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+)
+
+# stages timed by request, the rest by get_df
+REQUEST_STAGES: Tuple[str, ...] = ("wait", "server", "download", "backoff")
+
+CONTENT_TYPE: str = "text/plain; version=0.0.4; charset=utf-8"
+
+# name: (type, help) of every metric, in exposition order
+METRICS: Dict[str, Tuple[str, str]] = {
+    "pycaiso_requests_total": ("counter", "Requests by query, source and status"),
+    "pycaiso_retries_total": ("counter", "Requests retried"),
+    "pycaiso_throttled_total": ("counter", "Requests answered with a 429"),
+    "pycaiso_cache_total": ("counter", "Response cache lookups by result"),
+    "pycaiso_errors_total": ("counter", "Failed requests and parses by error"),
+    "pycaiso_bytes_total": ("counter", "Zipped response bytes by source"),
+    "pycaiso_decompressed_bytes_total": ("counter", "Csv bytes parsed"),
+    "pycaiso_rows_total": ("counter", "Rows parsed"),
+    "pycaiso_request_seconds": ("histogram", "Request time by source"),
+    "pycaiso_parse_seconds": ("histogram", "Parse time"),
+    "pycaiso_stage_seconds": ("histogram", "Time per request and parse stage"),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative histogram
+
+    Args:
+        buckets (iterable): upper bounds of the buckets, in seconds
+    """
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets))
+        self.counts: List[int] = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def __repr__(self):
+        return f"Histogram(count={self.count}, sum={self.sum})"
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate quantile
+
+        Interpolates linearly within the bucket holding the quantile, like
+        Prometheus' histogram_quantile
+
+        Args:
+            q (float): quantile, between 0 and 1
+
+        Returns:
+            (float): estimated value, nan without observations
+        """
+
+        if not self.count:
+            return float("nan")
+
+        rank = q * self.count
+        seen = 0
+
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+
+            seen += count
+
+        return self.buckets[-1]
+
+
+class Metrics:
+    """Aggregated metrics of OASIS queries
+
+    A hook: pass it in a client's hooks, or several clients' to aggregate
+    them together. Counts requests, retries, 429s, cache lookups, errors,
+    bytes and rows, and observes request, parse and stage times in
+    histograms, all labelled by OASIS query name. Safe to share between
+    threads.
+
+    Args:
+        buckets (iterable): histogram bucket upper bounds, in seconds
+    """
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"Metrics(buckets={self.buckets})"
+
+    def __call__(self, event: QueryEvent) -> None:
+        query = event.query or "unknown"
+
+        with self._lock:
+            if event.phase == "request":
+                self._observe_request(event, query)
+            else:
+                self._observe_parse(event, query)
+
+            if event.error is not None:
+                self._inc(
+                    "pycaiso_errors_total",
+                    query=query,
+                    phase=event.phase,
+                    error=type(event.error).__name__,
+                )
+
+    def _observe_request(self, event: QueryEvent, query: str) -> None:
+        source = event.source or "none"
+        status = str(event.status_code) if event.status_code else "none"
+
+        self._inc("pycaiso_requests_total", query=query, source=source, status=status)
+        self._inc("pycaiso_bytes_total", event.bytes, query=query, source=source)
+
+        if event.attempts > 1:
+            self._inc("pycaiso_retries_total", event.attempts - 1, query=query)
+
+        if event.throttled:
+            self._inc("pycaiso_throttled_total", event.throttled, query=query)
+
+        if event.cache is not None:
+            self._inc("pycaiso_cache_total", query=query, result=event.cache)
+
+        self._observe(
+            "pycaiso_request_seconds", event.duration, query=query, source=source
+        )
+
+        for stage, seconds in event.stages.items():
+            self._observe("pycaiso_stage_seconds", seconds, query=query, stage=stage)
+
+    def _observe_parse(self, event: QueryEvent, query: str) -> None:
+        stages = {
+            stage: seconds
+            for stage, seconds in event.stages.items()
+            if stage not in REQUEST_STAGES
+        }
+
+        self._inc("pycaiso_decompressed_bytes_total", event.decompressed, query=query)
+        self._inc("pycaiso_rows_total", event.rows, query=query)
+        self._observe("pycaiso_parse_seconds", sum(stages.values()), query=query)
+
+        for stage, seconds in stages.items():
+            self._observe("pycaiso_stage_seconds", seconds, query=query, stage=stage)
+
+    def _inc(self, name: str, value: float = 1, **labels: str) -> None:
+        """Add value to counter, holding the lock"""
+
+        counter = self.counters.setdefault(name, {})
+        key = tuple(labels.items())
+        counter[key] = counter.get(key, 0) + value
+
+    def _observe(self, name: str, value: float, **labels: str) -> None:
+        """Observe value in histogram, holding the lock"""
+
+        histograms = self.histograms.setdefault(name, {})
+        key = tuple(labels.items())
+
+        if key not in histograms:
+            histograms[key] = Histogram(self.buckets)
+
+        histograms[key].observe(value)
+
+    def value(self, name: str, **labels: str) -> float:
+        """Value of counter, summed over the labels not given"""
+
+        with self._lock:
+            return sum(
+                value
+                for key, value in self.counters.get(name, {}).items()
+                if labels.items() <= dict(key).items()
+            )
+
+    def histogram(self, name: str, **labels: str) -> Optional[Histogram]:
+        """Histogram with exactly these labels, if any were observed"""
+
+        with self._lock:
+            return self.histograms.get(name, {}).get(tuple(labels.items()))
+
+    def render(self) -> str:
+        """Metrics in Prometheus text exposition format"""
+
+        lines: List[str] = []
+
+        with self._lock:
+            for name, (kind, description) in METRICS.items():
+                series = (self.counters if kind == "counter" else self.histograms).get(
+                    name
+                )
+
+                if not series:
+                    continue
+
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} {kind}")
+
+                for key, value in sorted(series.items()):
+                    if isinstance(value, Histogram):
+                        lines.extend(_histogram_lines(name, key, value))
+                    else:
+                        lines.append(f"{name}{_labels(key)} {_number(value)}")
+
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str) -> None:
+        """Write metrics in Prometheus text format, e.g. for node_exporter's
+        textfile collector
+
+        Args:
+            path (str): file to write
+        """
+
+        with open(path, "w") as f:
+            f.write(self.render())
+
+    def serve(self, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+        """Serve metrics at /metrics on a background thread
+
+        Args:
+            host (str): interface to listen on
+            port (int): port to listen on; 0 picks a free port
+
+        Returns:
+            server: the HTTP server; server_address holds its address and
+                shutdown() stops it
+        """
+
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+
+                body = metrics.render().encode()
+
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        httpd = ThreadingHTTPServer((host, port), Handler)
+        httpd.daemon_threads = True
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+
+        return httpd
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(key: Labels) -> str:
+    if not key:
+        return ""
+
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in key) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _histogram_lines(name: str, key: Labels, histogram: Histogram) -> List[str]:
+    lines = []
+    cumulative = 0
+
+    for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+        cumulative += count
+        le = "+Inf" if bound == float("inf") else _number(bound)
+        lines.append(f"{name}_bucket{_labels(key + (('le', le),))} {cumulative}")
+
+    lines.append(f"{name}_sum{_labels(key)} {_number(histogram.sum)}")
+    lines.append(f"{name}_count{_labels(key)} {histogram.count}")
+
+    return lines
+
+
+class Spans:
+    """OpenTelemetry spans of OASIS queries
+
+    A hook recording a span per request ("oasis.request") and per parse
+    ("oasis.get_df"), timed from the event's stages and carrying the query
+    name, source, cache result, status, attempts, sizes, rows and stage
+    times as attributes; failed phases record their exception.
+
+    Args:
+        tracer: OpenTelemetry tracer, or any object with its start_span;
+            defaults to the global tracer provider's "pycaiso" tracer
+    """
+
+    def __init__(self, tracer: Any = None) -> None:
+
+        if tracer is None:
+            if trace is None:
+                raise ImportError(
+                    "Spans requires opentelemetry: pip install opentelemetry-api"
+                )
+
+            tracer = trace.get_tracer("pycaiso")
+
+        self.tracer = tracer
+
+    def __repr__(self):
+        return f"Spans(tracer={self.tracer!r})"
+
+    def __call__(self, event: QueryEvent) -> None:
+        end = time.time_ns()
+
+        if event.phase == "request":
+            name = "oasis.request"
+            start = int(event.started * 1e9)
+            attributes: Dict[str, Any] = {
+                "oasis.source": event.source or "none",
+                "oasis.attempts": event.attempts,
+                "oasis.throttled": event.throttled,
+                "oasis.bytes": event.bytes,
+            }
+
+            if event.cache is not None:
+                attributes["oasis.cache"] = event.cache
+
+            if event.status_code is not None:
+                attributes["http.status_code"] = event.status_code
+
+            stages = event.stages
+        else:
+            name = "oasis.get_df"
+            stages = {
+                stage: seconds
+                for stage, seconds in event.stages.items()
+                if stage not in REQUEST_STAGES
+            }
+            start = end - int(sum(stages.values()) * 1e9)
+            attributes = {
+                "oasis.decompressed_bytes": event.decompressed,
+                "oasis.rows": event.rows,
+            }
+
+        attributes["oasis.query"] = event.query or "unknown"
+        attributes["http.url"] = event.url
+
+        for stage, seconds in stages.items():
+            attributes[f"oasis.stage.{stage}"] = seconds
+
+        span = self.tracer.start_span(name, start_time=start, attributes=attributes)
+
+        if event.error is not None:
+            span.record_exception(event.error)
+
+            if trace is not None:
+                span.set_status(trace.Status(trace.StatusCode.ERROR, str(event.error)))
+
+        span.end(end_time=end)
@@ -1,266 +1,2283 @@
 import io
+import multiprocessing
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+import os
+import random
 import re
+import tempfile
+import threading
+import time
 import zipfile
+from csv import reader as csv_reader
 from datetime import datetime, timedelta
-from typing import List, Dict, TypeVar, Union, Optional, Any
+from email.utils import parsedate_to_datetime
+from functools import lru_cache, partial
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+    Union,
+)
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+import pandas as pd
+import pytz
+import requests
+from dateutil.relativedelta import relativedelta
+from pandas.api.types import union_categoricals
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+if TYPE_CHECKING:
+    from pycaiso.cache import ResponseCache
+    from pycaiso.replay import Replay
+    from pycaiso.store import LMPStore
+
+Response = requests.models.Response
+Session = requests.Session
+
+BASE_URL: str = "http://oasis.caiso.com/oasisapi/SingleZip?"
+
+DEFAULT_POOL_CONNECTIONS: int = 4
+DEFAULT_POOL_MAXSIZE: int = 10
+
+# CAISO asks clients to send no more than one OASIS request every 5 seconds
+DEFAULT_RATE_LIMIT: int = 1
+DEFAULT_RATE_INTERVAL: float = 5.0
+
+DEFAULT_MAX_WORKERS: int = 4
+
+DEFAULT_TIMEOUT: float = 15.0
+
+# transient statuses: throttling, and gateway and server errors
+RETRY_STATUSES: Set[int] = {429, 500, 502, 503, 504}
+RETRY_EXCEPTIONS: Tuple[type, ...] = (
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+)
+
+STREAM_CHUNK_SIZE: int = 1024 ** 2
+
+# OASIS rejects queries spanning more than 31 days
+MAX_WINDOW_DAYS: int = 31
+
+LMP_QUERY_MAPPING: Dict[str, str] = {
+    "DAM": "PRC_LMP",
+    "RTM": "PRC_INTVL_LMP",
+    "RTPD": "PRC_RTPD_LMP",
+}
+
+LMP_COLUMNS: List[str] = [
+    "INTERVALSTARTTIME_GMT",
+    "INTERVALENDTIME_GMT",
+    "OPR_DT",
+    "OPR_HR",
+    "OPR_INTERVAL",
+    "NODE_ID_XML",
+    "NODE_ID",
+    "NODE",
+    "MARKET_RUN_ID",
+    "LMP_TYPE",
+    "XML_DATA_ITEM",
+    "PNODE_RESMRID",
+    "GRP_TYPE",
+    "POS",
+    "MW",
+    "GROUP",
+]
+
+# dtypes used in fast parse mode; labels repeat on every row, so categoricals
+# and narrow numeric types cut parse time and memory
+LMP_DTYPES: Dict[str, Any] = {
+    "INTERVALSTARTTIME_GMT": "category",
+    "INTERVALENDTIME_GMT": "category",
+    "OPR_HR": "int16",
+    "OPR_INTERVAL": "int16",
+    "NODE_ID_XML": "category",
+    "NODE_ID": "category",
+    "NODE": "category",
+    "MARKET_RUN_ID": "category",
+    "LMP_TYPE": "category",
+    "XML_DATA_ITEM": "category",
+    "PNODE_RESMRID": "category",
+    "GRP_TYPE": "category",
+    "POS": "float32",
+    "MW": "float32",
+    "PRC": "float32",
+    "GROUP": "int16",
+}
+
+ATLAS_DTYPES: Dict[str, Any] = {
+    "PNODE_TYPE": "category",
+    "APNODE_TYPE": "category",
+    "START_DATE_GMT": "category",
+    "END_DATE_GMT": "category",
+}
+
+DEMAND_DTYPES: Dict[str, Any] = {
+    "INTERVALSTARTTIME_GMT": "category",
+    "INTERVALENDTIME_GMT": "category",
+    "OPR_HR": "int16",
+    "OPR_INTERVAL": "int16",
+    "MARKET_RUN_ID": "category",
+    "TAC_AREA_NAME": "category",
+    "LABEL": "category",
+    "XML_DATA_ITEM": "category",
+    "EXECUTION_TYPE": "category",
+    "POS": "float32",
+    "MW": "float32",
+    "GROUP": "int16",
+}
+
+# compact layout of all-node LMP snapshots, which run to millions of rows
+SNAPSHOT_DTYPES: Dict[str, Any] = {
+    "INTERVALSTARTTIME_GMT": "category",
+    "INTERVALENDTIME_GMT": "category",
+    "OPR_HR": "int8",
+    "OPR_INTERVAL": "int8",
+    "NODE": "category",
+    "MARKET_RUN_ID": "category",
+    "LMP_TYPE": "category",
+    "MW": "float32",
+    "PRC": "float32",
+}
+
+SNAPSHOT_COLUMNS: List[str] = [
+    "INTERVALSTARTTIME_GMT",
+    "INTERVALENDTIME_GMT",
+    "OPR_DT",
+    "OPR_HR",
+    "OPR_INTERVAL",
+    "NODE",
+    "MARKET_RUN_ID",
+    "LMP_TYPE",
+    "MW",
+]
+
+DEFAULT_CHUNKSIZE: int = 500_000
+
+# price components by LMP_TYPE, in the order of wide LMP columns
+LMP_COMPONENTS: List[str] = ["LMP", "MCE", "MCC", "MCL", "MGHG"]
+
+# columns identifying an interval of a node; one wide row per key
+WIDE_LMP_KEYS: List[str] = [
+    "INTERVALSTARTTIME_GMT",
+    "OPR_INTERVAL",
+    "NODE",
+    "MARKET_RUN_ID",
+]
+
+# long columns that vary by component and do not carry over to wide rows
+WIDE_LMP_DROP: List[str] = ["LMP_TYPE", "XML_DATA_ITEM", "POS", "MW", "GROUP"]
+
+# interval bounds are always written in GMT in this fixed format
+INTERVAL_COLUMNS: List[str] = ["INTERVALSTARTTIME_GMT", "INTERVALENDTIME_GMT"]
+GMT_FORMAT: str = "%Y-%m-%dT%H:%M:%S%z"
+
+_session: Optional[Session] = None
+_session_lock = threading.Lock()
+
+_rate_limiter: Optional["RateLimiter"] = None
+_rate_limiter_lock = threading.Lock()
+
+
+class NoDataAvailableError(Exception):
+    pass
+
+
+class BadDateRangeError(Exception):
+    pass
+
+
+def make_session(
+    pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+    pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+    pool_block: bool = False,
+) -> Session:
+    """Create pooled session
+
+    Creates a keep-alive requests.Session whose connections are pooled and
+    reused across requests
+
+    Args:
+        pool_connections (int): number of per-host pools to cache
+        pool_maxsize (int): maximum connections kept alive per host
+        pool_block (bool): block when a host's pool is exhausted instead of
+            opening extra, non-pooled connections
+
+    Returns:
+        session (requests.Session): pooled session
+    """
+
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        pool_block=pool_block,
+    )
+
+    session = requests.Session()
+    session.headers.update({"Connection": "keep-alive"})
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    return session
+
+
+def get_session() -> Session:
+    """Get shared session
+
+    Returns the session shared by every Oasis instance that is not given its
+    own, creating it on first use
+
+    Returns:
+        session (requests.Session): shared session
+    """
+
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            _session = make_session()
+
+        return _session
+
+
+def set_session(session: Optional[Session]) -> None:
+    """Set shared session
+
+    Replaces the session shared by Oasis instances created afterwards, e.g.
+    with one from make_session using a larger pool. Passing None resets to a
+    default session on next use.
+
+    Args:
+        session (requests.Session): session to share
+    """
+
+    global _session
+
+    with _session_lock:
+        _session = session
+
+
+class RateLimiter:
+    """Token bucket rate limiter
+
+    Allows `requests` calls per `interval` seconds, with bursts of up to `burst`
+    calls. Safe to share between threads; with shared=True the bucket lives in
+    shared memory and is also shared with child processes.
+    """
+
+    def __init__(
+        self,
+        requests: int = DEFAULT_RATE_LIMIT,
+        interval: float = DEFAULT_RATE_INTERVAL,
+        burst: Optional[int] = None,
+        shared: bool = False,
+    ) -> None:
+
+        if requests <= 0 or interval <= 0:
+            raise ValueError("requests and interval must be positive")
+
+        self.requests = requests
+        self.interval = interval
+        self.rate: float = requests / interval
+        self.capacity: float = float(burst if burst is not None else requests)
+        self.shared = shared
+
+        state = [self.capacity, time.monotonic()]  # [tokens, last update]
+
+        if shared:
+            self._state: Any = multiprocessing.Array("d", state)
+            self._lock: Any = self._state.get_lock()
+        else:
+            self._state = state
+            self._lock = threading.Lock()
+
+        self._pid = os.getpid()
+
+    def __repr__(self):
+        return f"RateLimiter(requests={self.requests}, interval={self.interval})"
+
+    def _check_pid(self) -> None:
+        # a forked child may inherit the thread lock in a held state
+        if not self.shared and os.getpid() != self._pid:
+            self._lock = threading.Lock()
+            self._pid = os.getpid()
+
+    def _refill(self, now: float) -> float:
+        tokens, updated = self._state[0], self._state[1]
+        return min(self.capacity, tokens + (now - updated) * self.rate)
+
+    def reserve(self) -> float:
+        """Reserve a request
+
+        Takes a token from the bucket, going into debt if it is empty
+
+        Returns:
+            wait (float): seconds the caller must wait before sending
+        """
+
+        self._check_pid()
+
+        with self._lock:
+            now = time.monotonic()
+            tokens = self._refill(now) - 1
+            self._state[0], self._state[1] = tokens, now
+
+        return max(0.0, -tokens / self.rate)
+
+    def acquire(self) -> float:
+        """Wait for a request slot
+
+        Blocks until a request may be sent
+
+        Returns:
+            wait (float): seconds waited
+        """
+
+        wait = self.reserve()
+
+        if wait > 0:
+            time.sleep(wait)
+
+        return wait
+
+    def pause(self, seconds: float) -> None:
+        """Pause requests
+
+        Empties the bucket so no request is allowed for the next `seconds`,
+        e.g. to honor a Retry-After header
+
+        Args:
+            seconds (float): seconds to pause
+        """
+
+        self._check_pid()
+
+        with self._lock:
+            now = time.monotonic()
+            tokens = min(self._refill(now), 0.0) - seconds * self.rate
+            self._state[0], self._state[1] = tokens, now
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Get shared rate limiter
+
+    Returns the rate limiter shared by every Oasis instance that is not given
+    its own, creating it on first use
+
+    Returns:
+        rate_limiter (RateLimiter): shared rate limiter
+    """
+
+    global _rate_limiter
+
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = RateLimiter()
+
+        return _rate_limiter
+
+
+def set_rate_limiter(rate_limiter: Optional[RateLimiter]) -> None:
+    """Set shared rate limiter
+
+    Replaces the rate limiter shared by Oasis instances created afterwards.
+    Passing None resets to the default of one request every 5 seconds on
+    next use.
+
+    Args:
+        rate_limiter (RateLimiter): rate limiter to share
+    """
+
+    global _rate_limiter
+
+    with _rate_limiter_lock:
+        _rate_limiter = rate_limiter
+
+
+class RetryPolicy:
+    """Retry policy for OASIS requests
+
+    Retries transient failures, i.e. connection errors, timeouts and
+    responses with a status in `statuses`, for up to `max_attempts` attempts
+    in total. Between attempts it sleeps the response's Retry-After if given,
+    otherwise an exponential backoff with full jitter. Other HTTP errors and
+    NoDataAvailableError are fatal and raised at once.
+
+    Args:
+        max_attempts (int): attempts in total, including the first
+        backoff (float): base backoff in seconds, doubled after every attempt
+        max_backoff (float): maximum backoff in seconds
+        jitter (bool): sleep a random time up to the backoff
+        statuses (set): HTTP statuses to retry
+        exceptions (tuple): exception types to retry
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 5,
+        backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        jitter: bool = True,
+        statuses: Optional[Set[int]] = None,
+        exceptions: Tuple[type, ...] = RETRY_EXCEPTIONS,
+    ) -> None:
+
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.statuses = statuses if statuses is not None else RETRY_STATUSES
+        self.exceptions = exceptions
+
+    def __repr__(self):
+        return f"RetryPolicy(max_attempts={self.max_attempts}, backoff={self.backoff})"
+
+    def retryable(self, error: BaseException) -> bool:
+        """Whether error is transient"""
+
+        if isinstance(error, NoDataAvailableError):
+            return False
+
+        if isinstance(error, requests.HTTPError):
+            response = error.response
+            return response is not None and response.status_code in self.statuses
+
+        return isinstance(error, self.exceptions)
+
+    def delay(self, attempt: int, error: Optional[BaseException] = None) -> float:
+        """Get seconds to wait after failed attempt number attempt"""
+
+        response = getattr(error, "response", None)
+
+        if response is not None:
+            retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+
+            if retry_after is not None:
+                return retry_after
+
+        backoff = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+
+        return random.uniform(0, backoff) if self.jitter else backoff
+
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class FetchEngine:
+    """Bounded thread pool for OASIS jobs
+
+    Runs jobs such as date windows or nodes on at most max_workers threads,
+    keeping no more than twice that many jobs in flight. Requests made by the
+    jobs still wait on their Oasis instance's rate limiter.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS) -> None:
+
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+
+        self.max_workers = max_workers
+
+    def __repr__(self):
+        return f"FetchEngine(max_workers={self.max_workers})"
+
+    def imap(
+        self, func: Callable[[T], R], jobs: Iterable[T], ordered: bool = True
+    ) -> Iterator[R]:
+        """Run jobs
+
+        Applies func to every job on the thread pool
+
+        Args:
+            func (callable): function to apply to each job
+            jobs (iterable): jobs, consumed lazily
+            ordered (bool): yield results in submission order, otherwise as
+                they complete
+
+        Returns:
+            results (iterator): func(job) for each job
+        """
+
+        if self.max_workers == 1:
+            yield from map(func, jobs)
+            return
+
+        jobs_iter = iter(jobs)
+        limit = 2 * self.max_workers
+        pending: Deque[Future] = deque()
+        running: Set[Future] = set()
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+        def submit() -> bool:
+            for job in jobs_iter:
+                future = executor.submit(func, job)
+                pending.append(future)
+                running.add(future)
+                return True
+            return False
+
+        try:
+            while len(running) < limit and submit():
+                pass
+
+            while running:
+                if ordered:
+                    future = pending.popleft()
+                    result = future.result()
+                else:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    future = done.pop()
+                    pending.remove(future)
+                    result = future.result()
+
+                running.discard(future)
+                submit()
+
+                yield result
+
+        finally:
+            for future in running:
+                future.cancel()
+
+            executor.shutdown(wait=True)
+
+
+def _make_response(
+    content: bytes,
+    headers: Dict[str, str],
+    status_code: int = 200,
+    url: Optional[str] = None,
+) -> Response:
+    """Build a requests response from a body fetched or stored elsewhere"""
+
+    resp = Response()
+    resp.status_code = status_code
+    resp.headers = CaseInsensitiveDict(headers)
+    resp._content = content
+    resp._content_consumed = True
+    resp.url = url  # type: ignore
+
+    return resp
+
+
+class FileResponse(Response):
+    """Response whose body is held in a file instead of memory
+
+    Args:
+        file: seekable binary file holding the body
+        headers (dict): response headers
+        status_code (int): HTTP status
+        url (str): url of response
+    """
+
+    def __init__(
+        self,
+        file: Any,
+        headers: Dict[str, str],
+        status_code: int = 200,
+        url: Optional[str] = None,
+    ) -> None:
+        super().__init__()
+        self.file = file
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.url = url  # type: ignore
+        self._content_consumed = True
+
+    @property
+    def content(self) -> bytes:  # type: ignore
+        self.file.seek(0)
+        return self.file.read()
+
+    def iter_content(self, chunk_size: Optional[int] = 1, decode_unicode: bool = False) -> Iterator[bytes]:  # type: ignore
+        self.file.seek(0)
+        return iter(partial(self.file.read, chunk_size or STREAM_CHUNK_SIZE), b"")
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class QueryEvent:
+    """Instrumentation of a query
+
+    Passed to the hooks of the client making the query once its request has
+    completed or failed (phase "request") and again once get_df has parsed
+    the response (phase "parse"); the same event is passed both times and
+    completed in between. Stage durations are in seconds: "wait" on
+    the rate limiter, "server" from sending the request until the response
+    headers arrive (connecting and the server's think time), "download" of
+    the body and "backoff" between retries; then "unzip" of the csv, "parse",
+    "sort", "reindex", "wide" and "tz". Members parsed in parallel add up.
+
+    Args:
+        params (dict): keyword params of request
+        url (str): url the params are sent to
+
+    Attributes:
+        query (str): OASIS query name
+        stages (dict): seconds spent per stage
+        source (str): "network", "cache" or "replay"
+        cache (str): "hit" or "miss", None without a response cache
+        attempts (int): requests sent, including retries
+        throttled (int): attempts answered with a 429
+        status_code (int): HTTP status of the last attempt
+        bytes (int): size of the zipped response body
+        decompressed (int): size of the csvs parsed
+        rows (int): rows parsed
+        error (Exception): error the phase failed with, if any
+    """
+
+    def __init__(self, params: Dict[str, Any], url: str) -> None:
+        self.params = params
+        self.url = url
+        self.query: Optional[str] = params.get("queryname")
+        self.phase = "request"
+        self.started = time.time()
+        self.stages: Dict[str, float] = {}
+        self.source: Optional[str] = None
+        self.cache: Optional[str] = None
+        self.attempts = 0
+        self.throttled = 0
+        self.status_code: Optional[int] = None
+        self.bytes = 0
+        self.decompressed = 0
+        self.rows = 0
+        self.error: Optional[BaseException] = None
+
+    def __repr__(self):
+        return f"QueryEvent(query='{self.query}', phase='{self.phase}')"
+
+    @classmethod
+    def from_response(cls, response: Response) -> "QueryEvent":
+        """Event for a response not requested by a client with hooks"""
+
+        url = response.url or ""
+        event = cls(dict(parse_qsl(urlsplit(url).query)), url.split("?")[0])
+        event.bytes = _body_size(response)
+
+        return event
+
+    def add(self, stage: str, seconds: float) -> None:
+        """Add seconds to stage"""
+
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @property
+    def duration(self) -> float:
+        """Seconds spent in all stages"""
+
+        return sum(self.stages.values())
+
+
+Hook = Callable[[QueryEvent], None]
+
+
+def _lap(event: Optional[QueryEvent], stage: str, mark: float) -> float:
+    """Add the time since mark to stage of event, returning the new mark"""
+
+    if event is None:
+        return mark
+
+    now = time.perf_counter()
+    event.add(stage, now - mark)
+
+    return now
+
+
+def _body_size(response: Response) -> int:
+    if isinstance(response, FileResponse):
+        return os.fstat(response.file.fileno()).st_size
+
+    return len(response.content)
+
+
+class _TimedReader(io.RawIOBase):
+    """Binary file wrapper timing the reads, e.g. of a decompressing zip member"""
+
+    def __init__(self, file: Any) -> None:
+        super().__init__()
+        self.file = file
+        self.seconds = 0.0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b: Any) -> int:
+        started = time.perf_counter()
+        n = self.file.readinto(b)
+        self.seconds += time.perf_counter() - started
+
+        return n
+
+
+@lru_cache(maxsize=None)
+def _tz(name: str) -> Any:
+    """Get pytz timezone, built once per name"""
+
+    return pytz.timezone(name)
+
+
+@lru_cache(maxsize=4096)
+def _utc_string(dt: datetime, local_tz: str, fmt: str, is_dst: Optional[bool]) -> str:
+    return _tz(local_tz).localize(dt, is_dst=is_dst).astimezone(pytz.UTC).strftime(fmt)
+
+
+def utc_strings(
+    datetimes: Iterable[datetime],
+    local_tz: str = "America/Los_Angeles",
+    fmt: str = "%Y%m%dT%H:%M-0000",
+    is_dst: Optional[bool] = False,
+) -> List[str]:
+    """Convert local datetimes to UTC strings
+
+    Vectorized counterpart of Oasis._get_UTC_string. Times repeated in the
+    fall-back hour and times skipped at spring-forward are read with the
+    standard offset, or the daylight offset if is_dst, as pytz does.
+
+    Args:
+        datetimes (iterable): naive local datetimes
+        local_tz (str): timezone
+        fmt (str): strftime format
+        is_dst (bool): read ambiguous and non-existent times as daylight time;
+            None raises pytz.AmbiguousTimeError or pytz.NonExistentTimeError
+
+    Returns:
+        utc (list): UTC strings, in order
+    """
+
+    index = pd.DatetimeIndex(list(datetimes))
+
+    if index.empty:
+        return []
+
+    tz_ = _tz(local_tz)
+    std = np.zeros(len(index), dtype=bool)
+
+    if is_dst is None:
+        local = index.tz_localize(tz_, ambiguous=std, nonexistent="NaT")
+        gap = local.isna()
+
+        if gap.any():
+            raise pytz.NonExistentTimeError(index[gap][0].to_pydatetime())
+
+        dst = index.tz_localize(tz_, ambiguous=~std, nonexistent="NaT")
+        ambiguous = local != dst
+
+        if ambiguous.any():
+            raise pytz.AmbiguousTimeError(index[ambiguous][0].to_pydatetime())
+    else:
+        # shifting by the DST offset keeps the clock time's offset, as pytz does
+        local = index.tz_localize(
+            tz_,
+            ambiguous=std | is_dst,
+            nonexistent=timedelta(hours=-1 if is_dst else 1),
+        )
+
+    return list(local.tz_convert(pytz.UTC).strftime(fmt))
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse Retry-After header, given in seconds or as an HTTP date"""
+
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    return max(0.0, (retry_at - datetime.now(retry_at.tzinfo)).total_seconds())
+
+
+def _has_pyarrow() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+
+    return True
+
+
+def _read_csv_arrow(
+    csv: Any,
+    parse_dates: Optional[Union[List[int], bool]] = False,
+    dtype: Optional[Dict[str, Any]] = None,
+) -> pd.DataFrame:
+    """Read csv with pyarrow's multithreaded reader
+
+    Categorical dtypes are read as dictionary-encoded arrays and numeric dtypes
+    natively, so no column is materialized as python strings first. Other
+    columns are read as strings and only made numeric, like pandas infers
+    them; pyarrow's own inference would also turn dates and times into
+    timestamps, so column types would depend on the parser.
+    """
+
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    # the header is read here so every column can be given a type
+    names = next(csv_reader([csv.readline().decode("utf-8-sig")]))
+    column_types = {name: pa.string() for name in names}
+
+    for column, column_dtype in (dtype or {}).items():
+        if column_dtype == "category":
+            column_types[column] = pa.dictionary(pa.int32(), pa.string())
+        else:
+            column_types[column] = pa.from_numpy_dtype(np.dtype(column_dtype))
+
+    table = pa_csv.read_csv(
+        csv,
+        read_options=pa_csv.ReadOptions(column_names=names),
+        convert_options=pa_csv.ConvertOptions(
+            column_types=column_types, strings_can_be_null=True
+        ),
+    )
+
+    for i, name in enumerate(names):
+        if name not in (dtype or {}):
+            table = table.set_column(i, name, _infer_numeric(table.column(i)))
+
+    df = table.to_pandas(date_as_object=False)
+
+    if parse_dates is True:
+        parse_dates = list(range(len(df.columns)))
+
+    for i in parse_dates or []:
+        column = df.columns[i]
+
+        if not pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = pd.to_datetime(df[column])
+
+    return df
+
+
+def _infer_numeric(column: Any) -> Any:
+    """Cast string column to int64 or float64 if every value is one, like pandas"""
+
+    import pyarrow as pa
+
+    for numeric in (pa.int64(), pa.float64()):
+        try:
+            return column.cast(numeric)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            pass
+
+    return column
+
+
+class Oasis:
+    max_window_days: int = MAX_WINDOW_DAYS
+
+    def __init__(
+        self,
+        session: Optional[Session] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        cache: Optional["ResponseCache"] = None,
+        fast_parse: bool = False,
+        stream: bool = False,
+        stream_dir: Optional[str] = None,
+        members: str = "first",
+        retry: Optional[RetryPolicy] = None,
+        timeout: Union[float, Tuple[float, float]] = DEFAULT_TIMEOUT,
+        base_url: Optional[str] = None,
+        replay: Optional["Replay"] = None,
+        hooks: Optional[List[Hook]] = None,
+    ) -> None:
+        self.base_url: str = base_url or BASE_URL
+        self.session: Session = session if session is not None else get_session()
+        self.rate_limiter: RateLimiter = (
+            rate_limiter if rate_limiter is not None else get_rate_limiter()
+        )
+        self.engine: FetchEngine = FetchEngine(max_workers)
+        self.cache = cache
+        self.replay = replay
+        self.fast_parse = fast_parse
+        self.parse_engine: Optional[str] = (
+            "pyarrow" if fast_parse and _has_pyarrow() else None
+        )
+        self.stream = stream
+        self.stream_dir = stream_dir
+
+        if members not in ("first", "all"):
+            raise ValueError("members must be 'first' or 'all'")
+
+        # some reports split results across several csvs in one zip
+        self.members = members
+
+        # by default a failed request is not retried
+        self.retry: RetryPolicy = retry if retry is not None else RetryPolicy(1)
+        self.timeout = timeout
+
+        # called with a QueryEvent per query and phase; none means no timing
+        self.hooks: List[Hook] = list(hooks or [])
+
+    @staticmethod
+    def _validate_date_range(start: datetime, end: datetime) -> None:
+
+        STRNOW: str = str(datetime.now().strftime("%Y-%m-%d"))
+        error: Union[str, None] = None
+
+        if start > end:
+            error = "Start must be before end."
+
+        if start > datetime.now():
+            error = "Start must be before today, " + STRNOW
+
+        elif end > datetime.now():
+            error = "End must be before or equal to today, " + STRNOW
+
+        if start.date() == end.date():
+            error = "Start and end cannot be equal. To return data only from start date, pass only start."
+
+        if error is not None:
+            raise BadDateRangeError(error)
+
+    @staticmethod
+    def _split_date_range(
+        start: datetime, end: datetime, max_days: int = MAX_WINDOW_DAYS
+    ) -> List[Tuple[datetime, datetime]]:
+        """Split date range into windows
+
+        Splits [start, end) into consecutive windows no longer than max_days
+
+        Args:
+            start (datetime.datetime): start date, inclusive
+            end (datetime.datetime): end date, exclusive
+            max_days (int): maximum length of a window in days
+
+        Returns:
+            windows (list): list of (start, end) tuples
+        """
+
+        step = timedelta(days=max_days)
+        windows: List[Tuple[datetime, datetime]] = []
+
+        while start < end:
+            windows.append((start, min(start + step, end)))
+            start += step
+
+        return windows
+
+    def _lmp_windows(
+        self,
+        start: datetime,
+        end: Optional[datetime],
+        market: str,
+        max_window_days: Optional[int] = None,
+    ) -> List[Tuple[datetime, datetime]]:
+        """Validate LMP query and split it into windows within the OASIS query limit
+
+        Args:
+            start (datetime.datetime): start date, inclusive
+            end (datetime.datetime): end date, exclusive; defaults to a day
+                after start
+            market (str): market for prices; must be "DAM", "RTM", or "RTPD"
+            max_window_days (int): maximum days per window; defaults to
+                max_window_days of the instance
+
+        Returns:
+            windows (list): list of (start, end) tuples
+        """
+
+        if end is None:
+            end = start + timedelta(days=1)
+
+        self._validate_date_range(start, end)
+
+        if market not in LMP_QUERY_MAPPING.keys():
+            raise ValueError("market must be 'DAM', 'RTM' or 'RTPD'")
+
+        return self._split_date_range(
+            start, end, max_window_days or self.max_window_days
+        )
+
+    def _request_or_none(self, params: Dict[str, Any]) -> Optional[Response]:
+        """Make http request, returning None if OASIS has no data"""
+
+        try:
+            return self.request(params)
+        except NoDataAvailableError:
+            return None
+
+    def request(self, params: Dict[str, Any]) -> Response:
+        """Make http request
+
+        Base method to get request at base_url, waiting on the rate limiter first.
+        Served from and stored in the response cache, if any. In stream mode the
+        body is downloaded in chunks to a temporary file in stream_dir and a
+        FileResponse is returned. Transient failures are retried according to
+        the retry policy. With a replay, recorded responses are served without
+        touching the network and fetched ones are recorded. With hooks, a
+        QueryEvent timing the request is passed to them and attached to the
+        response as its event, for get_df to complete.
+
+        Args:
+            params (dict): keyword params to construct request
+
+        Returns:
+            response: requests response object
+        """
+
+        if not self.hooks:
+            return self._request(params, None)
+
+        event = QueryEvent(params, self.base_url)
+
+        try:
+            resp = self._request(params, event)
+        except Exception as e:
+            event.error = e
+            self._emit(event, "request")
+            raise
+
+        resp.event = event  # type: ignore
+        self._emit(event, "request")
+
+        return resp
+
+    def _request(self, params: Dict[str, Any], event: Optional[QueryEvent]) -> Response:
+        if self.replay is not None:
+            replayed = self.replay.play(self.base_url, params, stream=self.stream)
+
+            if replayed is not None:
+                if event is not None:
+                    event.source, event.status_code = "replay", replayed.status_code
+                    event.bytes = _body_size(replayed)
+
+                return self._check_response(replayed)
+
+        if self.cache is not None:
+            cached = self.cache.get(self.base_url, params, stream=self.stream)
+
+            if event is not None:
+                event.cache = "miss" if cached is None else "hit"
+
+            if cached is not None:
+                if event is not None:
+                    event.source, event.bytes = "cache", _body_size(cached)
+
+                return cached
+
+        attempt = 1
+
+        while True:
+            if event is not None:
+                event.attempts = attempt
+
+            try:
+                resp = self._get(params, event)
+                break
+            except Exception as e:
+                if attempt >= self.retry.max_attempts or not self.retry.retryable(e):
+                    raise
+
+                delay = self.retry.delay(attempt, e)
+                time.sleep(delay)
+                attempt += 1
+
+                if event is not None:
+                    event.add("backoff", delay)
+
+        if self.cache is not None:
+            self.cache.put(self.base_url, params, resp)
+
+        return resp
+
+    def _get(
+        self, params: Dict[str, Any], event: Optional[QueryEvent] = None
+    ) -> Response:
+        """Make a single attempt at the request"""
+
+        wait = self.rate_limiter.acquire()
+
+        started = time.perf_counter()
+        resp: Response = self.session.get(
+            self.base_url, params=params, timeout=self.timeout, stream=self.stream
+        )
+
+        if event is not None:
+            self._time_response(event, resp, wait, started)
+
+        try:
+            resp = self._check_response(resp)
+        except NoDataAvailableError:
+            # empty results replay as empty results
+            self._record(params, resp, started)
+            resp.close()
+            raise
+        except Exception:
+            resp.close()
+            raise
+
+        if self.stream:
+            mark = time.perf_counter()
+            resp = self._spool(resp)
+            _lap(event, "download", mark)
+
+        if event is not None:
+            event.bytes = _body_size(resp)
+
+        self._record(params, resp, started)
+
+        return resp
+
+    @staticmethod
+    def _time_response(
+        event: QueryEvent, resp: Response, wait: float, started: float
+    ) -> None:
+        """Add an attempt's wait, server and download time to event"""
+
+        # elapsed runs from sending the request until the headers are parsed
+        sent = time.perf_counter() - started
+        server = min(resp.elapsed.total_seconds(), sent)
+
+        event.source = "network"
+        event.throttled += resp.status_code == 429
+        event.status_code = resp.status_code
+        event.add("wait", wait)
+        event.add("server", server)
+        event.add("download", sent - server)
+
+    def _emit(self, event: QueryEvent, phase: str) -> None:
+        event.phase = phase
+
+        for hook in self.hooks:
+            hook(event)
+
+    def _record(self, params: Dict[str, Any], resp: Response, started: float) -> None:
+        if self.replay is not None:
+            elapsed = time.perf_counter() - started
+            self.replay.record(self.base_url, params, resp, elapsed)
+
+    def _spool(self, resp: Response) -> FileResponse:
+        """Download body of streamed response in chunks to a temporary file"""
+
+        file = tempfile.TemporaryFile(dir=self.stream_dir)
+
+        try:
+            for chunk in resp.iter_content(STREAM_CHUNK_SIZE):
+                file.write(chunk)
+        except Exception:
+            file.close()
+            raise
+        finally:
+            resp.close()
+
+        return FileResponse(file, dict(resp.headers), resp.status_code, resp.url)
+
+    def _check_response(self, resp: Response) -> Response:
+        """Raise for HTTP errors and empty results, pausing the rate limiter on 429"""
+
+        if resp.status_code == 429:
+            retry_after = _parse_retry_after(resp.headers.get("Retry-After"))
+
+            if retry_after is not None:
+                self.rate_limiter.pause(retry_after)
+
+        resp.raise_for_status()
+
+        headers: str = resp.headers["content-disposition"]
+
+        if re.search(r"\.xml\.zip;$", headers):
+            raise NoDataAvailableError("No data available for this query.")
+
+        return resp
+
+    def _get_UTC_string(
+        self,
+        dt: datetime,
+        local_tz: str = "America/Los_Angeles",
+        fmt: str = "%Y%m%dT%H:%M-0000",
+        is_dst: Optional[bool] = False,
+    ) -> str:
+        """Convert local datetime to UTC string
+
+        Converts datetime.datetime or pandas.Timestamp in local time to
+        to UTC string for constructing HTTP request
+
+        Args:
+            dt (datetime.datetime): datetime to convert
+            local_tz (str): timezone
+            is_dst (bool): read the repeated fall-back hour and the skipped
+                spring-forward hour as daylight time; None raises instead
+
+        Returns:
+            utc (str): UTC string
+        """
+
+        return _utc_string(dt, local_tz, fmt, is_dst)
+
+    def _get_UTC_windows(
+        self,
+        windows: List[Tuple[datetime, datetime]],
+        local_tz: str = "America/Los_Angeles",
+        fmt: str = "%Y%m%dT%H:%M-0000",
+        is_dst: Optional[bool] = False,
+    ) -> List[Tuple[str, str]]:
+        """Convert windows to UTC strings
+
+        Converts the boundaries of every window in one pass, each distinct
+        boundary once
+
+        Args:
+            windows (list): (start, end) tuples of local datetimes
+            local_tz (str): timezone
+            is_dst (bool): see _get_UTC_string
+
+        Returns:
+            windows (list): (start, end) UTC string tuples
+        """
+
+        bounds = list(dict.fromkeys(dt for window in windows for dt in window))
+        utc = dict(zip(bounds, utc_strings(bounds, local_tz, fmt, is_dst)))
+
+        return [(utc[start], utc[end]) for start, end in windows]
+
+    @staticmethod
+    def _open_zip(response: Response) -> zipfile.ZipFile:
+        """Open response body as zip without copying it
+
+        File-backed bodies are read from their file. A BytesIO created from
+        bytes shares their buffer until written to, so other bodies are held in
+        memory once.
+        """
+
+        if isinstance(response, FileResponse):
+            response.file.seek(0)
+            return zipfile.ZipFile(response.file)
+
+        return zipfile.ZipFile(io.BytesIO(response.content))
+
+    def get_df(
+        self,
+        response: Response,
+        parse_dates: Optional[Union[List[int], bool]] = False,
+        sort_values: Optional[List[str]] = None,
+        reindex_columns: Optional[List[str]] = None,
+        dtype: Optional[Dict[str, Any]] = None,
+        engine: Optional[str] = None,
+        members: Optional[str] = None,
+        wide: bool = False,
+        tz: Optional[str] = None,
+    ) -> Union[pd.DataFrame, Dict[str, pd.DataFrame]]:
+
+        """Convert response to datframe
+
+        Converts requests.response to pandas.DataFrame
+
+        Args:
+            r : requests response object
+            parse_dates (bool, list): which columns to parse dates if any
+            sort_values(list): which columsn to sort by if any
+            reindex_columns (list): columns to return, in order
+            dtype (dict): dtypes of columns; columns missing from the csv are
+                ignored
+            engine (str): pandas csv parser, e.g. "pyarrow"; defaults to the
+                instance's parse_engine
+            members (str): zip members to read: "first", "all" to concatenate
+                every member or "dict" for a dataframe per member name;
+                defaults to the instance's members
+            wide (bool): pivot LMPs to a row per node and interval with a
+                column per component, see wide_lmps
+            tz (str): parse the GMT interval columns to timestamps in tz,
+                e.g. "UTC" or "America/Los_Angeles", and index by interval
+                start, see interval_times
+
+        Returns:
+            df (pandas.DataFrame, dict): pandas dataframe, or dict of them
+        """
+
+        members = members or self.members
+
+        if members not in ("first", "all", "dict"):
+            raise ValueError("members must be 'first', 'all' or 'dict'")
+
+        event: Optional[QueryEvent] = None
+
+        if self.hooks:
+            event = getattr(response, "event", None)
+
+            if event is None:
+                event = QueryEvent.from_response(response)
+
+        try:
+            df = self._get_df(
+                response,
+                event,
+                members,
+                parse_dates=parse_dates,
+                sort_values=sort_values,
+                reindex_columns=reindex_columns,
+                dtype=dtype,
+                engine=engine or self.parse_engine,
+                wide=wide,
+                tz=tz,
+            )
+        except Exception as e:
+            if event is not None:
+                event.error = e
+                self._emit(event, "parse")
+
+            raise
+
+        if event is not None:
+            if isinstance(df, dict):
+                event.rows = sum(len(frame) for frame in df.values())
+            else:
+                event.rows = len(df)
+
+            self._emit(event, "parse")
+
+        return df
+
+    def _get_df(
+        self,
+        response: Response,
+        event: Optional[QueryEvent],
+        members: str,
+        parse_dates: Optional[Union[List[int], bool]],
+        sort_values: Optional[List[str]],
+        reindex_columns: Optional[List[str]],
+        dtype: Optional[Dict[str, Any]],
+        engine: Optional[str],
+        wide: bool,
+        tz: Optional[str],
+    ) -> Union[pd.DataFrame, Dict[str, pd.DataFrame]]:
+        mark = time.perf_counter()
+
+        z: zipfile.ZipFile = self._open_zip(response)
+        mark = _lap(event, "unzip", mark)
+
+        # (seconds reading, seconds decompressing) of each member
+        timings: List[Tuple[float, float]] = []
+
+        def read(name: str) -> pd.DataFrame:
+            started = time.perf_counter()
+
+            # the member is decompressed as the parser reads it, never in full
+            with z.open(name) as member:
+                csv: Any = member if event is None else _TimedReader(member)
+
+                if engine == "pyarrow":
+                    df = _read_csv_arrow(csv, parse_dates, dtype)
+                else:
+                    df = pd.read_csv(
+                        csv, parse_dates=parse_dates, dtype=dtype, engine=engine
+                    )
+
+            if event is not None:
+                timings.append((time.perf_counter() - started, csv.seconds))
+
+            return df
+
+        def finish(df: pd.DataFrame) -> pd.DataFrame:
+            mark = time.perf_counter()
+            df = df.rename(columns={"PRC": "MW"})
+
+            if sort_values:
+                df = df.sort_values(sort_values).reset_index(drop=True)
+                mark = _lap(event, "sort", mark)
+
+            if reindex_columns:
+                df = df.reindex(columns=reindex_columns)
+                mark = _lap(event, "reindex", mark)
+
+            if wide:
+                df = wide_lmps(df)
+                mark = _lap(event, "wide", mark)
+
+            if tz:
+                df = interval_times(df, tz)
+                _lap(event, "tz", mark)
+
+            return df
+
+        # TODO need to annotate csv
+        with z:
+            names = z.namelist()
+
+            if members == "first":
+                names = names[:1]
+
+            if len(names) == 1:
+                frames = [read(names[0])]
+            else:
+                # zlib and the csv parsers release the GIL, so members parse in parallel
+                workers = min(len(names), self.engine.max_workers)
+
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    frames = list(executor.map(read, names))
+
+            if event is not None:
+                event.decompressed += sum(z.getinfo(name).file_size for name in names)
+
+                for seconds, unzip in timings:
+                    event.add("unzip", unzip)
+                    event.add("parse", seconds - unzip)
+
+        if members == "dict":
+            return {name: finish(df) for name, df in zip(names, frames)}
+
+        mark = time.perf_counter()
+        df = _concat_frames(frames)
+        _lap(event, "parse", mark)
+
+        return finish(df)
+
+    def iter_df(
+        self,
+        response: Response,
+        chunksize: int = DEFAULT_CHUNKSIZE,
+        parse_dates: Optional[Union[List[Any], bool]] = False,
+        reindex_columns: Optional[List[str]] = None,
+        dtype: Optional[Dict[str, Any]] = None,
+    ) -> Iterator[pd.DataFrame]:
+        """Convert response to dataframes in chunks
+
+        Yields frames of at most chunksize rows, in file order, as the zip
+        member (every member, if the instance's members is "all") is
+        decompressed and parsed
+
+        Args:
+            response: requests response object
+            chunksize (int): maximum rows per frame
+            parse_dates (bool, list): which columns to parse dates if any
+            reindex_columns (list): columns to return, in order
+            dtype (dict): dtypes of columns
+
+        Returns:
+            (iterator): pandas dataframes
+        """
+
+        with self._open_zip(response) as z:
+            names = z.namelist() if self.members == "all" else z.namelist()[:1]
+
+            for name in names:
+                with z.open(name) as csv:
+                    reader = pd.read_csv(
+                        csv, parse_dates=parse_dates, dtype=dtype, chunksize=chunksize
+                    )
+
+                    for chunk in reader:
+                        chunk = chunk.rename(columns={"PRC": "MW"})
+
+                        if reindex_columns:
+                            chunk = chunk.reindex(columns=reindex_columns)
+
+                        yield chunk
+
+    def _dtypes(self, schema: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Dtype schema to parse with, only in fast parse mode"""
+
+        return schema if self.fast_parse else None
+
+    def fetch(self, params: Dict[str, Any], **kwargs: Any) -> pd.DataFrame:
+        """Fetch dataframe
+
+        Makes request and converts response to dataframe
+
+        Args:
+            params (dict): keyword params to construct request
+            **kwargs: passed to get_df
+
+        Returns:
+            df (pandas.DataFrame): pandas dataframe
+        """
+
+        return self.get_df(self.request(params), **kwargs)
+
+    def fetch_many(
+        self, params_list: Iterable[Dict[str, Any]], ordered: bool = True, **kwargs: Any
+    ) -> Iterator[Tuple[Dict[str, Any], pd.DataFrame]]:
+        """Fetch many dataframes
+
+        Fetches each set of params on the fetch engine
+
+        Args:
+            params_list (iterable): keyword params for each request
+            ordered (bool): yield in order of params_list, otherwise as completed
+            **kwargs: passed to get_df
+
+        Returns:
+            results (iterator): (params, df) for each set of params
+        """
+
+        def job(params: Dict[str, Any]) -> Tuple[Dict[str, Any], pd.DataFrame]:
+            return params, self.fetch(params, **kwargs)
+
+        return self.engine.imap(job, params_list, ordered=ordered)
+
+
+class Node(Oasis):
+    """CAISO PNode"""
+
+    def __init__(
+        self, node: str, store: Optional["LMPStore"] = None, **kwargs: Any
+    ) -> None:
+        self.node = node
+        self.store = store
+        super().__init__(**kwargs)
+
+    def __repr__(self):
+        return f"Node(node='{self.node}')"
+
+    def get_lmps(
+        self,
+        start: datetime,
+        end: Optional[datetime] = None,
+        market: str = "DAM",
+        output: str = "long",
+        tz: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """Get LMPs
+
+        Gets Locational Market Prices (LMPs) for a given pair of start and end dates.
+        Ranges longer than the OASIS query limit are split into windows of
+        max_window_days, fetched concurrently on the fetch engine. With a store,
+        days already stored are read locally and only the rest is fetched.
+
+        Args:
+            start (datetime.datetime): start date, inclusive
+            end (datetime.datetime): end date, exclusive
+            market (str): market for prices; must be "DAM", "RTM", or "RTPD"
+            output (str): "long" for a row per component, "wide" for a row
+                per interval with a column per component
+            tz (str): parse interval times to timestamps in tz, e.g. "UTC" or
+                "America/Los_Angeles", and index by interval start
+
+        Returns:
+            (pandas.DataFrame): Pandas dataframe containing the LMPs for given period, market
+        """
+
+        if output not in ("long", "wide"):
+            raise ValueError("output must be 'long' or 'wide'")
+
+        windows = self._lmp_windows(start, end, market)
+
+        if self.store is not None:
+
+            def fetch(fetch_start: datetime, fetch_end: datetime) -> pd.DataFrame:
+                return self._get_lmps_windows(
+                    self._split_date_range(
+                        fetch_start, fetch_end, self.max_window_days
+                    ),
+                    market,
+                )
+
+            # the store keeps long rows with interval times as written by OASIS
+            df = self.store.get_lmps(
+                self.node, windows[0][0], windows[-1][1], market, fetch=fetch
+            )
+
+            if output == "wide":
+                df = wide_lmps(df)
+
+            return interval_times(df, tz) if tz else df
+
+        return self._get_lmps_windows(windows, market, wide=output == "wide", tz=tz)
+
+    def _get_lmps_windows(
+        self, windows: List[Tuple[datetime, datetime]], market: str, **parse: Any
+    ) -> pd.DataFrame:
+        """Get LMPs for consecutive windows, concurrently on the fetch engine"""
+
+        params_list = self._lmp_params_windows(windows, market)
+
+        if len(params_list) == 1:
+            return self._get_lmps_params(params_list[0], **parse)
+
+        job = partial(self._get_lmps_or_none, **parse)
+
+        return self._concat_lmps(self.engine.imap(job, params_list))
+
+    def iter_lmps(
+        self,
+        start: datetime,
+        end: Optional[datetime] = None,
+        market: str = "DAM",
+        chunksize: Optional[int] = None,
+    ) -> Iterator[pd.DataFrame]:
+        """Iterate LMPs
+
+        Yields LMPs window by window as each is downloaded and parsed, so memory
+        is bounded by the window size rather than the length of the period.
+        Windows are fetched ahead on the fetch engine.
+
+        Args:
+            start (datetime.datetime): start date, inclusive
+            end (datetime.datetime): end date, exclusive
+            market (str): market for prices; must be "DAM", "RTM", or "RTPD"
+            chunksize (int): maximum rows per frame; by default one frame per window
+
+        Returns:
+            (iterator): sorted LMP frames in time order
+        """
+
+        windows = self._lmp_windows(start, end, market)
+        params_list = self._lmp_params_windows(windows, market)
+
+        for df in self.engine.imap(self._get_lmps_or_none, params_list):
+            if df is not None:
+                yield from _iter_chunks(df, chunksize)
+
+    def _lmp_params(
+        self, start: datetime, end: datetime, market: str, node: Optional[str] = None
+    ) -> Dict[str, Any]:
+        return self._lmp_params_windows(
+            [(start, end)], market, [node] if node else None
+        )[0]
+
+    def _lmp_params_windows(
+        self,
+        windows: List[Tuple[datetime, datetime]],
+        market: str,
+        nodes: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Params of a query per window and node, in window order
+
+        Window boundaries are converted to UTC in one pass
+
+        Args:
+            windows (list): (start, end) tuples
+            market (str): market for prices
+            nodes (list): node, or comma-separated nodes, of each query;
+                defaults to this node
+
+        Returns:
+            params (list): keyword params of each request
+        """
+
+        return [
+            {
+                "queryname": LMP_QUERY_MAPPING[market],
+                "market_run_id": market,
+                "startdatetime": utc_start,
+                "enddatetime": utc_end,
+                "version": 1,
+                "node": node,
+                "resultformat": 6,
+            }
+            for utc_start, utc_end in self._get_UTC_windows(windows)
+            for node in nodes or [self.node]
+        ]
+
+    def _parse_lmps(self, resp: Response, **parse: Any) -> pd.DataFrame:
+        return self.get_df(
+            resp,
+            parse_dates=[2],
+            sort_values=["OPR_DT", "OPR_HR"],
+            reindex_columns=LMP_COLUMNS,
+            dtype=self._dtypes(LMP_DTYPES),
+            **parse,
+        )
+
+    @staticmethod
+    def _concat_lmps(frames: Iterable[Optional[pd.DataFrame]]) -> pd.DataFrame:
+        """Concatenate LMPs of consecutive windows, skipping windows without data"""
+
+        frames = [df for df in frames if df is not None]
+
+        if not frames:
+            raise NoDataAvailableError("No data available for this query.")
+
+        # windows are contiguous and each is sorted, so concatenation stays sorted
+        return _concat_frames(frames)
+
+    def _get_lmps_params(self, params: Dict[str, Any], **parse: Any) -> pd.DataFrame:
+        """Get LMPs for the params of a single window within the OASIS query limit"""
+
+        resp: Response = self.request(params)
 
-import pandas as pd
-import pytz
-import requests
-from dateutil.relativedelta import relativedelta
+        return self._parse_lmps(resp, **parse)
 
-Response = requests.models.Response
+    def _get_lmps_or_none(
+        self, params: Dict[str, Any], **parse: Any
+    ) -> Optional[pd.DataFrame]:
+        """Get LMPs for the params of a single window, or None if there are none"""
 
+        try:
+            return self._get_lmps_params(params, **parse)
+        except NoDataAvailableError:
+            return None
 
-class NoDataAvailableError(Exception):
-    pass
+    def get_month_lmps(self, year: int, month: int) -> pd.DataFrame:
 
+        """Get LMPs for entire month
 
-class BadDateRangeError(Exception):
-    pass
+        Helper method to get LMPs for a complete month
 
+        Args:
+            year(int): year of LMPs desired
+            month(int): month of LMPs desired
 
-class Oasis:
-    def __init__(self) -> None:
-        self.base_url: str = "http://oasis.caiso.com/oasisapi/SingleZip?"
+        Returns:
+            (pandas.DataFrame): Pandas dataframe containing the LMPs for given month
+        """
 
-    @staticmethod
-    def _validate_date_range(start: datetime, end: datetime) -> None:
+        start: datetime = datetime(year, month, 1)
+        end: datetime = start + relativedelta(months=1)
 
-        STRNOW: str = str(datetime.now().strftime("%Y-%m-%d"))
-        error: Union[str, None] = None
+        return self.get_lmps(start, end)
 
-        if start > end:
-            error = "Start must be before end."
+    @classmethod
+    def SP15(cls, **kwargs: Any) -> "Node":
+        return cls("TH_SP15_GEN-APND", **kwargs)
 
-        if start > datetime.now():
-            error = "Start must be before today, " + STRNOW
+    @classmethod
+    def NP15(cls, **kwargs: Any) -> "Node":
+        return cls("TH_NP15_GEN-APND", **kwargs)
 
-        elif end > datetime.now():
-            error = "End must be before or equal to today, " + STRNOW
+    @classmethod
+    def ZP26(cls, **kwargs: Any) -> "Node":
+        return cls("TH_ZP26_GEN-APND", **kwargs)
 
-        if start.date() == end.date():
-            error = "Start and end cannot be equal. To return data only from start date, pass only start."
+    @classmethod
+    def SCEDLAP(cls, **kwargs: Any) -> "Node":
+        return cls("DLAP_SCE-APND", **kwargs)
 
-        if error is not None:
-            raise BadDateRangeError(error)
+    @classmethod
+    def PGAEDLAP(cls, **kwargs: Any) -> "Node":
+        return cls("DLAP_PGAE-APND", **kwargs)
 
-    def request(self, params: Dict[str, Any]) -> Response:
-        """Make http request
+    @classmethod
+    def SDGEDLAP(cls, **kwargs: Any) -> "Node":
+        return cls("DLAP_SDGE-APND", **kwargs)
 
-        Base method to get request at base_url
 
-        Args:
-            params (dict): keyword params to construct request
+class Nodes(Node):
+    """Batch of CAISO PNodes
 
-        Returns:
-            response: requests response object
-        """
+    Queries many nodes at once, packing up to max_nodes_per_request node IDs
+    into each OASIS request
+    """
 
-        resp: Response = requests.get(self.base_url, params=params, timeout=15)
-        resp.raise_for_status()
+    # OASIS accepts at most 10 comma-separated nodes per price query
+    max_nodes_per_request: int = 10
 
-        headers: str = resp.headers["content-disposition"]
+    def __init__(self, nodes: Iterable[str], **kwargs: Any) -> None:
+        self.nodes: List[str] = list(nodes)
 
-        if re.search(r"\.xml\.zip;$", headers):
-            raise NoDataAvailableError("No data available for this query.")
+        if not self.nodes:
+            raise ValueError("nodes must not be empty")
 
-        return resp
+        super().__init__(",".join(self.nodes), **kwargs)
 
-    def _get_UTC_string(
+    def __repr__(self):
+        return f"Nodes(nodes={self.nodes!r})"
+
+    def _batches(self, nodes: Optional[List[str]] = None) -> List[str]:
+        nodes = nodes or self.nodes
+        size = self.max_nodes_per_request
+        return [",".join(nodes[i : i + size]) for i in range(0, len(nodes), size)]
+
+    def get_lmps(  # type: ignore
         self,
-        dt: datetime,
-        local_tz: str = "America/Los_Angeles",
-        fmt: str = "%Y%m%dT%H:%M-0000",
-    ) -> str:
-        """Convert local datetime to UTC string
+        start: datetime,
+        end: Optional[datetime] = None,
+        market: str = "DAM",
+        output: str = "long",
+        tz: Optional[str] = None,
+    ) -> Union[pd.DataFrame, Dict[str, pd.DataFrame], "LMPArray"]:
+        """Get LMPs
 
-        Converts datetime.datetime or pandas.Timestamp in local time to
-        to UTC string for constructing HTTP request
+        Gets Locational Market Prices (LMPs) for every node for a given pair of
+        start and end dates. Each batch of nodes and date window is one request,
+        fetched concurrently on the fetch engine. With a store, the days any
+        node is missing are synced first, nodes missing the same days batched
+        together, and every node is then read from the store.
 
         Args:
-            dt (datetime.datetime): datetime to convert
-            local_tz (str): timezone
+            start (datetime.datetime): start date, inclusive
+            end (datetime.datetime): end date, exclusive
+            market (str): market for prices; must be "DAM", "RTM", or "RTPD"
+            output (str): "long" for one dataframe with a NODE column, "wide"
+                for one with a column per component, "dict" for a dataframe
+                per node keyed by node or "array" for a node x time x
+                component LMPArray
+            tz (str): parse interval times to timestamps in tz, e.g. "UTC" or
+                "America/Los_Angeles", and index by interval start
 
         Returns:
-            utc (str): UTC string
+            (pandas.DataFrame, dict, LMPArray): LMPs for given nodes, period, market
         """
 
-        tz_ = pytz.timezone(local_tz)
-        return tz_.localize(dt).astimezone(pytz.UTC).strftime(fmt)
+        if output not in ("long", "wide", "dict", "array"):
+            raise ValueError("output must be 'long', 'wide', 'dict' or 'array'")
 
-    def get_df(
-        self,
-        response: Response,
-        parse_dates: Optional[Union[List[int], bool]] = False,
-        sort_values: Optional[List[str]] = None,
-        reindex_columns: Optional[List[str]] = None,
-    ) -> pd.DataFrame:
+        if self.store is not None:
+            # the store keeps long rows with interval times as written by OASIS
+            df = self._get_stored_lmps(self.store, start, end, market)
 
-        """Convert response to datframe
+            if output == "wide":
+                df = wide_lmps(df)
 
-        Converts requests.response to pandas.DataFrame
+            if tz:
+                df = interval_times(df, tz)
+        else:
+            df = self._concat_lmps(
+                self._iter_batches(start, end, market, wide=output == "wide", tz=tz)
+            )
+
+        if output == "array":
+            return lmp_array(df)
+
+        # interleave batches of the same window, keeping node order within an hour
+        df = df.sort_values(["OPR_DT", "OPR_HR"], kind="mergesort")
+        df = _reset_index(df)
+
+        if output == "dict":
+            return {
+                node: _reset_index(group)
+                for node, group in df.groupby("NODE", sort=False, observed=True)
+            }
+
+        return df
+
+    def iter_lmps(
+        self,
+        start: datetime,
+        end: Optional[datetime] = None,
+        market: str = "DAM",
+        chunksize: Optional[int] = None,
+    ) -> Iterator[pd.DataFrame]:
+        """Iterate LMPs
+
+        Yields LMPs of each batch of nodes and window as it is downloaded and
+        parsed, windows in time order
 
         Args:
-            r : requests response object
-            parse_dates (bool, list): which columns to parse dates if any
-            sort_values(list): which columsn to sort by if any
+            start (datetime.datetime): start date, inclusive
+            end (datetime.datetime): end date, exclusive
+            market (str): market for prices; must be "DAM", "RTM", or "RTPD"
+            chunksize (int): maximum rows per frame; by default one frame per
+                batch and window
 
         Returns:
-            df (pandas.DataFrame): pandas dataframe
+            (iterator): LMP frames with a NODE column
         """
 
-        with io.BytesIO() as buffer:
-            try:
-                buffer.write(response.content)
-                buffer.seek(0)
-                z: zipfile.ZipFile = zipfile.ZipFile(buffer)
+        for df in self._iter_batches(start, end, market):
+            if df is not None:
+                yield from _iter_chunks(df, chunksize)
 
-            except zipfile.BadZipFile as e:
-                print("Bad zip file", e)
+    def _get_stored_lmps(
+        self,
+        store: "LMPStore",
+        start: datetime,
+        end: Optional[datetime],
+        market: str,
+    ) -> pd.DataFrame:
+        """Sync the store with the days any node is missing, then read every node"""
 
-            else:  # TODO need to annotate csv
-                csv = z.open(z.namelist()[0])  # ignores all but first file in zip
-                df: pd.DataFrame = pd.read_csv(csv, parse_dates=parse_dates)
+        windows = self._lmp_windows(start, end, market)
+        start, end = windows[0][0], windows[-1][1]
 
-                df = df.rename(columns={"PRC": "MW"})
+        def fetch(
+            nodes: List[str], fetch_start: datetime, fetch_end: datetime
+        ) -> pd.DataFrame:
+            return self._concat_lmps(
+                self._iter_batches(fetch_start, fetch_end, market, nodes=nodes)
+            )
 
-                if sort_values:
-                    df = df.sort_values(sort_values).reset_index(drop=True)
+        store.sync(self.nodes, start, end, market, fetch=fetch)
 
-                if reindex_columns:
-                    df = df.reindex(columns=reindex_columns)
+        frames = (store.read(node, start, end, market) for node in self.nodes)
 
-        return df
+        return self._concat_lmps(None if df.empty else df for df in frames)
 
+    def _iter_batches(
+        self,
+        start: datetime,
+        end: Optional[datetime],
+        market: str,
+        nodes: Optional[List[str]] = None,
+        **parse: Any,
+    ) -> Iterator[Optional[pd.DataFrame]]:
+        """Fetch every batch of nodes and window on the fetch engine, in order"""
 
-class Node(Oasis):
-    """CAISO PNode"""
+        windows = self._lmp_windows(start, end, market)
+        params_list = self._lmp_params_windows(windows, market, self._batches(nodes))
 
-    def __init__(self, node: str) -> None:
-        self.node = node
-        super().__init__()
+        return self.engine.imap(partial(self._get_lmps_or_none, **parse), params_list)
 
-    def __repr__(self):
-        return f"Node(node='{self.node}')"
+
+class AllNodes(Oasis):
+    """All CAISO PNodes
+
+    Market-wide LMP snapshots, fetched with one grp_type=ALL request per day
+    """
+
+    # OASIS serves all-node price files one trading day at a time
+    max_window_days: int = 1
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
 
     def get_lmps(
-        self, start: datetime, end: Optional[datetime] = None, market: str = "DAM"
+        self,
+        start: datetime,
+        end: Optional[datetime] = None,
+        market: str = "DAM",
+        compact: bool = True,
     ) -> pd.DataFrame:
-        """Get LMPs
+        """Get LMPs for all nodes
 
-        Gets Locational Market Prices (LMPs) for a given pair of start and end dates
+        Gets Locational Market Prices (LMPs) at every pnode for a given pair of
+        start and end dates. Compact results keep only SNAPSHOT_COLUMNS, with
+        categorical labels and float32 prices, parsed in chunks so the text
+        columns of the full file are never held in memory at once.
 
         Args:
             start (datetime.datetime): start date, inclusive
             end (datetime.datetime): end date, exclusive
             market (str): market for prices; must be "DAM", "RTM", or "RTPD"
+            compact (bool): return compact dtypes, otherwise the LMP_COLUMNS
+                layout of Node.get_lmps
 
         Returns:
-            (pandas.DataFrame): Pandas dataframe containing the LMPs for given period, market
+            (pandas.DataFrame): LMPs for all nodes for given period, market
         """
 
-        if end is None:
-            end = start + timedelta(days=1)
+        windows = self._lmp_windows(start, end, market)
 
-        self._validate_date_range(start, end)
+        def job(params: Dict[str, Any]) -> Optional[pd.DataFrame]:
+            resp = self._request_or_none(params)
 
-        QUERY_MAPPING: Dict[str, str] = {
-            "DAM": "PRC_LMP",
-            "RTM": "PRC_INTVL_LMP",
-            "RTPD": "PRC_RTPD_LMP",
-        }
+            if resp is None:
+                return None
+
+            if not compact:
+                return self.get_df(
+                    resp,
+                    parse_dates=[2],
+                    sort_values=["OPR_DT", "OPR_HR"],
+                    reindex_columns=LMP_COLUMNS,
+                    dtype=self._dtypes(LMP_DTYPES),
+                )
+
+            return self._read_snapshot(resp)
+
+        params_list = self._snapshot_params_windows(windows, market)
+        frames = [df for df in self.engine.imap(job, params_list) if df is not None]
+
+        if not frames:
+            raise NoDataAvailableError("No data available for this query.")
+
+        return _concat_frames(frames)
+
+    def iter_lmps(
+        self,
+        start: datetime,
+        end: Optional[datetime] = None,
+        market: str = "DAM",
+        chunksize: int = DEFAULT_CHUNKSIZE,
+    ) -> Iterator[pd.DataFrame]:
+        """Iterate LMPs for all nodes
+
+        Yields compact frames of at most chunksize rows, parsed from each day's
+        file as it streams through the csv parser, so memory stays flat however
+        long the period. Days are yielded in order; rows within a day in the
+        order of the file.
+
+        Args:
+            start (datetime.datetime): start date, inclusive
+            end (datetime.datetime): end date, exclusive
+            market (str): market for prices; must be "DAM", "RTM", or "RTPD"
+            chunksize (int): maximum rows per frame
+
+        Returns:
+            (iterator): compact LMP frames with SNAPSHOT_COLUMNS
+        """
 
-        COLUMNS: List[str] = [
-            "INTERVALSTARTTIME_GMT",
-            "INTERVALENDTIME_GMT",
-            "OPR_DT",
-            "OPR_HR",
-            "OPR_INTERVAL",
-            "NODE_ID_XML",
-            "NODE_ID",
-            "NODE",
-            "MARKET_RUN_ID",
-            "LMP_TYPE",
-            "XML_DATA_ITEM",
-            "PNODE_RESMRID",
-            "GRP_TYPE",
-            "POS",
-            "MW",
-            "GROUP",
+        windows = self._lmp_windows(start, end, market)
+
+        params_list = self._snapshot_params_windows(windows, market)
+
+        for resp in self.engine.imap(self._request_or_none, params_list):
+            if resp is not None:
+                yield from self._iter_snapshot(resp, chunksize)
+
+    def _snapshot_params(
+        self, start: datetime, end: datetime, market: str
+    ) -> Dict[str, Any]:
+        return self._snapshot_params_windows([(start, end)], market)[0]
+
+    def _snapshot_params_windows(
+        self, windows: List[Tuple[datetime, datetime]], market: str
+    ) -> List[Dict[str, Any]]:
+        """Params of a query per window, boundaries converted to UTC in one pass"""
+
+        return [
+            {
+                "queryname": LMP_QUERY_MAPPING[market],
+                "market_run_id": market,
+                "startdatetime": utc_start,
+                "enddatetime": utc_end,
+                "version": 1,
+                "grp_type": "ALL",
+                "resultformat": 6,
+            }
+            for utc_start, utc_end in self._get_UTC_windows(windows)
         ]
 
-        if market not in QUERY_MAPPING.keys():
-            raise ValueError("market must be 'DAM', 'RTM' or 'RTPD'")
+    def _iter_snapshot(
+        self, response: Response, chunksize: int = DEFAULT_CHUNKSIZE
+    ) -> Iterator[pd.DataFrame]:
+        """Parse an all-node LMP file chunk by chunk into compact dtypes"""
+
+        return self.iter_df(
+            response,
+            chunksize=chunksize,
+            parse_dates=["OPR_DT"],
+            reindex_columns=SNAPSHOT_COLUMNS,
+            dtype=SNAPSHOT_DTYPES,
+        )
 
-        params: Dict[str, Any] = {
-            "queryname": QUERY_MAPPING[market],
-            "market_run_id": market,
-            "startdatetime": self._get_UTC_string(start),
-            "enddatetime": self._get_UTC_string(end),
-            "version": 1,
-            "node": self.node,
-            "resultformat": 6,
-        }
+    def _read_snapshot(
+        self, response: Response, chunksize: int = DEFAULT_CHUNKSIZE
+    ) -> pd.DataFrame:
 
-        resp: Response = self.request(params)
+        df = _concat_frames(list(self._iter_snapshot(response, chunksize)))
 
-        return self.get_df(
-            resp,
-            parse_dates=[2],
-            sort_values=["OPR_DT", "OPR_HR"],
-            reindex_columns=COLUMNS,
+        return df.sort_values(["OPR_DT", "OPR_HR"], kind="mergesort").reset_index(
+            drop=True
         )
 
-    def get_month_lmps(self, year: int, month: int) -> pd.DataFrame:
 
-        """Get LMPs for entire month
+def _iter_chunks(df: pd.DataFrame, chunksize: Optional[int]) -> Iterator[pd.DataFrame]:
+    """Slice dataframe into frames of at most chunksize rows"""
 
-        Helper method to get LMPs for a complete month
+    if not chunksize or len(df) <= chunksize:
+        yield df
+        return
 
-        Args:
-            year(int): year of LMPs desired
-            month(int): month of LMPs desired
+    for i in range(0, len(df), chunksize):
+        yield df.iloc[i : i + chunksize].reset_index(drop=True)
 
-        Returns:
-            (pandas.DataFrame): Pandas dataframe containing the LMPs for given month
-        """
 
-        start: datetime = datetime(year, month, 1)
-        end: datetime = start + relativedelta(months=1)
+class LMPArray(NamedTuple):
+    """LMPs as a node x time x component array
 
-        return self.get_lmps(start, end)
+    Attributes:
+        values (numpy.ndarray): prices, NaN where missing
+        nodes (list): nodes along the first axis
+        times (pandas.DatetimeIndex): interval starts, UTC, along the second axis
+        components (list): LMP types along the third axis
+    """
 
-    @classmethod
-    def SP15(cls):
-        return cls("TH_SP15_GEN-APND")
+    values: np.ndarray
+    nodes: List[str]
+    times: pd.DatetimeIndex
+    components: List[str]
 
-    @classmethod
-    def NP15(cls):
-        return cls("TH_NP15_GEN-APND")
 
-    @classmethod
-    def ZP26(cls):
-        return cls("TH_ZP26_GEN-APND")
+def _component_codes(lmp_type: pd.Series) -> Tuple[np.ndarray, List[str]]:
+    """Codes of LMP types, numbered in LMP_COMPONENTS order"""
 
-    @classmethod
-    def SCEDLAP(cls):
-        return cls("DLAP_SCE-APND")
+    codes, uniques = pd.factorize(lmp_type)
+    uniques = [str(u) for u in uniques]
+    components = [c for c in LMP_COMPONENTS if c in uniques]
+    components += sorted(c for c in uniques if c not in LMP_COMPONENTS)
 
-    @classmethod
-    def PGAEDLAP(cls):
-        return cls("DLAP_PGAE-APND")
+    remap = np.array([components.index(u) for u in uniques] + [-1], dtype=np.intp)
 
-    @classmethod
-    def SDGEDLAP(cls):
-        return cls("DLAP_SDGE-APND")
+    # missing LMP types are coded -1, which maps to the trailing -1
+    return remap[codes], components
+
+
+def _price_dtype(mw: pd.Series) -> np.dtype:
+    return np.result_type(mw.dtype, np.float32)
+
+
+def wide_lmps(df: pd.DataFrame) -> pd.DataFrame:
+    """Pivot LMPs to wide
+
+    Reshapes LMPs with a row per component into a row per node and interval
+    with a column per component (LMP, MCE, MCC, MCL, MGHG). Rows keep the
+    order in which their intervals first appear.
+
+    Args:
+        df (pandas.DataFrame): LMPs as returned by Node.get_lmps
+
+    Returns:
+        (pandas.DataFrame): LMPs with component columns
+    """
+
+    columns = [c for c in df.columns if c not in WIDE_LMP_DROP]
+
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+
+    keys = [c for c in WIDE_LMP_KEYS if c in df.columns]
+    rows = df.groupby(keys, sort=False, observed=True, dropna=False).ngroup()
+    rows = rows.to_numpy()
+    cols, components = _component_codes(df.LMP_TYPE)
+    valid = cols >= 0
+
+    # group numbers follow first appearance, so first rows come out in order
+    first = np.unique(rows, return_index=True)[1]
+
+    values = np.full((len(first), len(components)), np.nan, _price_dtype(df.MW))
+    values[rows[valid], cols[valid]] = df.MW.to_numpy()[valid]
+
+    wide = df[columns].iloc[first].reset_index(drop=True)
+    prices = pd.DataFrame(values, columns=components)
+
+    return pd.concat([wide, prices], axis=1)
+
+
+def lmp_array(df: pd.DataFrame) -> LMPArray:
+    """Reshape LMPs to a 3-D array
+
+    Args:
+        df (pandas.DataFrame): LMPs of one or more nodes as returned by
+            Node.get_lmps or Nodes.get_lmps
+
+    Returns:
+        (LMPArray): node x time x component prices, nodes in order of
+            appearance and times ascending
+    """
+
+    node_codes, nodes = pd.factorize(df.NODE)
+
+    # ISO 8601 strings of one offset sort in time order
+    starts = np.asarray(df.INTERVALSTARTTIME_GMT, dtype=object)
+    time_codes, times = pd.factorize(starts, sort=True)
+    cols, components = _component_codes(df.LMP_TYPE)
+    valid = cols >= 0
+
+    values = np.full(
+        (len(nodes), len(times), len(components)), np.nan, _price_dtype(df.MW)
+    )
+    values[node_codes[valid], time_codes[valid], cols[valid]] = df.MW.to_numpy()[valid]
+
+    return LMPArray(
+        values,
+        [str(node) for node in nodes],
+        pd.DatetimeIndex(pd.to_datetime(times, utc=True)),
+        components,
+    )
+
+
+def _concat_frames(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate frames, unioning categoricals instead of falling back to object
+
+    Columns are the union of the frames' columns in first-seen order; a column
+    missing from a frame is null for its rows
+    """
+
+    if len(frames) == 1:
+        return _reset_index(frames[0])
+
+    columns = list(dict.fromkeys(c for df in frames for c in df.columns))
+    categoricals = [
+        column
+        for column in columns
+        if all(
+            column in df.columns and isinstance(df[column].dtype, pd.CategoricalDtype)
+            for df in frames
+        )
+    ]
+
+    df = pd.concat(
+        [f.drop(columns=categoricals) for f in frames], ignore_index=True, sort=False
+    )
+
+    for column in categoricals:
+        df[column] = union_categoricals([f[column] for f in frames])
+
+    df = df[columns]
+
+    if isinstance(frames[0].index, pd.DatetimeIndex):
+        df.index = frames[0].index.append([f.index for f in frames[1:]])
+
+    return df
+
+
+def _reset_index(df: pd.DataFrame) -> pd.DataFrame:
+    """Reset to a default index, keeping interval time indexes"""
+
+    if isinstance(df.index, pd.DatetimeIndex):
+        return df
+
+    return df.reset_index(drop=True)
+
+
+def _parse_gmt(values: pd.Series, tz: str) -> pd.DatetimeIndex:
+    """Parse GMT timestamps to tz
+
+    Each distinct value is parsed once, with a fixed format, and the results
+    are broadcast back by code, so parsing scales with the number of
+    intervals rather than rows
+    """
+
+    if isinstance(values.dtype, pd.DatetimeTZDtype):
+        return pd.DatetimeIndex(values).tz_convert(tz)
+
+    codes, uniques = pd.factorize(values)
+    parsed = pd.to_datetime(
+        np.asarray(uniques, dtype=object), format=GMT_FORMAT, utc=True
+    )
+
+    return pd.DatetimeIndex(parsed).tz_convert(tz).take(codes, allow_fill=True)
+
+
+def interval_times(df: pd.DataFrame, tz: str = "UTC") -> pd.DataFrame:
+    """Parse interval times
+
+    Parses INTERVALSTARTTIME_GMT and INTERVALENDTIME_GMT to tz-aware
+    timestamps in tz and indexes the dataframe by interval start
+
+    Args:
+        df (pandas.DataFrame): dataframe with OASIS interval columns
+        tz (str): time zone, e.g. "UTC" or "America/Los_Angeles"
+
+    Returns:
+        (pandas.DataFrame): dataframe with a DatetimeIndex of interval starts
+    """
+
+    times = {c: _parse_gmt(df[c], tz) for c in INTERVAL_COLUMNS if c in df.columns}
+    df = df.assign(**times)
+
+    if "INTERVALSTARTTIME_GMT" in times:
+        df.index = times["INTERVALSTARTTIME_GMT"].rename(None)
+
+    return df
 
 
 class Atlas(Oasis):
     """Atlas data"""
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
 
     def get_pnodes(self, start: datetime, end: datetime) -> pd.DataFrame:
 
@@ -279,25 +2296,28 @@ class Atlas(Oasis):
 
         self._validate_date_range(start, end)
 
-        params: Dict[str, Any] = {
+        response = self.request(self._pnodes_params(start, end))
+
+        return self.get_df(response, dtype=self._dtypes(ATLAS_DTYPES))
+
+    def _pnodes_params(self, start: datetime, end: datetime) -> Dict[str, Any]:
+        [(utc_start, utc_end)] = self._get_UTC_windows([(start, end)])
+
+        return {
             "queryname": "ATL_PNODE",
-            "startdatetime": self._get_UTC_string(start),
-            "enddatetime": self._get_UTC_string(end),
+            "startdatetime": utc_start,
+            "enddatetime": utc_end,
             "Pnode_type": "ALL",
             "version": 1,
             "resultformat": 6,
         }
 
-        response = self.request(params)
-
-        return self.get_df(response)
-
 
 class SystemDemand(Oasis):
     """System Demand"""
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
 
     def get_peak_demand_forecast(self, start: datetime, end: datetime) -> pd.DataFrame:
         """Get peak demand forecast
@@ -312,17 +2332,11 @@ class SystemDemand(Oasis):
             (pandas.DataFrame): peak demand forecast
         """
 
-        params: Dict[str, Any] = {
-            "queryname": "SLD_FCST_PEAK",
-            "startdatetime": self._get_UTC_string(start),
-            "enddatetime": self._get_UTC_string(end),
-            "version": 1,
-            "resultformat": 6,
-        }
-
-        resp: Response = self.request(params)
+        resp: Response = self.request(
+            self._forecast_params("SLD_FCST_PEAK", start, end)
+        )
 
-        return self.get_df(resp)
+        return self.get_df(resp, dtype=self._dtypes(DEMAND_DTYPES))
 
     def get_demand_forecast(self, start: datetime, end: datetime) -> pd.DataFrame:
 
@@ -338,24 +2352,30 @@ class SystemDemand(Oasis):
             (pandas.DataFrame): demand forecast
         """
 
-        params: Dict[str, Any] = {
-            "queryname": "SLD_FCST",
-            "startdatetime": self._get_UTC_string(start),
-            "enddatetime": self._get_UTC_string(end),
+        resp = self.request(self._forecast_params("SLD_FCST", start, end))
+
+        return self.get_df(resp, dtype=self._dtypes(DEMAND_DTYPES))
+
+    def _forecast_params(
+        self, queryname: str, start: datetime, end: datetime
+    ) -> Dict[str, Any]:
+        [(utc_start, utc_end)] = self._get_UTC_windows([(start, end)])
+
+        return {
+            "queryname": queryname,
+            "startdatetime": utc_start,
+            "enddatetime": utc_end,
             "version": 1,
             "resultformat": 6,
         }
 
-        resp = self.request(params)
-
-        return self.get_df(resp)
-
 
 def get_lmps(
     node: str,
     start: datetime,
     end: Optional[datetime] = None,
-    market: Optional[str] = "DAM",
+    market: str = "DAM",
+    **kwargs: Any,
 ) -> pd.DataFrame:
 
     """Get LMPs
@@ -367,61 +2387,10 @@ def get_lmps(
         start (datetime.datetime): start date, inclusive
         end (datetime.datetime): end date, exclusive
         market (str): market for prices; must be "DAM", "RTM", or "RTPD"
+        **kwargs: passed to Node, e.g. session or rate_limiter
 
     Returns:
         (pandas.DataFrame): Pandas dataframe containing the LMPs for given period, market
     """
 
-    oasis = Oasis()
-
-    if end is None:
-        end = start + timedelta(days=1)
-
-    oasis._validate_date_range(start, end)
-
-    QUERY_MAPPING: Dict[str, str] = {
-        "DAM": "PRC_LMP",
-        "RTM": "PRC_INTVL_LMP",
-        "RTPD": "PRC_RTPD_LMP",
-    }
-
-    COLUMNS: List[str] = [
-        "INTERVALSTARTTIME_GMT",
-        "INTERVALENDTIME_GMT",
-        "OPR_DT",
-        "OPR_HR",
-        "OPR_INTERVAL",
-        "NODE_ID_XML",
-        "NODE_ID",
-        "NODE",
-        "MARKET_RUN_ID",
-        "LMP_TYPE",
-        "XML_DATA_ITEM",
-        "PNODE_RESMRID",
-        "GRP_TYPE",
-        "POS",
-        "MW",
-        "GROUP",
-    ]
-
-    if market not in QUERY_MAPPING.keys():
-        raise ValueError("market must be 'DAM', 'RTM' or 'RTPD'")
-
-    params: Dict[str, Any] = {
-        "queryname": QUERY_MAPPING[market],
-        "market_run_id": market,
-        "startdatetime": oasis._get_UTC_string(start),
-        "enddatetime": oasis._get_UTC_string(end),
-        "version": 1,
-        "node": node,
-        "resultformat": 6,
-    }
-
-    resp: Response = oasis.request(params)
-
-    return oasis.get_df(
-        resp,
-        parse_dates=[2],
-        sort_values=["OPR_DT", "OPR_HR"],
-        reindex_columns=COLUMNS,
-    )
+    return Node(node, **kwargs).get_lmps(start, end, market)
@@ -0,0 +1,156 @@
+"""Record and replay OASIS responses
+
+Records raw response bodies and headers keyed by the canonicalized query
+params, and serves them back without any network I/O, optionally with the
+recorded or a simulated latency, for deterministic, network-free runs.
+"""
+
+import json
+import os
+import time
+from typing import Any, Dict, Optional, Tuple, Union
+
+from pycaiso.cache import _open_entry, _write_entry, canonical_params, params_key
+from pycaiso.oasis import FileResponse, Response, _make_response
+
+MODES: Tuple[str, ...] = ("record", "replay", "auto")
+
+
+class ReplayMissError(KeyError):
+    """Query not recorded"""
+
+
+class Replay:
+    """Recorded OASIS responses
+
+    In "record" mode every response is fetched and recorded, replacing any
+    earlier recording; in "replay" mode responses are only served from
+    recordings and a query not recorded raises ReplayMissError; "auto"
+    replays what was recorded and records the rest. Empty results are
+    recorded too, so they replay as NoDataAvailableError.
+
+    Args:
+        path (str): directory of recordings
+        mode (str): "record", "replay" or "auto"
+        latency (str, float): delay before serving a replayed response:
+            None for none, "original" for the recorded request time or
+            seconds
+    """
+
+    def __init__(
+        self,
+        path: str,
+        mode: str = "auto",
+        latency: Optional[Union[str, float]] = None,
+    ) -> None:
+
+        if mode not in MODES:
+            raise ValueError("mode must be 'record', 'replay' or 'auto'")
+
+        if isinstance(latency, str) and latency != "original":
+            raise ValueError("latency must be None, 'original' or seconds")
+
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+
+        os.makedirs(path, exist_ok=True)
+
+    def __repr__(self):
+        return f"Replay(path='{self.path}', mode='{self.mode}')"
+
+    def load(
+        self, base_url: str, params: Dict[str, Any], stream: bool = False
+    ) -> Optional[Tuple[Response, float]]:
+        """Load recorded response
+
+        Args:
+            base_url (str): url the params are sent to
+            params (dict): keyword params of request
+            stream (bool): return a FileResponse reading the recorded file
+
+        Returns:
+            (tuple): response and seconds to delay it by, or None if the
+                response should be fetched
+        """
+
+        if self.mode == "record":
+            return None
+
+        try:
+            meta, f = _open_entry(self.path, params_key(params, base_url))
+        except OSError:
+            if self.mode == "replay":
+                raise ReplayMissError(canonical_params(params, base_url))
+
+            return None
+
+        if stream:
+            resp: Response = FileResponse(
+                f, meta["headers"], meta["status_code"], meta["url"]
+            )
+        else:
+            with f:
+                resp = _make_response(
+                    f.read(), meta["headers"], meta["status_code"], meta["url"]
+                )
+
+        if self.latency == "original":
+            delay = meta["elapsed"]
+        else:
+            delay = self.latency or 0.0
+
+        return resp, delay
+
+    def play(
+        self, base_url: str, params: Dict[str, Any], stream: bool = False
+    ) -> Optional[Response]:
+        """Serve recorded response after its latency
+
+        Args:
+            base_url (str): url the params are sent to
+            params (dict): keyword params of request
+            stream (bool): return a FileResponse reading the recorded file
+
+        Returns:
+            response: recorded response, or None if it should be fetched
+        """
+
+        loaded = self.load(base_url, params, stream=stream)
+
+        if loaded is None:
+            return None
+
+        resp, delay = loaded
+
+        if delay > 0:
+            time.sleep(delay)
+
+        return resp
+
+    def record(
+        self,
+        base_url: str,
+        params: Dict[str, Any],
+        response: Response,
+        elapsed: float,
+    ) -> None:
+        """Record response
+
+        Args:
+            base_url (str): url the params are sent to
+            params (dict): keyword params of request
+            response: response to record
+            elapsed (float): seconds the request took
+        """
+
+        meta = {
+            "params": json.loads(canonical_params(params, base_url)),
+            "headers": dict(response.headers),
+            "status_code": response.status_code,
+            "url": response.url,
+            "elapsed": elapsed,
+            "recorded": time.time(),
+        }
+
+        _write_entry(self.path, params_key(params, base_url), response, meta)
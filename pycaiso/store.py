@@ -0,0 +1,384 @@
+"""Local LMP store
+
+Keeps LMPs fetched with Node.get_lmps in Parquet files partitioned by
+market, node and month, and remembers which trading days each node and
+market already holds so a sync only fetches the gaps.
+
+Requires pyarrow (or fastparquet) for pandas' Parquet support.
+"""
+
+import json
+import os
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from pycaiso.cache import write_atomic
+from pycaiso.oasis import (
+    LMP_COLUMNS,
+    NoDataAvailableError,
+    Node,
+    Nodes,
+    _concat_frames,
+)
+
+# rows are unique on these columns within a partition
+KEY_COLUMNS: List[str] = [
+    "INTERVALSTARTTIME_GMT",
+    "OPR_INTERVAL",
+    "NODE",
+    "MARKET_RUN_ID",
+    "LMP_TYPE",
+]
+
+# days without data this recent may not be published yet, so are refetched
+PUBLICATION_LAG: timedelta = timedelta(days=7)
+
+
+def _days(start: date, end: date) -> List[date]:
+    return [start + timedelta(days=i) for i in range((end - start).days)]
+
+
+def _ranges(days: Iterable[date]) -> List[Tuple[datetime, datetime]]:
+    """Group days into contiguous [start, end) datetime ranges"""
+
+    ranges: List[Tuple[datetime, datetime]] = []
+
+    for day in sorted(days):
+        day_start = datetime(day.year, day.month, day.day)
+
+        if ranges and ranges[-1][1] == day_start:
+            ranges[-1] = (ranges[-1][0], day_start + timedelta(days=1))
+        else:
+            ranges.append((day_start, day_start + timedelta(days=1)))
+
+    return ranges
+
+
+class LMPStore:
+    """Parquet LMP store
+
+    Files are laid out as root/market=<market>/node=<node>/month=<YYYY-MM>.parquet
+    next to a days.json per market and node listing the trading days synced.
+    A day is synced once it returned rows, or once it is older than the
+    publication lag without any.
+
+    Args:
+        root (str): directory of the store
+        publication_lag (datetime.timedelta): age after which a day without
+            data is taken to have none, rather than not to be published yet
+        **kwargs: passed to Nodes when fetching, e.g. session or cache
+    """
+
+    def __init__(
+        self, root: str, publication_lag: timedelta = PUBLICATION_LAG, **kwargs: Any
+    ) -> None:
+        self.root = root
+        self.publication_lag = publication_lag
+        self.kwargs = kwargs
+
+        os.makedirs(root, exist_ok=True)
+
+    def __repr__(self):
+        return f"LMPStore(root='{self.root}')"
+
+    def _node_dir(self, node: str, market: str) -> str:
+        return os.path.join(self.root, f"market={market}", f"node={node}")
+
+    def _partition_path(self, node: str, market: str, month: str) -> str:
+        return os.path.join(self._node_dir(node, market), f"month={month}.parquet")
+
+    def _days_path(self, node: str, market: str) -> str:
+        return os.path.join(self._node_dir(node, market), "days.json")
+
+    def _write_atomic(self, path: str, data: bytes) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_atomic(path, data)
+
+    def days(self, node: str, market: str = "DAM") -> Set[date]:
+        """Get synced days
+
+        Args:
+            node (str): pricing node
+            market (str): market for prices
+
+        Returns:
+            days (set): trading days already synced for node and market
+        """
+
+        try:
+            with open(self._days_path(node, market)) as f:
+                return {date.fromisoformat(day) for day in json.load(f)}
+        except FileNotFoundError:
+            return set()
+
+    def _add_days(self, node: str, market: str, days: Iterable[date]) -> None:
+        all_days = sorted(self.days(node, market) | set(days))
+        data = json.dumps([day.isoformat() for day in all_days]).encode()
+
+        self._write_atomic(self._days_path(node, market), data)
+
+    def _fetched_days(
+        self, df: pd.DataFrame, node: str, start: datetime, end: datetime
+    ) -> List[date]:
+        """Days of [start, end) fetched for node that are now synced"""
+
+        with_rows = set() if df.empty else set(df.OPR_DT[df.NODE == node].dt.date)
+        settled = date.today() - self.publication_lag
+
+        return [
+            day
+            for day in _days(start.date(), end.date())
+            if day in with_rows or day < settled
+        ]
+
+    def missing(
+        self, node: str, start: datetime, end: datetime, market: str = "DAM"
+    ) -> List[Tuple[datetime, datetime]]:
+        """Get missing ranges
+
+        Args:
+            node (str): pricing node
+            start (datetime.datetime): start date, inclusive
+            end (datetime.datetime): end date, exclusive
+            market (str): market for prices
+
+        Returns:
+            ranges (list): contiguous (start, end) ranges of days not yet synced
+        """
+
+        synced = self.days(node, market)
+        return _ranges(d for d in _days(start.date(), end.date()) if d not in synced)
+
+    def plan(
+        self, node: str, start: datetime, end: datetime, market: str = "DAM"
+    ) -> List[Tuple[datetime, datetime, bool]]:
+        """Plan query
+
+        Decomposes [start, end) into consecutive segments of days that are or
+        are not stored
+
+        Args:
+            node (str): pricing node
+            start (datetime.datetime): start date, inclusive
+            end (datetime.datetime): end date, exclusive
+            market (str): market for prices
+
+        Returns:
+            segments (list): (start, end, stored) tuples in date order
+        """
+
+        synced = self.days(node, market)
+        segments: List[Tuple[datetime, datetime, bool]] = []
+
+        for day in _days(start.date(), end.date()):
+            day_start = datetime(day.year, day.month, day.day)
+            day_end = day_start + timedelta(days=1)
+            stored = day in synced
+
+            if segments and segments[-1][2] == stored:
+                segments[-1] = (segments[-1][0], day_end, stored)
+            else:
+                segments.append((day_start, day_end, stored))
+
+        return segments
+
+    def get_lmps(
+        self,
+        node: str,
+        start: datetime,
+        end: datetime,
+        market: str = "DAM",
+        fetch: Optional[Callable[[datetime, datetime], pd.DataFrame]] = None,
+    ) -> pd.DataFrame:
+        """Get LMPs
+
+        Reads stored days and fetches the rest, storing what was fetched, and
+        splices all segments into one dataframe. Times of start and end are
+        ignored; the store works in whole trading days.
+
+        Args:
+            node (str): pricing node
+            start (datetime.datetime): start date, inclusive
+            end (datetime.datetime): end date, exclusive
+            market (str): market for prices
+            fetch (callable): fetches LMPs of node for (start, end); defaults to
+                Node.get_lmps with the store's kwargs
+
+        Returns:
+            (pandas.DataFrame): Pandas dataframe containing the LMPs for given period, market
+        """
+
+        if fetch is None:
+            fetcher = Node(node, **self.kwargs)
+
+            def fetch(fetch_start: datetime, fetch_end: datetime) -> pd.DataFrame:
+                return fetcher.get_lmps(fetch_start, fetch_end, market)
+
+        frames: List[pd.DataFrame] = []
+
+        for segment_start, segment_end, stored in self.plan(node, start, end, market):
+            if stored:
+                df = self.read(node, segment_start, segment_end, market)
+            else:
+                try:
+                    df = fetch(segment_start, segment_end)
+                except NoDataAvailableError:
+                    df = pd.DataFrame(columns=LMP_COLUMNS)
+
+                self.write(df, market)
+                self._add_days(
+                    node,
+                    market,
+                    self._fetched_days(df, node, segment_start, segment_end),
+                )
+
+            if not df.empty:
+                frames.append(df)
+
+        if not frames:
+            raise NoDataAvailableError("No data available for this query.")
+
+        return _concat_frames(frames)
+
+    def write(self, df: pd.DataFrame, market: str = "DAM") -> None:
+        """Write LMPs
+
+        Merges LMPs into the partitions of their nodes and months, replacing
+        rows already stored for the same interval, node and LMP type
+
+        Args:
+            df (pandas.DataFrame): LMPs as returned by Node.get_lmps
+            market (str): market of prices
+        """
+
+        if df.empty:
+            return
+
+        months = df.OPR_DT.dt.strftime("%Y-%m")
+
+        for (node, month), part in df.groupby(
+            [df.NODE, months], sort=False, observed=True
+        ):
+            path = self._partition_path(node, market, month)
+
+            if os.path.exists(path):
+                part = pd.concat([pd.read_parquet(path), part], ignore_index=True)
+                part = part.drop_duplicates(KEY_COLUMNS, keep="last")
+
+            part = part.sort_values(["OPR_DT", "OPR_HR"], kind="mergesort")
+            part = part.reindex(columns=LMP_COLUMNS).reset_index(drop=True)
+
+            self._write_atomic(path, part.to_parquet(index=False))
+
+    def read(
+        self, node: str, start: datetime, end: datetime, market: str = "DAM"
+    ) -> pd.DataFrame:
+        """Read LMPs
+
+        Args:
+            node (str): pricing node
+            start (datetime.datetime): start date, inclusive
+            end (datetime.datetime): end date, exclusive
+            market (str): market for prices
+
+        Returns:
+            (pandas.DataFrame): stored LMPs for given node, period, market
+        """
+
+        months = sorted(
+            {day.strftime("%Y-%m") for day in _days(start.date(), end.date())}
+        )
+        paths = [self._partition_path(node, market, month) for month in months]
+        frames = [pd.read_parquet(path) for path in paths if os.path.exists(path)]
+
+        if not frames:
+            return pd.DataFrame(columns=LMP_COLUMNS)
+
+        df = pd.concat(frames, ignore_index=True)
+        in_range = (df.OPR_DT >= pd.Timestamp(start.date())) & (
+            df.OPR_DT < pd.Timestamp(end.date())
+        )
+
+        return df[in_range].reset_index(drop=True)
+
+    def sync(
+        self,
+        nodes: Iterable[str],
+        start: datetime,
+        end: datetime,
+        market: str = "DAM",
+        fetch: Optional[Callable[[List[str], datetime, datetime], pd.DataFrame]] = None,
+    ) -> Dict[str, int]:
+        """Sync LMPs
+
+        Fetches only the days not yet synced for each node between start and
+        end. Nodes missing the same ranges are fetched together in batched
+        requests.
+
+        Args:
+            nodes (iterable): pricing nodes
+            start (datetime.datetime): start date, inclusive
+            end (datetime.datetime): end date, exclusive
+            market (str): market for prices
+            fetch (callable): fetches LMPs of nodes for (nodes, start, end);
+                defaults to Nodes.get_lmps with the store's kwargs
+
+        Returns:
+            rows (dict): number of rows fetched per node
+        """
+
+        by_gaps: Dict[Tuple[Tuple[datetime, datetime], ...], List[str]] = defaultdict(
+            list
+        )
+
+        for node in nodes:
+            gaps = tuple(self.missing(node, start, end, market))
+
+            if gaps:
+                by_gaps[gaps].append(node)
+
+        if fetch is None:
+
+            def fetch(
+                fetch_nodes: List[str], fetch_start: datetime, fetch_end: datetime
+            ) -> pd.DataFrame:
+                return Nodes(fetch_nodes, **self.kwargs).get_lmps(
+                    fetch_start, fetch_end, market
+                )
+
+        rows: Dict[str, int] = {}
+
+        for gaps, gap_nodes in by_gaps.items():
+            for gap_start, gap_end in gaps:
+                counts = self._sync_range(gap_nodes, gap_start, gap_end, market, fetch)
+
+                for node, count in counts.items():
+                    rows[node] = rows.get(node, 0) + count
+
+        return rows
+
+    def _sync_range(
+        self,
+        nodes: List[str],
+        start: datetime,
+        end: datetime,
+        market: str,
+        fetch: Callable[[List[str], datetime, datetime], pd.DataFrame],
+    ) -> Dict[str, int]:
+
+        try:
+            df = fetch(nodes, start, end)
+        except NoDataAvailableError:
+            df = pd.DataFrame(columns=LMP_COLUMNS)
+
+        self.write(df, market)
+
+        counts = df.NODE.value_counts()
+
+        for node in nodes:
+            self._add_days(node, market, self._fetched_days(df, node, start, end))
+
+        return {node: int(counts.get(node, 0)) for node in nodes}
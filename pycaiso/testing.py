@@ -0,0 +1,448 @@
+"""Local stand-in for the OASIS API
+
+Serves the SingleZip endpoint for the queries pycaiso makes, answering with
+zipped csvs laid out like OASIS reports, so the full client path can be
+tested and benchmarked offline. Latency, errors and throttling are
+configurable:
+
+    with OasisServer(latency=0.05, throttle_every=10) as server:
+        df = Node.SP15(base_url=server.url).get_lmps(datetime(2021, 1, 1))
+"""
+
+import io
+import threading
+import time
+import zipfile
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from pycaiso.oasis import LMP_COMPONENTS
+
+PATH: str = "/oasisapi/SingleZip"
+
+# interval length of each price query
+LMP_FREQ: Dict[str, str] = {
+    "PRC_LMP": "60min",
+    "PRC_INTVL_LMP": "5min",
+    "PRC_RTPD_LMP": "15min",
+}
+
+LMP_HEADER: List[str] = [
+    "INTERVALSTARTTIME_GMT",
+    "INTERVALENDTIME_GMT",
+    "OPR_DT",
+    "OPR_HR",
+    "OPR_INTERVAL",
+    "NODE_ID_XML",
+    "NODE_ID",
+    "NODE",
+    "MARKET_RUN_ID",
+    "LMP_TYPE",
+    "XML_DATA_ITEM",
+    "PNODE_RESMRID",
+    "GRP_TYPE",
+    "POS",
+    "MW",
+    "GROUP",
+]
+
+DEMAND_HEADER: List[str] = [
+    "INTERVALSTARTTIME_GMT",
+    "INTERVALENDTIME_GMT",
+    "OPR_DT",
+    "OPR_HR",
+    "OPR_INTERVAL",
+    "MARKET_RUN_ID",
+    "TAC_AREA_NAME",
+    "LABEL",
+    "XML_DATA_ITEM",
+    "POS",
+    "MW",
+    "EXECUTION_TYPE",
+    "GROUP",
+]
+
+# data item of each LMP type, in LMP_COMPONENTS order
+LMP_DATA_ITEMS: List[str] = [
+    "LMP_PRC",
+    "LMP_ENE_PRC",
+    "LMP_CONG_PRC",
+    "LMP_LOSS_PRC",
+    "LMP_GHG_PRC",
+]
+
+TAC_AREAS: List[str] = ["CA ISO-TAC", "PGE-TAC", "SCE-TAC", "SDGE-TAC", "VEA-TAC"]
+
+LOCAL_TZ: str = "America/Los_Angeles"
+GMT_FORMAT: str = "%Y-%m-%dT%H:%M:%S-00:00"
+
+# bodies of recent queries are kept so repeated queries are served quickly
+CACHE_SIZE: int = 32
+
+
+def _intervals(params: Dict[str, str], freq: str) -> pd.DatetimeIndex:
+    start = pd.Timestamp(
+        datetime.strptime(params["startdatetime"], "%Y%m%dT%H:%M-0000")
+    )
+    end = pd.Timestamp(datetime.strptime(params["enddatetime"], "%Y%m%dT%H:%M-0000"))
+
+    end = end.tz_localize("UTC")
+    starts = pd.date_range(start.tz_localize("UTC"), end, freq=freq)
+
+    # drop the end point; date_range's closed/inclusive differ across pandas
+    return starts[starts < end]
+
+
+def _times(starts: pd.DatetimeIndex, freq: str) -> Dict[str, Any]:
+    """Interval columns of each start"""
+
+    local = starts.tz_convert(LOCAL_TZ)
+    step = pd.Timedelta(freq)
+
+    return {
+        "INTERVALSTARTTIME_GMT": starts.strftime(GMT_FORMAT),
+        "INTERVALENDTIME_GMT": (starts + step).strftime(GMT_FORMAT),
+        "OPR_DT": local.strftime("%Y-%m-%d"),
+        "OPR_HR": local.hour + 1,
+        # hourly reports leave the interval at 0
+        "OPR_INTERVAL": (
+            local.minute // int(step.total_seconds() // 60) + 1
+            if step < pd.Timedelta("60min")
+            else np.zeros(len(starts), dtype=int)
+        ),
+    }
+
+
+def lmp_frame(
+    params: Dict[str, str], nodes: List[str], rng: np.random.Generator
+) -> pd.DataFrame:
+    """Build LMPs, grouped by LMP type and node like OASIS reports"""
+
+    freq = LMP_FREQ[params["queryname"]]
+    starts = _intervals(params, freq)
+    n_times, n_nodes = len(starts), len(nodes)
+
+    # energy is system-wide, congestion and losses vary by node
+    hours = starts.hour.to_numpy()
+    energy = 35 + 10 * np.sin((hours - 6) / 24 * 2 * np.pi) + rng.normal(0, 2, n_times)
+    congestion = rng.normal(0, 3, (n_nodes, n_times))
+    loss = rng.normal(0, 1, (n_nodes, 1)) + rng.normal(0, 0.2, (n_nodes, n_times))
+    ghg = np.zeros((n_nodes, n_times))
+
+    components = {
+        "MCE": np.broadcast_to(energy, (n_nodes, n_times)),
+        "MCC": congestion,
+        "MCL": loss,
+        "MGHG": ghg,
+    }
+    components["LMP"] = sum(components.values())
+    prices = np.concatenate([components[c].ravel() for c in LMP_COMPONENTS])
+
+    times = _times(starts, freq)
+    n_types = len(LMP_COMPONENTS)
+    rows = n_types * n_nodes * n_times
+
+    node_col = np.tile(np.repeat(np.array(nodes, dtype=object), n_times), n_types)
+
+    data = {
+        column: np.tile(np.asarray(values), n_types * n_nodes)
+        for column, values in times.items()
+    }
+    data.update(
+        {
+            "NODE_ID_XML": node_col,
+            "NODE_ID": node_col,
+            "NODE": node_col,
+            "MARKET_RUN_ID": params.get("market_run_id", "DAM"),
+            "LMP_TYPE": np.repeat(
+                np.array(LMP_COMPONENTS, dtype=object), rows // n_types
+            ),
+            "XML_DATA_ITEM": np.repeat(
+                np.array(LMP_DATA_ITEMS, dtype=object), rows // n_types
+            ),
+            "PNODE_RESMRID": node_col,
+            "GRP_TYPE": params.get("grp_type", "ALL"),
+            "POS": 0,
+            "MW": prices.round(5),
+            "GROUP": np.repeat(np.arange(1, n_types + 1), rows // n_types),
+        }
+    )
+
+    df = pd.DataFrame(data, columns=LMP_HEADER)
+
+    # real-time pre-dispatch reports name the price column PRC
+    if params["queryname"] == "PRC_RTPD_LMP":
+        df = df.rename(columns={"MW": "PRC"})
+
+    return df
+
+
+def pnode_frame(
+    params: Dict[str, str], nodes: List[str], rng: np.random.Generator
+) -> pd.DataFrame:
+    """Build pricing nodes"""
+
+    return pd.DataFrame(
+        {
+            "APNODE_ID": nodes,
+            "APNODE_TYPE": rng.choice(["LAP", "TH", "ASP"], len(nodes)),
+            "PNODE_ID": nodes,
+            "PNODE_TYPE": rng.choice(["GEN", "LOAD", "TIE"], len(nodes)),
+            "START_DATE_GMT": "2009-04-01T07:00:00-00:00",
+            "END_DATE_GMT": "2099-12-31T08:00:00-00:00",
+        }
+    )
+
+
+def demand_frame(
+    params: Dict[str, str], nodes: List[str], rng: np.random.Generator
+) -> pd.DataFrame:
+    """Build demand forecasts, hourly or daily peaks"""
+
+    peak = params["queryname"] == "SLD_FCST_PEAK"
+    freq = "1D" if peak else "60min"
+    starts = _intervals(params, freq)
+    n_times, n_areas = len(starts), len(TAC_AREAS)
+
+    hours = starts.hour.to_numpy()
+    load = 25000 + 8000 * np.sin((hours - 9) / 24 * 2 * np.pi)
+    mw = load * rng.uniform(0.05, 0.4, (n_areas, 1)) + rng.normal(
+        0, 200, (n_areas, n_times)
+    )
+
+    data = {
+        column: np.tile(np.asarray(values), n_areas)
+        for column, values in _times(starts, freq).items()
+    }
+    data.update(
+        {
+            "MARKET_RUN_ID": "DAM",
+            "TAC_AREA_NAME": np.repeat(np.array(TAC_AREAS, dtype=object), n_times),
+            "LABEL": "Demand Forecast",
+            "XML_DATA_ITEM": "SYS_FCST_PEAK_MW" if peak else "SYS_FCST_DA_MW",
+            "POS": 0,
+            "MW": mw.ravel().round(2),
+            "EXECUTION_TYPE": "DAM",
+            "GROUP": 1,
+        }
+    )
+
+    return pd.DataFrame(data, columns=DEMAND_HEADER)
+
+
+QUERIES: Dict[str, Callable[..., pd.DataFrame]] = {
+    "PRC_LMP": lmp_frame,
+    "PRC_INTVL_LMP": lmp_frame,
+    "PRC_RTPD_LMP": lmp_frame,
+    "ATL_PNODE": pnode_frame,
+    "SLD_FCST": demand_frame,
+    "SLD_FCST_PEAK": demand_frame,
+}
+
+
+def make_zip(name: str, data: str) -> bytes:
+    buffer = io.BytesIO()
+
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr(name, data)
+
+    return buffer.getvalue()
+
+
+class OasisServer:
+    """Local OASIS server
+
+    Runs a threaded HTTP server on a background thread. Point a client at
+    it with base_url=server.url. Every node in a query gets prices; queries
+    for all nodes (grp_type=ALL) and pricing node lists cover `nodes` nodes.
+    Nodes whose name starts with NODATA get OASIS's empty result.
+
+    Args:
+        nodes (int): number of nodes in all-node and pricing node queries
+        latency (float): seconds to wait before answering each request
+        error_rate (float): fraction of requests answered with a 503
+        throttle_every (int): answer every nth request with a 429
+        retry_after (float): Retry-After seconds sent with 429s
+        seed (int): seed of prices and errors
+        host (str): interface to listen on
+        port (int): port to listen on; 0 picks a free port
+    """
+
+    def __init__(
+        self,
+        nodes: int = 100,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        throttle_every: int = 0,
+        retry_after: float = 1.0,
+        seed: int = 0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.nodes = [f"NODE_{i:05d}" for i in range(nodes)]
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_every = throttle_every
+        self.retry_after = retry_after
+        self.seed = seed
+
+        self.requests = 0
+        self.calls: List[Dict[str, str]] = []
+        self._lock = threading.Lock()
+        self._rng = np.random.default_rng(seed)
+        self._bodies: "OrderedDict[str, Tuple[str, bytes]]" = OrderedDict()
+
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    def __repr__(self):
+        return f"OasisServer(url='{self.url}')"
+
+    def __enter__(self) -> "OasisServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}{PATH}?"
+
+    def start(self) -> "OasisServer":
+        """Start serving on a background thread"""
+
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._httpd.serve_forever, daemon=True
+            )
+            self._thread.start()
+
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and close the socket"""
+
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+
+        self._httpd.server_close()
+
+    def _handler(self) -> type:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                url = urlsplit(self.path)
+
+                if url.path != PATH:
+                    self.send_error(404)
+                    return
+
+                status, headers, body = server.respond(dict(parse_qsl(url.query)))
+
+                self.send_response(status)
+
+                for key, value in headers.items():
+                    self.send_header(key, value)
+
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return Handler
+
+    def respond(self, params: Dict[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+        """Answer query
+
+        Args:
+            params (dict): query params
+
+        Returns:
+            (tuple): status, headers and body
+        """
+
+        with self._lock:
+            self.requests += 1
+            self.calls.append(params)
+            throttled = bool(self.throttle_every) and (
+                self.requests % self.throttle_every == 0
+            )
+            failed = self._rng.random() < self.error_rate
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if throttled:
+            return 429, {"Retry-After": f"{self.retry_after:g}"}, b""
+
+        if failed:
+            return 503, {}, b""
+
+        queryname = params.get("queryname")
+
+        if queryname not in QUERIES:
+            return 400, {}, b""
+
+        name, body = self._body(params)
+
+        return (
+            200,
+            {
+                "Content-Type": "application/x-zip-compressed",
+                "Content-Disposition": f"inline; filename={name};",
+            },
+            body,
+        )
+
+    def _body(self, params: Dict[str, str]) -> Tuple[str, bytes]:
+        key = "&".join(f"{k}={v}" for k, v in sorted(params.items()))
+
+        with self._lock:
+            if key in self._bodies:
+                self._bodies.move_to_end(key)
+                return self._bodies[key]
+
+        queryname = params["queryname"]
+        start = params.get("startdatetime", "")[:8]
+        end = params.get("enddatetime", "")[:8]
+        stem = f"{start}_{end}_{queryname}"
+
+        if "node" in params and params.get("grp_type") != "ALL":
+            nodes = params["node"].split(",")
+        else:
+            nodes = self.nodes
+
+        nodes = [node for node in nodes if not node.startswith("NODATA")]
+
+        if not nodes:
+            # OASIS answers empty queries with a zipped xml error report
+            entry = (f"{stem}.xml.zip", make_zip(f"{stem}.xml", "<OASISReport/>"))
+        else:
+            rng = np.random.default_rng([self.seed, zlib.crc32(key.encode())])
+            df = QUERIES[queryname](params, nodes, rng)
+            entry = (
+                f"{stem}_v1.csv.zip",
+                make_zip(f"{stem}_v1.csv", df.to_csv(index=False)),
+            )
+
+        with self._lock:
+            self._bodies[key] = entry
+
+            while len(self._bodies) > CACHE_SIZE:
+                self._bodies.popitem(last=False)
+
+        return entry
@@ -0,0 +1,106 @@
+import io
+import zipfile
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+import requests
+from pycaiso.oasis import RateLimiter
+
+LMP_HEADER = (
+    "INTERVALSTARTTIME_GMT,INTERVALENDTIME_GMT,OPR_DT,OPR_HR,OPR_INTERVAL,"
+    "NODE_ID_XML,NODE_ID,NODE,MARKET_RUN_ID,LMP_TYPE,XML_DATA_ITEM,"
+    "PNODE_RESMRID,GRP_TYPE,POS,MW,GROUP"
+)
+
+
+def lmp_csv(nodes, start, end, market="DAM"):
+    """
+    Build an OASIS-style LMP csv with hourly rows for nodes between start and end
+    """
+
+    rows = [LMP_HEADER]
+    hour = start
+
+    while hour < end:
+        start_gmt = (hour + timedelta(hours=8)).strftime("%Y-%m-%dT%H:%M:%S-00:00")
+        end_gmt = (hour + timedelta(hours=9)).strftime("%Y-%m-%dT%H:%M:%S-00:00")
+
+        for node in nodes:
+            for group, lmp_type in enumerate(["LMP", "MCE", "MCC", "MCL"], 1):
+                rows.append(
+                    f"{start_gmt},{end_gmt},{hour:%Y-%m-%d},{hour.hour + 1},0,"
+                    f"{node},{node},{node},{market},{lmp_type},LMP_PRC,"
+                    f"{node},ALL,1,{group * 10.5},{group}"
+                )
+
+        hour += timedelta(hours=1)
+
+    return "\n".join(rows) + "\n"
+
+
+def make_zip(csvs):
+    """
+    Zip a dict of member name to csv text
+    """
+
+    with io.BytesIO() as buffer:
+        with zipfile.ZipFile(buffer, "w") as z:
+            for name, text in csvs.items():
+                z.writestr(name, text)
+
+        return buffer.getvalue()
+
+
+def parse_gmt(value):
+    utc = pytz.UTC.localize(datetime.strptime(value, "%Y%m%dT%H:%M-0000"))
+    return utc.astimezone(pytz.timezone("America/Los_Angeles")).replace(tzinfo=None)
+
+
+class FakeSession:
+    """
+    Stand-in for requests.Session serving zipped LMP csvs for the requested params
+    """
+
+    all_nodes = [f"NODE_{i:03d}" for i in range(50)]
+
+    def __init__(self):
+        self.calls = []
+
+    def get(self, url, params=None, timeout=None, **kwargs):
+        self.calls.append(dict(params))
+
+        nodes = params.get("node", ",".join(self.all_nodes)).split(",")
+        start = parse_gmt(params["startdatetime"])
+        end = parse_gmt(params["enddatetime"])
+        csv = lmp_csv(nodes, start, end, params["market_run_id"])
+
+        resp = requests.models.Response()
+        resp.status_code = 200
+        resp._content = make_zip({"lmps.csv": csv})
+        resp._content_consumed = True
+        resp.headers["content-disposition"] = "inline; filename=lmps.csv.zip;"
+
+        return resp
+
+
+@pytest.fixture()
+def fake_session():
+    return FakeSession()
+
+
+@pytest.fixture()
+def offline(fake_session):
+    """
+    Keyword arguments pointing an Oasis instance at the fake session without throttling
+    """
+
+    return {"session": fake_session, "rate_limiter": RateLimiter(1000, 1)}
+
+
+def client_kwargs(server, **kwargs):
+    """
+    Keyword arguments pointing an Oasis instance at an OasisServer without throttling
+    """
+
+    return {"base_url": server.url, "rate_limiter": RateLimiter(1000, 1), **kwargs}
@@ -0,0 +1,195 @@
+import asyncio
+from datetime import datetime
+
+import pandas as pd
+import pytest
+from pycaiso.oasis import Node, RateLimiter
+from pycaiso.replay import Replay
+from pycaiso.store import LMPStore
+from tests.conftest import FakeSession, lmp_csv, make_zip, parse_gmt
+
+aiohttp = pytest.importorskip("aiohttp")
+web = pytest.importorskip("aiohttp.web")
+
+from pycaiso.aio import AsyncNode, AsyncSystemDemand  # noqa: E402
+
+
+async def oasis_handler(request, calls):
+    """
+    Serve zipped LMP csvs for the requested params like OASIS SingleZip
+    """
+
+    params = request.query
+    calls.append(dict(params))
+
+    if params["queryname"] == "SLD_FCST":
+        body = make_zip({"demand.csv": "OPR_DT,MW\n2019-01-01,25000\n"})
+    else:
+        start = parse_gmt(params["startdatetime"])
+        end = parse_gmt(params["enddatetime"])
+        body = make_zip({"lmps.csv": lmp_csv(params["node"].split(","), start, end)})
+
+    return web.Response(
+        body=body, headers={"content-disposition": "inline; filename=x.csv.zip;"}
+    )
+
+
+async def run_with_server(coro_func):
+    calls = []
+    app = web.Application()
+
+    async def handler(request):
+        return await oasis_handler(request, calls)
+
+    app.router.add_get("/oasisapi/SingleZip", handler)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+
+    port = runner.addresses[0][1]
+    base_url = f"http://127.0.0.1:{port}/oasisapi/SingleZip?"
+
+    try:
+        return await coro_func(base_url), calls
+    finally:
+        await runner.cleanup()
+
+
+def test_async_node_get_lmps():
+    """
+    Test that AsyncNode fetches every window concurrently and concatenates them
+    """
+
+    async def main(base_url):
+        async with AsyncNode(
+            "CAPTJACK_5_N003", rate_limiter=RateLimiter(1000, 1)
+        ) as node:
+            node.base_url = base_url
+            return await node.get_lmps(datetime(2019, 1, 1), datetime(2019, 3, 1))
+
+    df, calls = asyncio.run(run_with_server(main))
+
+    assert len(calls) == 2
+    assert isinstance(df, pd.DataFrame)
+    assert len(df) == (31 + 28) * 24 * 4
+    assert df.OPR_DT.is_monotonic_increasing
+
+
+def test_async_demand_forecast():
+    """
+    Test that AsyncSystemDemand returns a dataframe
+    """
+
+    async def main(base_url):
+        async with AsyncSystemDemand(rate_limiter=RateLimiter(1000, 1)) as demand:
+            demand.base_url = base_url
+            return await demand.get_demand_forecast(
+                datetime(2019, 1, 1), datetime(2019, 1, 2)
+            )
+
+    df, calls = asyncio.run(run_with_server(main))
+
+    assert calls[0]["queryname"] == "SLD_FCST"
+    assert df.MW.tolist() == [25000]
+
+
+def test_async_replay(tmp_path):
+    """
+    Test that AsyncNode records responses and replays them offline
+    """
+
+    async def fetch(base_url, mode):
+        async with AsyncNode(
+            "A", rate_limiter=RateLimiter(1000, 1), replay=Replay(str(tmp_path), mode)
+        ) as node:
+            node.base_url = base_url
+            return await node.get_lmps(datetime(2019, 1, 1), datetime(2019, 1, 3))
+
+    async def main(base_url):
+        return await fetch(base_url, "record"), await fetch(base_url, "replay")
+
+    (recorded, replayed), calls = asyncio.run(run_with_server(main))
+
+    assert len(calls) == 1
+    assert replayed.equals(recorded)
+
+
+def test_async_node_rejects_store_and_stream(tmp_path):
+    with pytest.raises(ValueError):
+        AsyncNode("A", store=LMPStore(str(tmp_path)))
+
+    with pytest.raises(ValueError):
+        AsyncNode("A", stream=True)
+
+
+def test_async_node_output_and_tz():
+    """
+    Test that AsyncNode.get_lmps returns the same wide, tz-indexed frame as Node
+    """
+
+    start, end = datetime(2019, 1, 1), datetime(2019, 3, 1)
+
+    async def main(base_url):
+        async with AsyncNode("A", rate_limiter=RateLimiter(1000, 1)) as node:
+            node.base_url = base_url
+            return await node.get_lmps(start, end, output="wide", tz="UTC")
+
+    df, calls = asyncio.run(run_with_server(main))
+    expected = Node("A", session=FakeSession(), rate_limiter=RateLimiter(1000, 1))
+
+    pd.testing.assert_frame_equal(
+        df, expected.get_lmps(start, end, output="wide", tz="UTC")
+    )
+
+
+def test_async_fetch_many_and_month():
+    """
+    Test that the inherited batch and month helpers are awaitable
+    """
+
+    async def main(base_url):
+        async with AsyncNode("A", rate_limiter=RateLimiter(1000, 1)) as node:
+            node.base_url = base_url
+            params = [
+                node._lmp_params(
+                    datetime(2019, 1, day), datetime(2019, 1, day + 1), "DAM"
+                )
+                for day in [1, 2]
+            ]
+
+            return await node.fetch_many(params), await node.get_month_lmps(2019, 2)
+
+    (results, month), calls = asyncio.run(run_with_server(main))
+
+    assert [params["startdatetime"] for params, _ in results] == [
+        "20190101T08:00-0000",
+        "20190102T08:00-0000",
+    ]
+    assert all(len(df) == 24 * 4 for _, df in results)
+    assert len(month) == 28 * 24 * 4
+
+
+def test_async_node_iter_lmps():
+    """
+    Test that AsyncNode.iter_lmps is an async generator adding up to get_lmps
+    """
+
+    async def main(base_url):
+        async with AsyncNode("A", rate_limiter=RateLimiter(1000, 1)) as node:
+            node.base_url = base_url
+            frames = [
+                df
+                async for df in node.iter_lmps(
+                    datetime(2019, 1, 1), datetime(2019, 3, 1), chunksize=1000
+                )
+            ]
+            return frames, await node.get_lmps(
+                datetime(2019, 1, 1), datetime(2019, 3, 1)
+            )
+
+    (frames, df), calls = asyncio.run(run_with_server(main))
+
+    assert max(len(frame) for frame in frames) == 1000
+    assert pd.concat(frames, ignore_index=True).equals(df)
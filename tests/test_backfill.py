@@ -0,0 +1,200 @@
+import multiprocessing
+import os
+from datetime import datetime
+
+import pandas as pd
+import pytest
+from pycaiso.backfill import Backfill, ManifestRateLimiter
+from pycaiso.oasis import RateLimiter
+from tests.conftest import FakeSession
+
+pytest.importorskip("pyarrow")
+
+
+class FlakySession(FakeSession):
+    """
+    FakeSession failing the first requests for start times in fail, by count
+    """
+
+    def __init__(self, fail):
+        super().__init__()
+        self.fail = dict(fail)
+
+    def get(self, url, params=None, timeout=None, **kwargs):
+        if self.fail.get(params["startdatetime"]):
+            self.fail[params["startdatetime"]] -= 1
+            raise ConnectionError("connection reset")
+
+        return super().get(url, params, timeout, **kwargs)
+
+
+def make_backfill(tmp_path, session=None, **kwargs):
+    return Backfill(
+        str(tmp_path / "manifest.db"),
+        session=session or FakeSession(),
+        rate_limiter=RateLimiter(1000, 1),
+        **kwargs,
+    )
+
+
+def test_backfill_resumes(tmp_path):
+    """
+    Test that a stopped backfill resumes with the windows not yet done
+    """
+
+    backfill = make_backfill(tmp_path)
+
+    assert (
+        backfill.add_lmps(["A", "B"], datetime(2019, 1, 1), datetime(2019, 3, 1)) == 4
+    )
+    assert backfill.add_lmps(["A"], datetime(2019, 1, 1), datetime(2019, 3, 1)) == 0
+
+    assert backfill.run(limit=1) == {"done": 1, "failed": 0, "running": 0}
+    assert backfill.status() == {"done": 1, "pending": 3}
+
+    # a new process picks up where the last one stopped
+    resumed = make_backfill(tmp_path)
+    assert resumed.run() == {"done": 3, "failed": 0, "running": 0}
+    assert resumed.status() == {"done": 4}
+    assert len(backfill.kwargs["session"].calls) == 1
+    assert len(resumed.kwargs["session"].calls) == 3
+
+    df = pd.read_parquet(tmp_path / "lmps" / "market=DAM" / "key=B")
+    assert len(df) == 59 * 24 * 4
+    assert resumed.totals()["rows"] == 2 * 59 * 24 * 4
+    assert resumed.totals()["bytes"] > 0
+
+
+def test_backfill_records_failures(tmp_path):
+    """
+    Test that failed windows are recorded and retried up to max_attempts
+    """
+
+    session = FlakySession(fail={"20190101T08:00-0000": 2})
+    backfill = make_backfill(tmp_path, session=session, max_attempts=2)
+    backfill.add_lmps(["A"], datetime(2019, 1, 1), datetime(2019, 3, 1))
+
+    assert backfill.run() == {"done": 1, "failed": 2, "running": 0}
+    assert [call["startdatetime"] for call in session.calls] == ["20190201T08:00-0000"]
+
+    failures = backfill.failures()
+    assert len(failures) == 1
+    assert failures[0]["window_start"] == "2019-01-01T00:00:00"
+    assert failures[0]["attempts"] == 2
+    assert failures[0]["error"] == "ConnectionError: connection reset"
+
+    assert backfill.run() == {"done": 0, "failed": 0, "running": 0}
+
+    backfill.max_attempts = 3
+    assert backfill.run() == {"done": 1, "failed": 0, "running": 0}
+    assert backfill.status() == {"done": 2}
+
+
+def test_backfill_takes_over_expired_lease(tmp_path):
+    """
+    Test that a window claimed by a dead worker is taken over after its lease
+    """
+
+    backfill = make_backfill(tmp_path, lease=60)
+    backfill.add_lmps(["A"], datetime(2019, 1, 1), datetime(2019, 1, 2))
+
+    assert backfill.claim("dead").attempts == 1
+    assert backfill.claim("alive") is None
+
+    backfill.lease = 0
+    window = backfill.claim("alive")
+
+    assert window.attempts == 2
+    assert window.start == datetime(2019, 1, 1)
+
+
+def test_backfill_reports_windows_left_running(tmp_path):
+    """
+    Test that a run reports windows still held by a live worker
+    """
+
+    backfill = make_backfill(tmp_path)
+    backfill.add_lmps(["A"], datetime(2019, 1, 1), datetime(2019, 3, 1))
+    backfill.claim("other")
+
+    assert backfill.run() == {"done": 1, "failed": 0, "running": 1}
+
+
+def claim_and_crash(path):
+    Backfill(path, rate_limiter=RateLimiter(1000, 1)).claim()
+    os._exit(1)
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(), reason="needs fork"
+)
+def test_backfill_resumes_after_crash(tmp_path):
+    """
+    Test that a window claimed by a crashed worker of this host is resumed at once
+    """
+
+    backfill = make_backfill(tmp_path)
+    backfill.add_lmps(["A"], datetime(2019, 1, 1), datetime(2019, 3, 1))
+
+    worker = multiprocessing.get_context("fork").Process(
+        target=claim_and_crash, args=(backfill.path,)
+    )
+    worker.start()
+    worker.join(30)
+
+    assert backfill.status() == {"pending": 1, "running": 1}
+    assert backfill.run() == {"done": 2, "failed": 0, "running": 0}
+    assert backfill.status() == {"done": 2}
+
+
+def test_manifest_rate_limiter_is_shared(tmp_path):
+    """
+    Test that limiters on one manifest, as in separate workers, share one bucket
+    """
+
+    path = str(tmp_path / "manifest.db")
+    Backfill(path)
+    first, second = (ManifestRateLimiter(path, 1, 10.0) for _ in range(2))
+
+    assert first.reserve() == 0
+    assert second.reserve() == pytest.approx(10, abs=0.5)
+
+    second.pause(30)
+
+    assert first.reserve() > 35
+    assert isinstance(Backfill(path).kwargs["rate_limiter"], ManifestRateLimiter)
+
+
+def run_worker(path, name):
+    backfill = Backfill(path, session=FakeSession(), rate_limiter=RateLimiter(1000, 1))
+    backfill.run(worker=name)
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(), reason="needs fork"
+)
+def test_backfill_workers_claim_each_window_once(tmp_path):
+    """
+    Test that worker processes sharing a manifest split the windows between them
+    """
+
+    backfill = make_backfill(tmp_path)
+    nodes = [f"NODE_{i}" for i in range(6)]
+    backfill.add_lmps(nodes, datetime(2019, 1, 1), datetime(2019, 1, 5), window_days=1)
+
+    context = multiprocessing.get_context("fork")
+    workers = [
+        context.Process(target=run_worker, args=(backfill.path, f"worker-{i}"))
+        for i in range(3)
+    ]
+
+    for worker in workers:
+        worker.start()
+
+    for worker in workers:
+        worker.join(30)
+
+    attempts = backfill._connect().execute("SELECT attempts FROM windows").fetchall()
+
+    assert backfill.status() == {"done": 24}
+    assert {a for (a,) in attempts} == {1}
@@ -0,0 +1,128 @@
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from pycaiso.cache import ResponseCache, canonical_params, params_key
+from pycaiso.oasis import FileResponse, Node, RateLimiter
+from tests.conftest import FakeSession
+
+
+@pytest.fixture()
+def cache(tmp_path):
+    return ResponseCache(str(tmp_path))
+
+
+@pytest.fixture()
+def node(cache):
+    return Node(
+        "CAPTJACK_5_N003",
+        session=FakeSession(),
+        rate_limiter=RateLimiter(1000, 1),
+        cache=cache,
+    )
+
+
+def test_canonical_params():
+    """
+    Test that key order, key case and value types do not change the cache key
+    """
+
+    assert canonical_params({"version": 1, "Node": "A"}) == canonical_params(
+        {"node": "A", "version": "1"}
+    )
+    assert params_key({"node": "A"}) != params_key({"node": "B"})
+    assert params_key({"node": "A"}, "http://a") != params_key(
+        {"node": "A"}, "http://b"
+    )
+
+
+def test_cache_hit_skips_request(node):
+    """
+    Test that a repeated query is served from the cache
+    """
+
+    first = node.get_lmps(datetime(2019, 1, 1), datetime(2019, 1, 2))
+    second = node.get_lmps(datetime(2019, 1, 1), datetime(2019, 1, 2))
+
+    assert len(node.session.calls) == 1
+    assert first.equals(second)
+
+
+@pytest.mark.parametrize(
+    "age, expected",
+    [
+        (timedelta(hours=1), timedelta(hours=1)),
+        (timedelta(days=10), timedelta(days=1)),
+        (timedelta(days=365), None),
+    ],
+)
+def test_ttl_by_data_age(cache, age, expected):
+    """
+    Test that recent data expires and settled data never does
+    """
+
+    end = datetime.utcnow() - age
+    params = {"enddatetime": end.strftime("%Y%m%dT%H:%M-0000")}
+
+    assert cache.ttl(params) == expected
+
+
+def test_expired_entry_is_miss(tmp_path, node):
+    """
+    Test that expired entries are refetched
+    """
+
+    node.cache.ttl_rules = [(timedelta(0), timedelta(seconds=-1))]
+
+    node.get_lmps(datetime(2019, 1, 1), datetime(2019, 1, 2))
+    node.get_lmps(datetime(2019, 1, 1), datetime(2019, 1, 2))
+
+    assert len(node.session.calls) == 2
+
+
+def test_lru_eviction(tmp_path, node):
+    """
+    Test that the least recently used entries are evicted past max_bytes
+    """
+
+    for day in (1, 2, 3):
+        node.get_lmps(datetime(2019, 1, day), datetime(2019, 1, day + 1))
+        time.sleep(0.01)
+
+    sizes = [
+        os.path.getsize(os.path.join(tmp_path, name))
+        for name in os.listdir(tmp_path)
+        if name.endswith(".zip")
+    ]
+
+    # touch day 1 so day 2 is least recently used, then shrink to two entries
+    node.get_lmps(datetime(2019, 1, 1), datetime(2019, 1, 2))
+    node.cache.max_bytes = sum(sizes) - min(sizes)
+
+    assert node.cache.evict() == 1
+
+    node.get_lmps(datetime(2019, 1, 1), datetime(2019, 1, 2))
+    node.get_lmps(datetime(2019, 1, 3), datetime(2019, 1, 4))
+    assert len(node.session.calls) == 3
+
+    node.get_lmps(datetime(2019, 1, 2), datetime(2019, 1, 3))
+    assert len(node.session.calls) == 4
+
+
+def test_stream_mode_cache(node, tmp_path):
+    """
+    Test that streamed responses are cached from and served as files
+    """
+
+    node.stream = True
+    node.stream_dir = str(tmp_path)
+
+    first = node.get_lmps(datetime(2019, 1, 1), datetime(2019, 1, 2))
+    params = node._lmp_params(datetime(2019, 1, 1), datetime(2019, 1, 2), "DAM")
+    cached = node.cache.get(node.base_url, params, stream=True)
+
+    assert isinstance(cached, FileResponse)
+    assert node.get_df(cached, parse_dates=[2]).MW.sum() == first.MW.sum()
+    assert node.get_lmps(datetime(2019, 1, 1), datetime(2019, 1, 2)).equals(first)
+    assert len(node.session.calls) == 1
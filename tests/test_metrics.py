@@ -0,0 +1,156 @@
+import math
+from datetime import datetime
+
+import pytest
+import requests
+from pycaiso.metrics import Histogram, Metrics, Spans
+from pycaiso.oasis import NoDataAvailableError, Node, RetryPolicy
+from pycaiso.testing import OasisServer
+from tests.conftest import client_kwargs
+
+
+class FakeSpan:
+    def __init__(self, name, start_time, attributes):
+        self.name = name
+        self.start_time = start_time
+        self.attributes = attributes
+        self.exceptions = []
+        self.end_time = None
+
+    def record_exception(self, exception):
+        self.exceptions.append(exception)
+
+    def set_status(self, status):
+        self.status = status
+
+    def end(self, end_time=None):
+        self.end_time = end_time
+
+
+class FakeTracer:
+    def __init__(self):
+        self.spans = []
+
+    def start_span(self, name, start_time=None, attributes=None):
+        self.spans.append(FakeSpan(name, start_time, attributes))
+        return self.spans[-1]
+
+
+def test_metrics_aggregate_queries():
+    """
+    Test that requests, retries, 429s, bytes, rows and times are aggregated per query
+    """
+
+    metrics = Metrics()
+
+    with OasisServer(nodes=5, throttle_every=2, retry_after=0) as server:
+        kwargs = client_kwargs(server, retry=RetryPolicy(2, backoff=0))
+        node = Node("A", hooks=[metrics], **kwargs)
+        node.max_window_days = 1
+
+        df = node.get_lmps(datetime(2019, 1, 1), datetime(2019, 1, 3))
+
+        with pytest.raises(NoDataAvailableError):
+            Node("NODATA", hooks=[metrics], **kwargs).get_lmps(datetime(2019, 1, 1))
+
+    assert metrics.value("pycaiso_requests_total", query="PRC_LMP") == 3
+    assert metrics.value("pycaiso_requests_total", status="200") == 3
+    assert metrics.value("pycaiso_retries_total") == 2
+    assert metrics.value("pycaiso_throttled_total", query="PRC_LMP") == 2
+    assert metrics.value("pycaiso_rows_total", query="PRC_LMP") == len(df)
+    assert metrics.value("pycaiso_bytes_total", source="network") > 0
+    assert metrics.value("pycaiso_errors_total", error="NoDataAvailableError") == 1
+
+    parse = metrics.histogram("pycaiso_parse_seconds", query="PRC_LMP")
+    stage = metrics.histogram("pycaiso_stage_seconds", query="PRC_LMP", stage="sort")
+
+    assert parse.count == 2
+    assert stage.count == 2
+    assert 0 < parse.quantile(0.5) <= parse.buckets[-1]
+
+
+def test_metrics_render_and_serve(tmp_path):
+    """
+    Test the Prometheus text exposition, dumped and served
+    """
+
+    metrics = Metrics(buckets=[0.1, 1])
+
+    with OasisServer(nodes=5) as server:
+        Node("A", hooks=[metrics], **client_kwargs(server)).get_lmps(
+            datetime(2019, 1, 1)
+        )
+
+    text = metrics.render()
+    lines = text.splitlines()
+
+    assert "# TYPE pycaiso_requests_total counter" in lines
+    assert (
+        'pycaiso_requests_total{query="PRC_LMP",source="network",status="200"} 1'
+        in lines
+    )
+    assert "# TYPE pycaiso_request_seconds histogram" in lines
+    assert (
+        'pycaiso_request_seconds_bucket{query="PRC_LMP",source="network",le="+Inf"} 1'
+        in lines
+    )
+    assert 'pycaiso_parse_seconds_count{query="PRC_LMP"} 1' in lines
+
+    metrics.dump(str(tmp_path / "pycaiso.prom"))
+
+    assert (tmp_path / "pycaiso.prom").read_text() == text
+
+    httpd = metrics.serve()
+
+    try:
+        host, port = httpd.server_address[:2]
+        resp = requests.get(f"http://{host}:{port}/metrics")
+
+        assert resp.text == text
+        assert resp.headers["Content-Type"].startswith("text/plain")
+        assert requests.get(f"http://{host}:{port}/").status_code == 404
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def test_histogram_quantile():
+    histogram = Histogram([1, 2, 4])
+
+    assert math.isnan(histogram.quantile(0.5))
+
+    for value in [0.5, 1.5, 1.5, 3, 10]:
+        histogram.observe(value)
+
+    assert histogram.counts == [1, 2, 1, 1]
+    assert histogram.quantile(0.2) == 1
+    assert histogram.quantile(0.5) == 1.75
+    assert histogram.quantile(0.99) == 4
+
+
+def test_spans():
+    """
+    Test that requests and parses become spans, failed ones recording their error
+    """
+
+    tracer = FakeTracer()
+
+    with OasisServer(nodes=5) as server:
+        kwargs = client_kwargs(server, hooks=[Spans(tracer)])
+        df = Node("A", **kwargs).get_lmps(datetime(2019, 1, 1))
+
+        with pytest.raises(NoDataAvailableError):
+            Node("NODATA", **kwargs).get_lmps(datetime(2019, 1, 1))
+
+    request, parse, failed = tracer.spans
+
+    assert request.name == "oasis.request"
+    assert request.attributes["oasis.query"] == "PRC_LMP"
+    assert request.attributes["http.status_code"] == 200
+    assert "oasis.stage.server" in request.attributes
+    assert parse.name == "oasis.get_df"
+    assert parse.attributes["oasis.rows"] == len(df)
+    assert "oasis.stage.server" not in parse.attributes
+    assert request.start_time <= request.end_time <= parse.start_time + 1e6
+    assert parse.start_time <= parse.end_time
+    assert isinstance(failed.exceptions[0], NoDataAvailableError)
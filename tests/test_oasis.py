@@ -1,10 +1,40 @@
+import io
+import os
+import threading
 import time
+import tracemalloc
+import zipfile
 from datetime import datetime, timedelta
 
 import pandas as pd
 import pytest
+import pytz
+import requests
 from freezegun import freeze_time
-from pycaiso.oasis import Atlas, BadDateRangeError, Node, Oasis, SystemDemand, get_lmps
+from pycaiso.cache import ResponseCache
+from pycaiso.oasis import (
+    AllNodes,
+    Atlas,
+    BadDateRangeError,
+    FetchEngine,
+    FileResponse,
+    Node,
+    NoDataAvailableError,
+    Nodes,
+    Oasis,
+    RateLimiter,
+    RetryPolicy,
+    SystemDemand,
+    _parse_retry_after,
+    get_lmps,
+    get_session,
+    interval_times,
+    make_session,
+    utc_strings,
+    wide_lmps,
+)
+from pycaiso.testing import OasisServer
+from tests.conftest import LMP_HEADER, client_kwargs, lmp_csv, make_zip
 
 
 @pytest.fixture()
@@ -31,7 +61,7 @@ def lmp_df_columns():
 
 @pytest.fixture(scope="session", autouse=True)
 def frozen_time():
-    with freeze_time("2020-01-02"):
+    with freeze_time("2020-01-02", tick=True):
         yield
 
 
@@ -44,8 +74,6 @@ def node_lmps_default_df(scope="session"):
     cj = Node("CAPTJACK_5_N003")
     df = cj.get_lmps(datetime(2020, 1, 1), datetime(2020, 1, 2))
 
-    time.sleep(5)  # TODO: add rate limiter
-
     return df
 
 
@@ -57,8 +85,6 @@ def get_lmps_default_df(scope="session"):
 
     df = get_lmps("CAPTJACK_5_N003", datetime(2020, 1, 1), datetime(2020, 1, 2))
 
-    time.sleep(5)  # TODO: add rate limiter
-
     return df
 
 
@@ -71,8 +97,6 @@ def node_lmps_rtm_df(scope="session"):
     cj = Node("CAPTJACK_5_N003")
     df = cj.get_lmps(datetime(2020, 1, 1), datetime(2020, 1, 2), market="RTM")
 
-    time.sleep(5)  # TODO: add rate limiter
-
     return df
 
 
@@ -132,8 +156,6 @@ def demand_forecast_df():
 
     df = SystemDemand().get_demand_forecast(datetime(2020, 1, 1), datetime(2020, 1, 3))
 
-    time.sleep(5)
-
     return df
 
 
@@ -154,8 +176,6 @@ def atlas_df():
     atl = Atlas()
     df = atl.get_pnodes(datetime(2021, 1, 1), datetime(2021, 2, 1))
 
-    time.sleep(5)
-
     return df
 
 
@@ -175,3 +195,847 @@ def test_validate_date_range_start_after_end(start, end):
 
     with pytest.raises(BadDateRangeError):
         Oasis._validate_date_range(start, end)
+
+
+def test_shared_session_is_reused():
+    """
+    Test that instances without an explicit session share the pooled default
+    """
+
+    assert Node.SP15().session is get_session()
+    assert Atlas().session is SystemDemand().session
+    assert get_session() is get_session()
+
+
+def test_make_session_pool_size():
+    """
+    Test that make_session mounts an adapter with the requested pool size
+    """
+
+    session = make_session(pool_connections=2, pool_maxsize=32)
+    adapter = session.get_adapter("http://oasis.caiso.com")
+
+    assert adapter._pool_connections == 2
+    assert adapter._pool_maxsize == 32
+
+
+def test_node_uses_given_session(fake_session, offline):
+    """
+    Test that Node and get_lmps send requests through the given session
+    """
+
+    df = Node("CAPTJACK_5_N003", **offline).get_lmps(
+        datetime(2019, 12, 1), datetime(2019, 12, 2)
+    )
+    df_func = get_lmps(
+        "CAPTJACK_5_N003", datetime(2019, 12, 1), datetime(2019, 12, 2), **offline
+    )
+
+    assert len(fake_session.calls) == 2
+    assert df.equals(df_func)
+    assert len(df) == 24 * 4
+
+
+def test_rate_limiter_spaces_requests():
+    """
+    Test that the token bucket allows a burst and then spaces requests by the rate
+    """
+
+    limiter = RateLimiter(2, 1.0)
+
+    assert limiter.reserve() == 0
+    assert limiter.reserve() == 0
+    assert limiter.reserve() == pytest.approx(0.5, abs=0.05)
+    assert limiter.reserve() == pytest.approx(1.0, abs=0.05)
+
+
+def test_rate_limiter_pause():
+    """
+    Test that pausing the bucket delays the next request
+    """
+
+    limiter = RateLimiter(10, 1.0, shared=True)
+    limiter.pause(3)
+
+    assert limiter.reserve() == pytest.approx(3.1, abs=0.05)
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [("7", 7.0), ("-1", 0.0), (None, None), ("soon", None)],
+)
+def test_parse_retry_after(value, expected):
+    """
+    Test parsing Retry-After header values in seconds
+    """
+
+    assert _parse_retry_after(value) == expected
+
+
+def test_request_honors_retry_after(fake_session, offline):
+    """
+    Test that a 429 with Retry-After pauses the rate limiter
+    """
+
+    def get(url, params=None, timeout=None, **kwargs):
+        resp = requests.models.Response()
+        resp.status_code = 429
+        resp.headers["Retry-After"] = "30"
+        resp._content = b""
+        resp._content_consumed = True
+        return resp
+
+    fake_session.get = get
+    oasis = Oasis(**offline)
+
+    with pytest.raises(requests.HTTPError):
+        oasis.request({})
+
+    assert oasis.rate_limiter.reserve() > 29
+
+
+def error_response(status_code, retry_after=None):
+    resp = requests.models.Response()
+    resp.status_code = status_code
+    resp._content = b""
+    resp._content_consumed = True
+
+    if retry_after is not None:
+        resp.headers["Retry-After"] = retry_after
+
+    return resp
+
+
+def test_retry_failed_windows(fake_session, offline):
+    """
+    Test that transient failures are retried per window, not per job
+    """
+
+    get = fake_session.get
+    failures = {"20190102T08:00-0000": [503, requests.ConnectionError()]}
+    timeouts = []
+
+    def flaky_get(url, params=None, timeout=None, **kwargs):
+        timeouts.append(timeout)
+        pending = failures.get(params["startdatetime"])
+
+        if pending:
+            failure = pending.pop(0)
+
+            if isinstance(failure, Exception):
+                raise failure
+
+            return error_response(failure)
+
+        return get(url, params, timeout, **kwargs)
+
+    fake_session.get = flaky_get
+    node = Node("A", retry=RetryPolicy(3, backoff=0), timeout=(3, 30), **offline)
+    node.max_window_days = 1
+
+    df = node.get_lmps(datetime(2019, 1, 1), datetime(2019, 1, 4))
+
+    assert len(df) == 3 * 24 * 4
+    assert len(timeouts) == 5
+    assert set(timeouts) == {(3, 30)}
+    assert sorted(call["startdatetime"] for call in fake_session.calls) == [
+        "20190101T08:00-0000",
+        "20190102T08:00-0000",
+        "20190103T08:00-0000",
+    ]
+
+
+@pytest.mark.parametrize(
+    "error, retryable",
+    [
+        (requests.HTTPError(response=error_response(429)), True),
+        (requests.HTTPError(response=error_response(502)), True),
+        (requests.HTTPError(response=error_response(404)), False),
+        (requests.Timeout(), True),
+        (NoDataAvailableError(), False),
+        (ValueError(), False),
+    ],
+)
+def test_retry_policy_retryable(error, retryable):
+    assert RetryPolicy().retryable(error) == retryable
+
+
+def test_retry_policy_delay():
+    """
+    Test exponential backoff with jitter, capped, and Retry-After precedence
+    """
+
+    policy = RetryPolicy(backoff=2, max_backoff=10, jitter=False)
+    throttled = requests.HTTPError(response=error_response(429, "7"))
+
+    assert [policy.delay(attempt) for attempt in range(1, 5)] == [2, 4, 8, 10]
+    assert policy.delay(1, throttled) == 7
+    assert 0 <= RetryPolicy(backoff=2).delay(3) <= 8
+
+
+def test_retry_gives_up(fake_session, offline):
+    """
+    Test that fatal errors raise at once and transient ones after max_attempts
+    """
+
+    statuses = []
+
+    def get(url, params=None, timeout=None, **kwargs):
+        statuses.append(params["status"])
+        return error_response(params["status"])
+
+    fake_session.get = get
+    oasis = Oasis(retry=RetryPolicy(3, backoff=0), **offline)
+
+    with pytest.raises(requests.HTTPError):
+        oasis.request({"status": 404})
+
+    with pytest.raises(requests.HTTPError):
+        oasis.request({"status": 500})
+
+    assert statuses == [404, 500, 500, 500]
+
+
+@pytest.mark.parametrize("is_dst", [False, True])
+def test_utc_strings_match_localize(is_dst):
+    """
+    Test vectorized UTC strings against pytz across both DST transitions
+    """
+
+    oasis = Oasis(session=requests.Session())
+    hours = [
+        day + timedelta(minutes=30 * i)
+        for day in [datetime(2019, 3, 10), datetime(2019, 11, 3)]
+        for i in range(8)
+    ]
+
+    assert utc_strings(hours, is_dst=is_dst) == [
+        oasis._get_UTC_string(hour, is_dst=is_dst) for hour in hours
+    ]
+
+
+def test_utc_strings_fall_back_hour():
+    """
+    Test that the repeated fall-back hour resolves as asked or raises
+    """
+
+    hour = datetime(2019, 11, 3, 1, 30)
+    windows = [(datetime(2019, 11, 3), hour), (hour, datetime(2019, 11, 4))]
+    oasis = Oasis(session=requests.Session())
+
+    assert utc_strings([hour]) == ["20191103T09:30-0000"]
+    assert utc_strings([hour], is_dst=True) == ["20191103T08:30-0000"]
+    assert oasis._get_UTC_windows(windows) == [
+        ("20191103T07:00-0000", "20191103T09:30-0000"),
+        ("20191103T09:30-0000", "20191104T08:00-0000"),
+    ]
+
+    with pytest.raises(pytz.AmbiguousTimeError):
+        utc_strings([hour], is_dst=None)
+
+    with pytest.raises(pytz.AmbiguousTimeError):
+        oasis._get_UTC_string(hour, is_dst=None)
+
+    with pytest.raises(pytz.NonExistentTimeError):
+        utc_strings([datetime(2019, 3, 10, 2, 30)], is_dst=None)
+
+
+def test_planners_convert_windows_at_once(fake_session, offline, monkeypatch):
+    """
+    Test that the params of all windows and batches come from one UTC conversion
+    """
+
+    conversions = []
+
+    def counting_utc_strings(*args, **kwargs):
+        conversions.append(len(args[0]))
+        return utc_strings(*args, **kwargs)
+
+    monkeypatch.setattr("pycaiso.oasis.utc_strings", counting_utc_strings)
+    names = [f"NODE_{i:02d}" for i in range(15)]
+
+    Nodes(names, **offline).get_lmps(datetime(2019, 1, 1), datetime(2019, 3, 1))
+    AllNodes(**offline).get_lmps(datetime(2019, 1, 1), datetime(2019, 1, 4))
+
+    assert len(fake_session.calls) == 2 * 2 + 3
+    assert conversions == [3, 4]
+
+
+def test_split_date_range():
+    """
+    Test that long ranges are split into contiguous windows within the limit
+    """
+
+    windows = Oasis._split_date_range(datetime(2019, 1, 1), datetime(2019, 3, 15), 31)
+
+    assert windows == [
+        (datetime(2019, 1, 1), datetime(2019, 2, 1)),
+        (datetime(2019, 2, 1), datetime(2019, 3, 4)),
+        (datetime(2019, 3, 4), datetime(2019, 3, 15)),
+    ]
+
+
+def test_lmp_windows(offline):
+    """
+    Test that LMP and snapshot queries are validated and split the same way
+    """
+
+    start = datetime(2019, 1, 1)
+
+    assert Node("A", **offline)._lmp_windows(start, None, "RTM") == [
+        (start, datetime(2019, 1, 2))
+    ]
+    assert AllNodes(**offline)._lmp_windows(start, datetime(2019, 1, 3), "DAM") == [
+        (start, datetime(2019, 1, 2)),
+        (datetime(2019, 1, 2), datetime(2019, 1, 3)),
+    ]
+    assert (
+        len(Node("A", **offline)._lmp_windows(start, datetime(2019, 1, 3), "DAM", 1))
+        == 2
+    )
+
+    with pytest.raises(ValueError):
+        AllNodes(**offline)._lmp_windows(start, None, "HASP")
+
+
+def test_get_lmps_chunks_long_range(fake_session, offline):
+    """
+    Test that ranges over the OASIS limit are fetched per window and concatenated
+    """
+
+    df = get_lmps(
+        "CAPTJACK_5_N003", datetime(2019, 1, 1), datetime(2019, 3, 15), **offline
+    )
+
+    assert len(fake_session.calls) == 3
+    assert len(df) == (31 + 28 + 14) * 24 * 4
+    assert df.index.equals(pd.RangeIndex(len(df)))
+    assert df.OPR_DT.is_monotonic_increasing
+    assert df.OPR_DT.min() == pd.Timestamp(2019, 1, 1)
+    assert df.OPR_DT.max() == pd.Timestamp(2019, 3, 14)
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_fetch_engine_bounded(ordered):
+    """
+    Test that the engine bounds concurrency and yields every result
+    """
+
+    lock = threading.Lock()
+    active = []
+    peak = []
+
+    def job(n):
+        with lock:
+            active.append(n)
+            peak.append(len(active))
+        time.sleep(0.01 * (5 - n % 5))
+        with lock:
+            active.remove(n)
+        return n * n
+
+    results = list(FetchEngine(3).imap(job, range(20), ordered=ordered))
+
+    assert max(peak) <= 3
+    assert sorted(results) == [n * n for n in range(20)]
+    assert (results == sorted(results)) is ordered
+
+
+def test_fetch_engine_raises():
+    """
+    Test that a failing job raises from the engine
+    """
+
+    def job(n):
+        if n == 3:
+            raise ValueError(n)
+        return n
+
+    with pytest.raises(ValueError):
+        list(FetchEngine(2).imap(job, range(10)))
+
+
+def test_fetch_many(fake_session, offline):
+    """
+    Test fetching several windows through the engine keeps params with results
+    """
+
+    oasis = Oasis(max_workers=2, **offline)
+    params_list = [
+        {
+            "node": "CAPTJACK_5_N003",
+            "market_run_id": "DAM",
+            "startdatetime": oasis._get_UTC_string(datetime(2019, 1, day)),
+            "enddatetime": oasis._get_UTC_string(datetime(2019, 1, day + 1)),
+        }
+        for day in range(1, 6)
+    ]
+
+    results = list(oasis.fetch_many(params_list, parse_dates=[2]))
+
+    assert [params for params, _ in results] == params_list
+    assert [df.OPR_DT.iloc[0].day for _, df in results] == [1, 2, 3, 4, 5]
+
+
+def test_nodes_batches_requests(fake_session, offline):
+    """
+    Test that Nodes packs node IDs into as few requests as allowed
+    """
+
+    names = [f"NODE_{i:02d}" for i in range(25)]
+    df = Nodes(names, **offline).get_lmps(datetime(2019, 1, 1), datetime(2019, 1, 3))
+
+    assert len(fake_session.calls) == 3
+    assert [len(call["node"].split(",")) for call in fake_session.calls] == [10, 10, 5]
+    assert sorted(df.NODE.unique()) == names
+    assert len(df) == 25 * 48 * 4
+    assert df.OPR_DT.is_monotonic_increasing
+
+
+def test_nodes_output_dict(fake_session, offline):
+    """
+    Test that Nodes can return a dataframe per node
+    """
+
+    lmps = Nodes(["A", "B"], **offline).get_lmps(
+        datetime(2019, 1, 1), datetime(2019, 1, 2), output="dict"
+    )
+
+    assert list(lmps) == ["A", "B"]
+    assert (lmps["B"].NODE == "B").all()
+    assert list(lmps["A"].columns) == list(lmps["B"].columns)
+    assert len(lmps["A"]) == 24 * 4
+
+
+@pytest.mark.parametrize("fast_parse", [False, True])
+def test_node_output_wide(fake_session, offline, fast_parse):
+    """
+    Test that wide output has a row per interval and a column per component
+    """
+
+    node = Node("A", fast_parse=fast_parse, **offline)
+    long = node.get_lmps(datetime(2019, 1, 1), datetime(2019, 1, 2))
+    wide = node.get_lmps(datetime(2019, 1, 1), datetime(2019, 1, 2), output="wide")
+
+    assert len(wide) == len(long) / 4 == 24
+    assert list(wide.columns[-4:]) == ["LMP", "MCE", "MCC", "MCL"]
+    assert "LMP_TYPE" not in wide.columns
+    assert (wide.MCC == 31.5).all()
+    assert wide.OPR_HR.tolist() == list(range(1, 25))
+    assert wide_lmps(long).equals(wide)
+
+    with pytest.raises(ValueError):
+        node.get_lmps(datetime(2019, 1, 1), output="dict")
+
+
+def test_nodes_output_wide_and_array(fake_session, offline):
+    """
+    Test wide and node x time x component outputs of several nodes
+    """
+
+    nodes = Nodes(["A", "B", "C"], **offline)
+    start, end = datetime(2019, 1, 1), datetime(2019, 1, 3)
+
+    wide = nodes.get_lmps(start, end, output="wide")
+    lmps = nodes.get_lmps(start, end, output="array")
+
+    assert len(wide) == 3 * 48
+    assert wide.OPR_DT.is_monotonic_increasing
+    assert lmps.values.shape == (3, 48, 4)
+    assert lmps.nodes == ["A", "B", "C"]
+    assert lmps.components == ["LMP", "MCE", "MCC", "MCL"]
+    assert lmps.times[0] == pd.Timestamp("2019-01-01 08:00", tz="UTC")
+    assert lmps.times.is_monotonic_increasing
+    assert (lmps.values[:, :, 0] == 10.5).all()
+    assert (lmps.values[1, :, 3] == wide[wide.NODE == "B"].MCL.to_numpy()).all()
+
+
+@pytest.mark.parametrize("fast_parse", [False, True])
+def test_node_interval_times(fake_session, offline, fast_parse):
+    """
+    Test that interval times parse to a tz-aware index across windows
+    """
+
+    node = Node("A", fast_parse=fast_parse, **offline)
+    node.max_window_days = 1
+
+    df = node.get_lmps(
+        datetime(2019, 1, 1), datetime(2019, 1, 3), tz="America/Los_Angeles"
+    )
+
+    assert isinstance(df.index, pd.DatetimeIndex)
+    assert str(df.index.tz) == "America/Los_Angeles"
+    assert df.index[0] == pd.Timestamp("2019-01-01 00:00", tz="America/Los_Angeles")
+    assert (df.INTERVALENDTIME_GMT - df.INTERVALSTARTTIME_GMT == "1h").all()
+    assert df.index.is_monotonic_increasing
+    assert len(df.MW.resample("1D").mean()) == 2
+
+
+def test_nodes_interval_times_wide(fake_session, offline):
+    """
+    Test that wide multi-node LMPs keep their UTC interval index
+    """
+
+    df = Nodes(["A", "B"], **offline).get_lmps(
+        datetime(2019, 1, 1), datetime(2019, 1, 2), output="wide", tz="UTC"
+    )
+
+    assert str(df.index.tz) == "UTC"
+    assert len(df) == 48
+    assert (df.index == df.INTERVALSTARTTIME_GMT).all()
+    assert df.index[:2].tolist() == [pd.Timestamp("2019-01-01 08:00", tz="UTC")] * 2
+    assert interval_times(df, "America/Los_Angeles").index[0].hour == 0
+
+
+def test_all_nodes_snapshot_compact(fake_session, offline):
+    """
+    Test that all-node snapshots are fetched per day and parsed into compact dtypes
+    """
+
+    df = AllNodes(**offline).get_lmps(datetime(2019, 1, 1), datetime(2019, 1, 4))
+
+    assert len(fake_session.calls) == 3
+    assert all(call["grp_type"] == "ALL" for call in fake_session.calls)
+    assert "node" not in fake_session.calls[0]
+    assert len(df) == 3 * 24 * 50 * 4
+    assert df.MW.dtype == "float32"
+    assert df.NODE.dtype == "category"
+    assert len(df.NODE.cat.categories) == 50
+    assert df.OPR_DT.is_monotonic_increasing
+
+
+def test_all_nodes_snapshot_full(fake_session, offline):
+    """
+    Test that non-compact snapshots keep the Node.get_lmps layout
+    """
+
+    df = AllNodes(**offline).get_lmps(
+        datetime(2019, 1, 1), datetime(2019, 1, 2), compact=False
+    )
+
+    assert list(df.columns) == LMP_HEADER.split(",")
+    assert df.NODE.nunique() == 50
+
+
+@pytest.mark.parametrize("engine", [None, "c"])
+def test_fast_parse_dtypes(fake_session, offline, engine):
+    """
+    Test that fast parse mode applies the LMP dtype schema without changing values
+    """
+
+    default = Node("CAPTJACK_5_N003", **offline).get_lmps(
+        datetime(2019, 1, 1), datetime(2019, 3, 1)
+    )
+    node = Node("CAPTJACK_5_N003", fast_parse=True, **offline)
+
+    if engine:
+        node.parse_engine = engine
+
+    fast = node.get_lmps(datetime(2019, 1, 1), datetime(2019, 3, 1))
+
+    assert list(fast.columns) == list(default.columns)
+    assert fast.MW.dtype == "float32"
+    assert fast.OPR_HR.dtype == "int16"
+    assert fast.NODE.dtype == "category"
+    assert fast.LMP_TYPE.dtype == "category"
+    assert len(fast.INTERVALSTARTTIME_GMT.cat.categories) == 59 * 24
+    assert (fast.MW.astype(float) == default.MW).all()
+    assert (fast.LMP_TYPE.astype(str) == default.LMP_TYPE).all()
+
+
+def column_kinds(df):
+    return {
+        column: "datetime"
+        if pd.api.types.is_datetime64_any_dtype(df[column])
+        else "number"
+        if pd.api.types.is_numeric_dtype(df[column])
+        else "string"
+        for column in df.columns
+    }
+
+
+@pytest.mark.parametrize("engine", [None, "pyarrow"])
+def test_fast_parse_column_kinds(engine):
+    """
+    Test that fast parse mode keeps the column kinds of the default mode
+    """
+
+    with OasisServer(nodes=5) as server:
+        kwargs = client_kwargs(server)
+        start, end = datetime(2019, 1, 1), datetime(2019, 1, 2)
+        frames = {}
+
+        for fast_parse in [False, True]:
+            demand = SystemDemand(fast_parse=fast_parse, **kwargs)
+            atlas = Atlas(fast_parse=fast_parse, **kwargs)
+
+            if fast_parse:
+                demand.parse_engine = atlas.parse_engine = engine
+
+            frames[fast_parse] = [
+                demand.get_demand_forecast(start, end),
+                atlas.get_pnodes(start, end),
+            ]
+
+    for default, fast in zip(frames[False], frames[True]):
+        assert column_kinds(fast) == column_kinds(default)
+
+    assert column_kinds(frames[True][0])["OPR_DT"] == "string"
+
+
+def test_open_zip_does_not_copy_body():
+    """
+    Test that opening a response as zip does not copy its body
+    """
+
+    with io.BytesIO() as buffer:
+        with zipfile.ZipFile(buffer, "w") as z:
+            z.writestr("big.csv", os.urandom(8 * 2 ** 20))
+
+        resp = requests.models.Response()
+        resp._content = buffer.getvalue()
+
+    tracemalloc.start()
+    z = Oasis._open_zip(resp)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert z.namelist() == ["big.csv"]
+    assert peak < 2 ** 20
+
+
+def test_stream_spools_to_file(fake_session, offline, tmp_path):
+    """
+    Test that stream mode downloads to a file-backed response parsed like any other
+    """
+
+    node = Node("CAPTJACK_5_N003", stream=True, stream_dir=str(tmp_path), **offline)
+    resp = node.request(
+        node._lmp_params(datetime(2019, 1, 1), datetime(2019, 1, 2), "DAM")
+    )
+
+    assert isinstance(resp, FileResponse)
+    assert resp.content[:2] == b"PK"
+
+    streamed = node.get_lmps(datetime(2019, 1, 1), datetime(2019, 1, 2))
+    default = Node("CAPTJACK_5_N003", **offline).get_lmps(
+        datetime(2019, 1, 1), datetime(2019, 1, 2)
+    )
+
+    assert streamed.equals(default)
+
+
+def test_node_iter_lmps(fake_session, offline):
+    """
+    Test that iter_lmps yields bounded frames that add up to get_lmps
+    """
+
+    node = Node("CAPTJACK_5_N003", **offline)
+    frames = list(
+        node.iter_lmps(datetime(2019, 1, 1), datetime(2019, 3, 1), chunksize=1000)
+    )
+    df = node.get_lmps(datetime(2019, 1, 1), datetime(2019, 3, 1))
+
+    assert max(len(frame) for frame in frames) == 1000
+    assert pd.concat(frames, ignore_index=True).equals(df)
+
+
+def test_nodes_iter_lmps(fake_session, offline):
+    """
+    Test that Nodes.iter_lmps yields a frame per batch and window
+    """
+
+    nodes = Nodes([f"NODE_{i:02d}" for i in range(15)], **offline)
+    frames = list(nodes.iter_lmps(datetime(2019, 1, 1), datetime(2019, 2, 5)))
+
+    assert len(frames) == 4
+    assert [frame.NODE.nunique() for frame in frames] == [10, 5, 10, 5]
+
+
+def test_all_nodes_iter_lmps(fake_session, offline):
+    """
+    Test that the bulk snapshot reader yields compact chunks day by day
+    """
+
+    frames = list(
+        AllNodes(**offline).iter_lmps(
+            datetime(2019, 1, 1), datetime(2019, 1, 3), chunksize=1000
+        )
+    )
+
+    assert sum(len(frame) for frame in frames) == 2 * 24 * 50 * 4
+    assert max(len(frame) for frame in frames) == 1000
+    assert all(frame.MW.dtype == "float32" for frame in frames)
+    assert frames[0].OPR_DT.iloc[0] == pd.Timestamp(2019, 1, 1)
+    assert frames[-1].OPR_DT.iloc[-1] == pd.Timestamp(2019, 1, 2)
+
+
+@pytest.fixture()
+def multi_member_response():
+    """
+    Response zipping one LMP csv per LMP type, like reports split by data item
+    """
+
+    csv = lmp_csv(["A"], datetime(2019, 1, 1), datetime(2019, 1, 2)).splitlines()
+    members = {}
+
+    for lmp_type in ["LMP", "MCE", "MCC", "MCL"]:
+        rows = [row for row in csv[1:] if f",{lmp_type}," in row]
+        members[f"{lmp_type}.csv"] = "\n".join([csv[0]] + rows) + "\n"
+
+    resp = requests.models.Response()
+    resp._content = make_zip(members)
+    resp._content_consumed = True
+
+    return resp
+
+
+def test_get_df_members(multi_member_response, offline):
+    """
+    Test reading the first, all or each member of a zip
+    """
+
+    oasis = Oasis(**offline)
+
+    first = oasis.get_df(multi_member_response)
+    all_members = oasis.get_df(
+        multi_member_response, members="all", sort_values=["OPR_DT", "OPR_HR"]
+    )
+    by_member = oasis.get_df(multi_member_response, members="dict")
+
+    assert first.LMP_TYPE.unique().tolist() == ["LMP"]
+    assert len(all_members) == 4 * len(first)
+    assert sorted(all_members.LMP_TYPE.unique()) == ["LMP", "MCC", "MCE", "MCL"]
+    assert list(by_member) == ["LMP.csv", "MCE.csv", "MCC.csv", "MCL.csv"]
+    assert by_member["MCC.csv"].LMP_TYPE.unique().tolist() == ["MCC"]
+
+
+def test_get_df_bad_zip_raises_quietly(offline, capsys):
+    """
+    Test that a corrupt zip raises BadZipFile without printing
+    """
+
+    resp = requests.models.Response()
+    resp._content = b"not a zip"
+    resp._content_consumed = True
+
+    with pytest.raises(zipfile.BadZipFile):
+        Oasis(**offline).get_df(resp)
+
+    assert capsys.readouterr().out == ""
+
+
+def test_get_df_members_with_different_columns(offline):
+    """
+    Test that all members are concatenated on the union of their columns
+    """
+
+    resp = requests.models.Response()
+    resp._content = make_zip({"a.csv": "A,B\n1,x\n2,y\n", "b.csv": "A,C,D\n3,z,4\n"})
+    resp._content_consumed = True
+
+    df = Oasis(**offline).get_df(resp, members="all")
+
+    assert list(df.columns) == ["A", "B", "C", "D"]
+    assert df.A.tolist() == [1, 2, 3]
+    assert df.B.tolist()[:2] == ["x", "y"] and pd.isna(df.B[2])
+    assert df.C.isna().tolist() == [True, True, False]
+    assert df.D.tolist()[2] == 4
+
+
+def test_members_all_on_instance(multi_member_response, offline):
+    """
+    Test that an instance reading all members applies it to get_df and iter_df
+    """
+
+    oasis = Oasis(members="all", **offline)
+
+    assert len(oasis.get_df(multi_member_response)) == 4 * 24
+    assert sum(len(df) for df in oasis.iter_df(multi_member_response, 10)) == 4 * 24
+
+    with pytest.raises(ValueError):
+        Oasis(members="dict", **offline)
+
+
+def test_hooks_report_query_events(fake_session, offline, tmp_path):
+    """
+    Test that hooks get a request and a parse event per query, and cache hits
+    """
+
+    events = []
+    node = Node(
+        "A",
+        cache=ResponseCache(str(tmp_path)),
+        hooks=[lambda event: events.append((event.phase, event.cache))],
+        **offline,
+    )
+    node.hooks.append(lambda event: events.append(event))
+
+    df = node.get_lmps(datetime(2019, 1, 1), datetime(2019, 1, 2))
+    request, event = events[:2]
+    parse, parsed = events[2:]
+
+    assert request == ("request", "miss")
+    assert parse == ("parse", "miss")
+    assert event is parsed
+    assert event.query == "PRC_LMP"
+    assert event.source == "network"
+    assert event.attempts == 1
+    assert event.status_code == 200
+    assert event.bytes > 0
+    assert event.decompressed > 0
+    assert event.rows == len(df)
+    assert {"wait", "server", "download", "unzip", "parse", "sort", "reindex"} <= set(
+        event.stages
+    )
+
+    events.clear()
+    node.get_lmps(datetime(2019, 1, 1), datetime(2019, 1, 2))
+
+    assert events[0] == ("request", "hit")
+    assert events[1].source == "cache"
+    assert "server" not in events[1].stages
+
+
+def test_hooks_report_retries_and_errors(fake_session, offline):
+    """
+    Test that events count attempts and 429s, and report failed queries
+    """
+
+    get = fake_session.get
+    failures = [error_response(429, "0"), error_response(503)]
+    events = []
+
+    def flaky_get(url, params=None, timeout=None, **kwargs):
+        return failures.pop(0) if failures else get(url, params, timeout, **kwargs)
+
+    fake_session.get = flaky_get
+    node = Node("A", retry=RetryPolicy(3, backoff=0), hooks=[events.append], **offline)
+    node.get_lmps(datetime(2019, 1, 1))
+
+    assert events[0].attempts == 3
+    assert events[0].throttled == 1
+    assert events[0].error is None
+
+    failures.extend([error_response(404)])
+
+    with pytest.raises(requests.HTTPError):
+        node.get_lmps(datetime(2019, 1, 1))
+
+    assert events[-1].phase == "request"
+    assert events[-1].status_code == 404
+    assert isinstance(events[-1].error, requests.HTTPError)
+
+
+def test_hooks_on_responses_from_elsewhere(multi_member_response, offline):
+    """
+    Test that parsing a response not requested with hooks still reports it
+    """
+
+    events = []
+    oasis = Oasis(hooks=[events.append], **offline)
+    by_member = oasis.get_df(multi_member_response, members="dict")
+
+    assert events[0].phase == "parse"
+    assert events[0].rows == sum(len(df) for df in by_member.values())
+    assert events[0].bytes == len(multi_member_response.content)
@@ -0,0 +1,108 @@
+import time
+from datetime import datetime
+
+import pytest
+from pycaiso.oasis import NoDataAvailableError, Node
+from pycaiso.replay import Replay, ReplayMissError
+from pycaiso.testing import OasisServer
+from tests.conftest import client_kwargs
+
+
+@pytest.fixture(scope="module")
+def server():
+    with OasisServer(nodes=5, latency=0.2) as server:
+        yield server
+
+
+def test_record_then_replay(server, tmp_path):
+    """
+    Test that recorded responses replay without touching the network
+    """
+
+    start, end = datetime(2019, 1, 1), datetime(2019, 1, 3)
+
+    recorder = Node(
+        "A", **client_kwargs(server, replay=Replay(str(tmp_path), "record"))
+    )
+    recorded = recorder.get_lmps(start, end)
+    requests = server.requests
+
+    for stream in [False, True]:
+        node = Node(
+            "A",
+            **client_kwargs(
+                server, replay=Replay(str(tmp_path), "replay"), stream=stream
+            ),
+        )
+
+        began = time.perf_counter()
+        replayed = node.get_lmps(start, end)
+
+        assert time.perf_counter() - began < 0.2
+        assert replayed.equals(recorded)
+
+    assert server.requests == requests
+
+    with pytest.raises(ReplayMissError):
+        Node(
+            "A", **client_kwargs(server, replay=Replay(str(tmp_path), "replay"))
+        ).get_lmps(end)
+
+
+def test_replay_latency(server, tmp_path):
+    """
+    Test replaying with the recorded or a simulated latency
+    """
+
+    Node("A", **client_kwargs(server, replay=Replay(str(tmp_path)))).get_lmps(
+        datetime(2019, 1, 1)
+    )
+
+    original = Node(
+        "A",
+        **client_kwargs(
+            server, replay=Replay(str(tmp_path), "replay", latency="original")
+        ),
+    )
+    simulated = Node(
+        "A",
+        **client_kwargs(server, replay=Replay(str(tmp_path), "replay", latency=0.05)),
+    )
+
+    began = time.perf_counter()
+    original.get_lmps(datetime(2019, 1, 1))
+    assert time.perf_counter() - began >= 0.2
+
+    began = time.perf_counter()
+    simulated.get_lmps(datetime(2019, 1, 1))
+    assert 0.05 <= time.perf_counter() - began < 0.2
+
+
+def test_replay_empty_results(server, tmp_path):
+    """
+    Test that empty results are recorded and replay as empty results
+    """
+
+    auto = Replay(str(tmp_path))
+
+    with pytest.raises(NoDataAvailableError):
+        Node("NODATA", **client_kwargs(server, replay=auto)).get_lmps(
+            datetime(2019, 1, 1)
+        )
+
+    requests = server.requests
+
+    with pytest.raises(NoDataAvailableError):
+        Node("NODATA", **client_kwargs(server, replay=auto)).get_lmps(
+            datetime(2019, 1, 1)
+        )
+
+    assert server.requests == requests
+
+
+def test_replay_validation(tmp_path):
+    with pytest.raises(ValueError):
+        Replay(str(tmp_path), mode="play")
+
+    with pytest.raises(ValueError):
+        Replay(str(tmp_path), latency="recorded")
@@ -0,0 +1,173 @@
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+import pytest
+from pycaiso.oasis import Node, Nodes, RateLimiter, get_lmps
+from tests.conftest import FakeSession
+
+pytest.importorskip("pyarrow")
+
+from pycaiso.store import LMPStore  # noqa: E402
+
+
+@pytest.fixture()
+def store(tmp_path):
+    return LMPStore(
+        str(tmp_path), session=FakeSession(), rate_limiter=RateLimiter(1000, 1)
+    )
+
+
+def test_sync_fetches_only_gaps(store):
+    """
+    Test that a sync after a partial sync only fetches the missing days
+    """
+
+    store.sync(["A", "B"], datetime(2019, 1, 10), datetime(2019, 1, 20))
+    calls = len(store.kwargs["session"].calls)
+
+    rows = store.sync(["A", "B", "C"], datetime(2019, 1, 1), datetime(2019, 2, 5))
+    new_calls = store.kwargs["session"].calls[calls:]
+
+    assert rows["A"] == rows["B"] == (9 + 16) * 24 * 4
+    assert rows["C"] == 35 * 24 * 4
+    assert {call["node"] for call in new_calls} == {"A,B", "C"}
+    assert store.missing("A", datetime(2019, 1, 1), datetime(2019, 2, 5)) == []
+
+
+def test_partitions_and_read(store, tmp_path):
+    """
+    Test that LMPs are partitioned by market, node and month and read back in range
+    """
+
+    store.sync(["A"], datetime(2019, 1, 30), datetime(2019, 2, 3))
+
+    assert sorted(p.name for p in (tmp_path / "market=DAM" / "node=A").iterdir()) == [
+        "days.json",
+        "month=2019-01.parquet",
+        "month=2019-02.parquet",
+    ]
+
+    df = store.read("A", datetime(2019, 1, 31), datetime(2019, 2, 2))
+
+    assert len(df) == 2 * 24 * 4
+    assert df.OPR_DT.is_monotonic_increasing
+    assert store.days("A") == {date(2019, 1, d) for d in (30, 31)} | {
+        date(2019, 2, d) for d in (1, 2)
+    }
+
+
+def test_write_replaces_duplicates(store):
+    """
+    Test that rewriting the same days does not duplicate rows
+    """
+
+    store.sync(["A"], datetime(2019, 1, 1), datetime(2019, 1, 2))
+    df = store.read("A", datetime(2019, 1, 1), datetime(2019, 1, 2))
+
+    store.write(df)
+
+    assert len(store.read("A", datetime(2019, 1, 1), datetime(2019, 1, 2))) == len(df)
+
+
+def test_plan_segments(store):
+    """
+    Test that a query is decomposed into stored and missing day segments
+    """
+
+    store.sync(["A"], datetime(2019, 1, 5), datetime(2019, 1, 8))
+
+    assert store.plan("A", datetime(2019, 1, 1), datetime(2019, 1, 10)) == [
+        (datetime(2019, 1, 1), datetime(2019, 1, 5), False),
+        (datetime(2019, 1, 5), datetime(2019, 1, 8), True),
+        (datetime(2019, 1, 8), datetime(2019, 1, 10), False),
+    ]
+
+
+def test_node_with_store_fetches_only_missing(store):
+    """
+    Test that Node.get_lmps with a store fetches only uncached segments and splices them
+    """
+
+    session = store.kwargs["session"]
+    node = Node("A", store=store, **store.kwargs)
+
+    node.get_lmps(datetime(2019, 1, 5), datetime(2019, 1, 8))
+    df = get_lmps(
+        "A", datetime(2019, 1, 1), datetime(2019, 3, 1), store=store, **store.kwargs
+    )
+
+    fetched = [(call["startdatetime"], call["enddatetime"]) for call in session.calls]
+
+    assert len(fetched) == 4  # 5-8 Jan, 1-5 Jan, 8 Jan-8 Feb, 8 Feb-1 Mar
+    assert len(df) == (31 + 28) * 24 * 4
+    assert df.OPR_DT.is_monotonic_increasing
+    assert df.index.equals(pd.RangeIndex(len(df)))
+
+    df_again = node.get_lmps(datetime(2019, 1, 1), datetime(2019, 3, 1))
+
+    assert len(session.calls) == 4
+    assert df_again.MW.equals(df.MW)
+
+
+def test_sync_refetches_unpublished_days(tmp_path):
+    """
+    Test that recent days without data are fetched again, and old ones are not
+    """
+
+    session = FakeSession()
+    get = session.get
+    published = []
+
+    def get_published(url, params=None, timeout=None, **kwargs):
+        if published:
+            return get(url, params, timeout, **kwargs)
+
+        session.calls.append(dict(params))
+        resp = get(url, params, timeout, **kwargs)
+        resp.headers["content-disposition"] = "inline; filename=error.xml.zip;"
+
+        return resp
+
+    session.get = get_published
+    store = LMPStore(str(tmp_path), session=session, rate_limiter=RateLimiter(1000, 1))
+    today = datetime.combine(date.today(), datetime.min.time())
+    start = today - timedelta(days=2)
+
+    assert store.sync(["A"], start, today) == {"A": 0}
+    assert store.days("A") == set()
+
+    store.sync(["A"], datetime(2019, 1, 1), datetime(2019, 1, 3))
+
+    assert store.days("A") == {date(2019, 1, 1), date(2019, 1, 2)}
+
+    published.append(True)
+
+    assert store.sync(["A"], start, today) == {"A": 2 * 24 * 4}
+    assert store.days("A") == {
+        date(2019, 1, 1),
+        date(2019, 1, 2),
+        start.date(),
+        (start + timedelta(days=1)).date(),
+    }
+
+
+def test_nodes_with_store_syncs_missing_days(store):
+    """
+    Test that Nodes.get_lmps with a store fetches only the days each node is missing
+    """
+
+    store.sync(["A"], datetime(2019, 1, 1), datetime(2019, 1, 3))
+
+    session = FakeSession()
+    nodes = Nodes(
+        ["A", "B"], store=store, session=session, rate_limiter=RateLimiter(1000, 1)
+    )
+    df = nodes.get_lmps(datetime(2019, 1, 1), datetime(2019, 1, 4))
+
+    assert [call["node"] for call in session.calls] == ["A", "B"]
+    assert len(df) == 2 * 3 * 24 * 4
+    assert df.OPR_DT.is_monotonic_increasing
+    assert nodes.get_lmps(
+        datetime(2019, 1, 1), datetime(2019, 1, 4), output="wide"
+    ).NODE.tolist()[:2] == ["A", "B"]
+    assert len(session.calls) == 2
@@ -0,0 +1,86 @@
+from datetime import datetime
+
+import pytest
+import requests
+from pycaiso.oasis import (
+    AllNodes,
+    Atlas,
+    NoDataAvailableError,
+    Node,
+    RetryPolicy,
+    SystemDemand,
+)
+from pycaiso.testing import OasisServer
+from tests.conftest import client_kwargs
+
+
+@pytest.fixture()
+def server():
+    with OasisServer(nodes=20) as server:
+        yield server
+
+
+@pytest.mark.parametrize(
+    "market, intervals_per_day", [("DAM", 24), ("RTM", 288), ("RTPD", 96)]
+)
+def test_server_lmps(server, market, intervals_per_day):
+    """
+    Test that each LMP market is served with its interval length
+    """
+
+    df = Node("A", **client_kwargs(server)).get_lmps(
+        datetime(2019, 1, 1), datetime(2019, 1, 3), market=market
+    )
+
+    assert len(df) == 2 * intervals_per_day * 5
+    assert df.MW.notna().all()
+    assert (df.MARKET_RUN_ID == market).all()
+    assert server.calls[0]["node"] == "A"
+
+
+def test_server_lmp_components_add_up(server):
+    """
+    Test that served LMPs are the sum of their components
+    """
+
+    df = Node("A", **client_kwargs(server)).get_lmps(
+        datetime(2019, 1, 1), output="wide"
+    )
+
+    assert (df.LMP - df[["MCE", "MCC", "MCL", "MGHG"]].sum(axis=1)).abs().max() < 1e-4
+
+
+def test_server_reports(server):
+    """
+    Test pricing node, demand forecast and all-node queries
+    """
+
+    kwargs = client_kwargs(server)
+    start, end = datetime(2019, 1, 1), datetime(2019, 1, 3)
+
+    assert len(Atlas(**kwargs).get_pnodes(start, end)) == 20
+    assert len(SystemDemand(**kwargs).get_demand_forecast(start, end)) == 2 * 24 * 5
+    assert len(SystemDemand(**kwargs).get_peak_demand_forecast(start, end)) == 2 * 5
+    assert AllNodes(**kwargs).get_lmps(start).NODE.nunique() == 20
+
+    with pytest.raises(NoDataAvailableError):
+        Node("NODATA", **kwargs).get_lmps(start)
+
+
+def test_server_errors_and_throttling():
+    """
+    Test that 503s and 429s are served and retried by the client
+    """
+
+    with OasisServer(error_rate=1.0) as server:
+        with pytest.raises(requests.HTTPError):
+            Node("A", **client_kwargs(server)).get_lmps(datetime(2019, 1, 1))
+
+    with OasisServer(throttle_every=2, retry_after=0) as server:
+        node = Node("A", **client_kwargs(server, retry=RetryPolicy(2, backoff=0)))
+        node.max_window_days = 1
+
+        df = node.get_lmps(datetime(2019, 1, 1), datetime(2019, 1, 3))
+
+    assert len(df) == 2 * 24 * 5
+    assert server.requests == 3